@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+TEL354 - Laboratorio 6: API HTTP/JSON de la aplicación SDN
+Expone las mismas operaciones que los menús para que otros sistemas puedan
+usarlas de forma programática y concurrente.
+Uso: python3 api.py --puerto 8000 [--importar datos.yaml]
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from controller_20210535 import RUTEO_LOCAL, SNAPSHOT_EXTENSION, SDNApp
+
+# Hilos para las operaciones bloqueantes (llamadas al controlador, importación)
+API_WORKERS = 32
+# Tamaño máximo del cuerpo de una solicitud (bytes)
+API_MAX_CUERPO = 1 << 20
+
+ESTADOS_HTTP = {
+    200: "OK", 201: "Created", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 502: "Bad Gateway"
+}
+
+
+class ErrorAPI(Exception):
+    """Error que se devuelve al cliente con un código HTTP"""
+    def __init__(self, codigo: int, mensaje: str):
+        super().__init__(mensaje)
+        self.codigo = codigo
+        self.mensaje = mensaje
+
+
+class LectoresEscritor:
+    """Bloqueo de lectores/escritor: las operaciones que cambian políticas (importar,
+    matricular, agregar alumnos) son exclusivas; el resto se ejecuta en paralelo.
+    Un escritor en espera tiene prioridad: los lectores nuevos esperan detrás de él"""
+    def __init__(self):
+        self._condicion = asyncio.Condition()
+        self._lectores = 0
+        self._escribiendo = False
+        self._escritores_esperando = 0
+
+    async def adquirir_lectura(self):
+        async with self._condicion:
+            await self._condicion.wait_for(lambda: not self._escribiendo and not self._escritores_esperando)
+            self._lectores += 1
+
+    async def liberar_lectura(self):
+        async with self._condicion:
+            self._lectores -= 1
+            self._condicion.notify_all()
+
+    async def adquirir_escritura(self):
+        async with self._condicion:
+            self._escritores_esperando += 1
+            try:
+                await self._condicion.wait_for(lambda: not self._escribiendo and self._lectores == 0)
+            finally:
+                self._escritores_esperando -= 1
+                # Si la espera se canceló, los lectores detenidos por este escritor pueden seguir
+                self._condicion.notify_all()
+            self._escribiendo = True
+
+    async def liberar_escritura(self):
+        async with self._condicion:
+            self._escribiendo = False
+            self._condicion.notify_all()
+
+
+class _Acceso:
+    def __init__(self, bloqueo: LectoresEscritor, escritura: bool):
+        self._bloqueo = bloqueo
+        self._escritura = escritura
+
+    async def __aenter__(self):
+        if self._escritura:
+            await self._bloqueo.adquirir_escritura()
+        else:
+            await self._bloqueo.adquirir_lectura()
+
+    async def __aexit__(self, *exc):
+        if self._escritura:
+            await self._bloqueo.liberar_escritura()
+        else:
+            await self._bloqueo.liberar_lectura()
+
+
+class APIServidor:
+    """Servidor HTTP/1.1 asíncrono con respuestas JSON y listados en streaming (NDJSON)"""
+    def __init__(self, app: SDNApp, host: str = "127.0.0.1", puerto: int = 8000):
+        self.app = app
+        self.host = host
+        self.puerto = puerto
+        self._bloqueo = None
+        self._eliminando = {}  # handler -> Event que se activa al terminar su eliminación
+        self._ejecutor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+        self._servidor = None
+        self._rutas = [
+            ('POST', ('importar',), self.importar, True),
+            ('GET', ('alumnos',), self.listar_alumnos, False),
+            ('POST', ('alumnos',), self.agregar_alumno, True),
+            ('GET', ('alumnos', None), self.detalle_alumno, False),
+            ('GET', ('cursos',), self.listar_cursos, False),
+            ('GET', ('cursos', None), self.detalle_curso, False),
+            ('POST', ('cursos', None, 'alumnos'), self.matricular, True),
+            ('DELETE', ('cursos', None, 'alumnos', None), self.desmatricular, True),
+            ('POST', ('cursos', None, 'conexiones'), self.conexiones_curso, False),
+            ('GET', ('servidores',), self.listar_servidores, False),
+            ('GET', ('servidores', None), self.detalle_servidor, False),
+            ('GET', ('autorizado',), self.autorizado, False),
+            ('GET', ('politicas',), self.politicas, False),
+            ('GET', ('politicas', 'alumnos'), self.politicas_alumnos, False),
+            ('GET', ('auditoria',), self.auditoria, False),
+            ('GET', ('conexiones',), self.listar_conexiones, False),
+            ('POST', ('conexiones',), self.crear_conexion, False),
+            ('DELETE', ('conexiones', None), self.eliminar_conexion, False),
+            ('POST', ('reconciliar',), self.reconciliar, False),
+            ('POST', ('recolectar',), self.recolectar, False),
+            ('GET', ('metricas',), self.metricas, False),
+        ]
+
+    # Infraestructura
+
+    async def iniciar(self):
+        self._bloqueo = LectoresEscritor()
+        self._servidor = await asyncio.start_server(self._atender_conexion, self.host, self.puerto)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        print(f"API disponible en http://{self.host}:{self.puerto}")
+
+    async def servir(self):
+        await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def detener(self):
+        self._servidor.close()
+        await self._servidor.wait_closed()
+        self._ejecutor.shutdown(wait=False)
+
+    async def _bloqueante(self, funcion, *args):
+        """Ejecutar una operación bloqueante de la aplicación en el pool de hilos"""
+        return await asyncio.get_running_loop().run_in_executor(self._ejecutor, funcion, *args)
+
+    def _resolver_ruta(self, metodo: str, partes: Tuple[str, ...]):
+        encontrada = False
+        for m, patron, manejador, escritura in self._rutas:
+            if len(patron) != len(partes):
+                continue
+            if all(p is None or p == parte for p, parte in zip(patron, partes)):
+                encontrada = True
+                if m == metodo:
+                    parametros = [parte for p, parte in zip(patron, partes) if p is None]
+                    return manejador, parametros, escritura
+        raise ErrorAPI(405 if encontrada else 404, "método no permitido" if encontrada else "ruta no encontrada")
+
+    async def _atender_conexion(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                linea = await reader.readline()
+                if not linea:
+                    break
+                metodo, objetivo, version = linea.decode('latin-1').split()
+                encabezados = {}
+                while True:
+                    linea = await reader.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    clave, _, valor = linea.decode('latin-1').partition(':')
+                    encabezados[clave.strip().lower()] = valor.strip()
+
+                longitud = int(encabezados.get('content-length') or 0)
+                mantener = (version == 'HTTP/1.1' and encabezados.get('connection', '').lower() != 'close')
+                if longitud > API_MAX_CUERPO:
+                    await self._enviar_json(writer, 413, {'error': 'cuerpo demasiado grande'}, False)
+                    break
+                cuerpo = await reader.readexactly(longitud) if longitud else b''
+                await self._despachar(writer, metodo, objetivo, cuerpo, mantener)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _despachar(self, writer, metodo: str, objetivo: str, cuerpo: bytes, mantener: bool):
+        url = urlsplit(objetivo)
+        partes = tuple(unquote(p) for p in url.path.strip('/').split('/') if p)
+        consulta = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            datos = json.loads(cuerpo) if cuerpo else {}
+            if not isinstance(datos, dict):
+                raise ErrorAPI(400, "el cuerpo debe ser un objeto JSON")
+            manejador, parametros, escritura = self._resolver_ruta(metodo, partes)
+            async with _Acceso(self._bloqueo, escritura):
+                respuesta = await manejador(*parametros, consulta=consulta, datos=datos)
+                if hasattr(respuesta, '__aiter__'):
+                    await self._enviar_stream(writer, respuesta, mantener)
+                    return
+            codigo, contenido = respuesta
+        except ErrorAPI as e:
+            codigo, contenido = e.codigo, {'error': e.mensaje}
+        except json.JSONDecodeError:
+            codigo, contenido = 400, {'error': 'JSON inválido'}
+        except Exception as e:
+            codigo, contenido = 500, {'error': str(e)}
+        await self._enviar_json(writer, codigo, contenido, mantener)
+
+    async def _enviar_json(self, writer, codigo: int, contenido, mantener: bool):
+        if isinstance(contenido, str):
+            datos, tipo = contenido.encode(), 'text/plain; charset=utf-8'
+        else:
+            datos, tipo = json.dumps(contenido, ensure_ascii=False).encode(), 'application/json'
+        writer.write(
+            f"HTTP/1.1 {codigo} {ESTADOS_HTTP.get(codigo, '')}\r\n"
+            f"Content-Type: {tipo}\r\n"
+            f"Content-Length: {len(datos)}\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode() + datos
+        )
+        await writer.drain()
+
+    async def _enviar_stream(self, writer, elementos, mantener: bool):
+        """Enviar un listado como NDJSON con transferencia por partes"""
+        writer.write(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/x-ndjson\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode()
+        )
+        async for elemento in elementos:
+            linea = json.dumps(elemento, ensure_ascii=False).encode() + b'\n'
+            writer.write(f"{len(linea):x}\r\n".encode() + linea + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # Utilidades
+
+    @staticmethod
+    def _clave(tabla: Dict, valor) -> Optional[object]:
+        """Buscar una clave aceptando códigos numéricos recibidos como texto"""
+        if valor in tabla:
+            return valor
+        try:
+            numero = int(valor)
+        except (TypeError, ValueError):
+            return None
+        return numero if numero in tabla else None
+
+    def _alumno(self, valor):
+        codigo = self._clave(self.app.alumnos, valor)
+        if codigo is None:
+            raise ErrorAPI(404, f"alumno {valor} no encontrado")
+        return codigo
+
+    def _curso(self, valor):
+        codigo = self._clave(self.app.cursos, valor)
+        if codigo is None:
+            raise ErrorAPI(404, f"curso {valor} no encontrado")
+        return codigo
+
+    @staticmethod
+    def _requerido(datos: Dict, *campos):
+        faltantes = [c for c in campos if c not in datos]
+        if faltantes:
+            raise ErrorAPI(400, f"faltan campos: {', '.join(faltantes)}")
+        return [datos[c] for c in campos]
+
+    @staticmethod
+    async def _recorrer(iterable, convertir):
+        for elemento in iterable:
+            yield convertir(elemento)
+
+    # Operaciones
+
+    async def importar(self, consulta, datos):
+        (archivo,) = self._requerido(datos, 'archivo')
+        if str(archivo).endswith(SNAPSHOT_EXTENSION):
+            ok = await self._bloqueante(self.app.cargar_snapshot, archivo)
+        elif datos.get('rapido'):
+            ok = await self._bloqueante(self.app.importar_yaml_rapido, archivo) is not None
+        else:
+            ok = await self._bloqueante(self.app.importar_yaml, archivo)
+        if not ok:
+            raise ErrorAPI(400, f"no se pudo importar {archivo}")
+        return 200, {'alumnos': len(self.app.alumnos), 'cursos': len(self.app.cursos),
+                     'servidores': len(self.app.servidores)}
+
+    async def listar_alumnos(self, consulta, datos):
+        if 'curso' in consulta:
+            curso = self.app.cursos[self._curso(consulta['curso'])]
+            alumnos = (self.app.alumnos[c] for c in curso.alumnos if c in self.app.alumnos)
+        else:
+            alumnos = self.app.alumnos.values()
+        return self._recorrer(alumnos, lambda a: a.to_dict())
+
+    async def agregar_alumno(self, consulta, datos):
+        nombre, codigo, mac = self._requerido(datos, 'nombre', 'codigo', 'mac')
+        if codigo in self.app.alumnos:
+            raise ErrorAPI(409, f"ya existe un alumno con código {codigo}")
+        try:
+            self.app.agregar_alumno(nombre, codigo, mac)
+        except ValueError as e:
+            raise ErrorAPI(400, str(e))
+        return 201, self.app.alumnos[codigo].to_dict()
+
+    async def detalle_alumno(self, codigo, consulta, datos):
+        return 200, self.app.alumnos[self._alumno(codigo)].to_dict()
+
+    async def listar_cursos(self, consulta, datos):
+        return self._recorrer(self.app.cursos.values(), lambda c: {
+            'codigo': c.codigo, 'nombre': c.nombre, 'estado': c.estado, 'alumnos': len(c.alumnos)
+        })
+
+    async def detalle_curso(self, codigo, consulta, datos):
+        return 200, self.app.cursos[self._curso(codigo)].to_dict()
+
+    async def matricular(self, codigo_curso, consulta, datos):
+        (alumno,) = self._requerido(datos, 'alumno')
+        self.app.agregar_alumno_a_curso(self._alumno(alumno), self._curso(codigo_curso))
+        return 200, {'curso': codigo_curso, 'alumno': alumno}
+
+    async def desmatricular(self, codigo_curso, alumno, consulta, datos):
+        curso = self.app.cursos[self._curso(codigo_curso)]
+        codigo = self._clave({c: None for c in curso.alumnos}, alumno)
+        if codigo is None:
+            raise ErrorAPI(404, f"el alumno {alumno} no está en el curso {codigo_curso}")
+        # Puede revocar conexiones, lo que implica llamadas al controlador
+        await self._bloqueante(curso.remover_alumno, codigo)
+        return 200, {'curso': codigo_curso, 'alumno': alumno}
+
+    async def conexiones_curso(self, codigo_curso, consulta, datos):
+        resultados = await self._bloqueante(self.app.crear_conexiones_curso, self._curso(codigo_curso))
+        if resultados is None:
+            raise ErrorAPI(409, f"el curso {codigo_curso} no está en estado DICTANDO")
+        return 200, resultados
+
+    async def listar_servidores(self, consulta, datos):
+        return self._recorrer(self.app.servidores.values(), lambda s: s.to_dict())
+
+    async def detalle_servidor(self, nombre, consulta, datos):
+        if nombre not in self.app.servidores:
+            raise ErrorAPI(404, f"servidor {nombre} no encontrado")
+        return 200, self.app.servidores[nombre].to_dict()
+
+    async def autorizado(self, consulta, datos):
+        alumno, servidor, servicio = self._requerido(consulta, 'alumno', 'servidor', 'servicio')
+        codigo = self._clave(self.app.alumnos, alumno)
+        return 200, {'autorizado': codigo is not None and
+                     self.app.alumno_autorizado(codigo, servidor, servicio)}
+
+    async def politicas(self, consulta, datos):
+        servidor, servicio = self._requerido(consulta, 'servidor', 'servicio')
+        return 200, [str(c.codigo) for c in self.app.cursos_con_servicio(servidor, servicio)]
+
+    async def politicas_alumnos(self, consulta, datos):
+        servidor, servicio = self._requerido(consulta, 'servidor', 'servicio')
+        return 200, self.app.alumnos_con_servicio(servidor, servicio)
+
+    async def auditoria(self, consulta, datos):
+        return self._recorrer(self.app.auditoria_accesos(), lambda acceso: {
+            'alumno': acceso[0], 'servidor': acceso[1], 'servicio': acceso[2]
+        })
+
+    async def listar_conexiones(self, consulta, datos):
+        return self._recorrer(self.app.conexiones.values(), lambda c: c.to_dict())
+
+    async def crear_conexion(self, consulta, datos):
+        alumno, servidor, servicio = self._requerido(datos, 'alumno', 'servidor', 'servicio')
+        codigo = self._alumno(alumno)
+        try:
+            vigencia = {campo: float(datos[campo]) if datos.get(campo) is not None else None
+                        for campo in ('vida', 'inactividad')}
+        except (TypeError, ValueError):
+            raise ErrorAPI(400, "vida e inactividad deben ser números de segundos")
+        if not self.app.alumno_autorizado(codigo, servidor, servicio):
+            raise ErrorAPI(403, f"el alumno {alumno} no está autorizado para {servicio} en {servidor}")
+        # Las solicitudes simultáneas se provisionan juntas en un solo lote
+        resultado = await asyncio.wrap_future(
+            self.app.crear_conexion_agrupada(codigo, servidor, servicio, **vigencia)
+        )
+        if resultado['handler'] is None:
+            raise ErrorAPI(502, f"no se pudo crear la conexión: {resultado['error']}")
+        return 201, self.app.conexiones[resultado['handler']].to_dict()
+
+    async def eliminar_conexion(self, handler, consulta, datos):
+        # Las eliminaciones de un mismo handler se hacen de a una: la que llega mientras otra
+        # está en curso espera y luego encuentra la conexión ya eliminada
+        while handler in self._eliminando:
+            await self._eliminando[handler].wait()
+        if handler not in self.app.conexiones:
+            raise ErrorAPI(404, f"conexión {handler} no encontrada")
+        evento = self._eliminando[handler] = asyncio.Event()
+        try:
+            eliminada = await self._bloqueante(self.app.eliminar_conexion, handler)
+        finally:
+            del self._eliminando[handler]
+            evento.set()
+        if not eliminada:
+            # Otro hilo (el recolector, una revocación) pudo eliminarla mientras tanto
+            if handler not in self.app.conexiones:
+                raise ErrorAPI(404, f"conexión {handler} no encontrada")
+            raise ErrorAPI(502, "no se pudieron eliminar todos los flows de la conexión")
+        return 200, {'handler': handler}
+
+    async def reconciliar(self, consulta, datos):
+        reporte = await self._bloqueante(self.app.reconciliar, bool(datos.get('simular')))
+        if reporte is None:
+            raise ErrorAPI(502, "no se pudo leer la tabla de flows del controlador")
+        return 200, reporte
+
+    async def recolectar(self, consulta, datos):
+        return 200, await self._bloqueante(self.app.recolectar_conexiones)
+
+    async def metricas(self, consulta, datos):
+        return 200, self.app.metricas.exportar_prometheus()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON de la aplicación SDN")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--importar", help="archivo YAML o snapshot a cargar al iniciar")
+    parser.add_argument("--ruteo-local", action="store_true", default=RUTEO_LOCAL,
+                        help="calcular las rutas localmente en lugar de consultar a Floodlight")
+    args = parser.parse_args()
+
+    app = SDNApp(ruteo_local=args.ruteo_local)
+    if args.importar:
+        if args.importar.endswith(SNAPSHOT_EXTENSION):
+            app.cargar_snapshot(args.importar)
+        else:
+            app.importar_yaml(args.importar)
+    try:
+        asyncio.run(APIServidor(app, args.host, args.puerto).servir())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+TEL354 - Laboratorio 6: Benchmarks de la aplicación SDN
+Uso: python3 benchmark.py <benchmark> [opciones]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from controller_20210535 import (SDNApp, Alumno, Servidor, Curso, Conexion, FloodlightClient,
+                                 FloodlightFederado, LimitadorAdaptativo, FLOODLIGHT_POOL)
+from floodlight_simulado import FloodlightSimulado, dpid_de, mac_de
+
+# Directorio donde se guardan los resultados de la suite para comparar corridas
+DIRECTORIO_RESULTADOS = "bench_resultados"
+
+
+def silencio():
+    """Descartar los mensajes que imprime la aplicación durante una medición"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def generar_app(n_alumnos: int, n_cursos: int = 20, n_conexiones: int = 0,
+                semilla: int = 354, floodlight: FloodlightClient = None) -> SDNApp:
+    """Aplicación con datos sintéticos: alumnos, un servidor, cursos y conexiones.
+    El alumno i usa la MAC del host i del controlador simulado."""
+    rnd = random.Random(semilla)
+    app = SDNApp(floodlight)
+    for i in range(n_alumnos):
+        codigo = 20200000 + i
+        app.alumnos[codigo] = Alumno(f"Alumno {i}", codigo, mac_de(i))
+
+    servidor = Servidor("Servidor 1", "10.0.0.3")
+    servidor.agregar_servicio("ssh", "TCP", 22)
+    servidor.agregar_servicio("web", "TCP", 80)
+    app.servidores[servidor.nombre] = servidor
+
+    codigos = list(app.alumnos)
+    por_curso = min(len(codigos), max(1, n_alumnos // 10))
+    for k in range(n_cursos):
+        curso = Curso(f"TEL{k:03d}", f"Curso {k}")
+        curso.alumnos = rnd.sample(codigos, por_curso)
+        curso.servidores = [{'nombre': servidor.nombre, 'servicios_permitidos': ['ssh', 'web']}]
+        app.cursos[curso.codigo] = curso
+    app.reconstruir_permisos()
+
+    for n in range(n_conexiones):
+        codigo = rnd.choice(codigos)
+        handler = f"conn_{app.connection_counter}"
+        app.connection_counter += 1
+        conexion = Conexion(handler, app.alumnos[codigo].mac, servidor.ip, "ssh",
+                            codigo, servidor.nombre)
+        conexion.flow_entries = [f"flow_{app.connection_counter}_00:00:00:00:00:00:00:0{s}" for s in range(1, 4)]
+        app.conexiones[handler] = conexion
+    return app
+
+
+def medir(funcion, *args) -> float:
+    inicio = time.perf_counter()
+    with silencio():
+        funcion(*args)
+    return time.perf_counter() - inicio
+
+
+def bench_snapshot(args):
+    """Comparar el ida y vuelta YAML con el snapshot SQLite"""
+    print(f"{'Alumnos':>8} {'Conexiones':>10} {'YAML guardar':>13} {'YAML cargar':>12} "
+          f"{'Snap guardar':>13} {'Snap cargar':>12} {'Aceleración':>12}")
+    for n in args.alumnos:
+        app = generar_app(n, n_conexiones=n // 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta_yaml = os.path.join(tmp, "estado.yaml")
+            ruta_snap = os.path.join(tmp, "estado.db")
+            yaml_guardar = medir(app.exportar_yaml, ruta_yaml)
+            yaml_cargar = medir(SDNApp().importar_yaml, ruta_yaml)
+            snap_guardar = medir(app.guardar_snapshot, ruta_snap)
+            snap_cargar = medir(SDNApp().cargar_snapshot, ruta_snap)
+        aceleracion = (yaml_guardar + yaml_cargar) / (snap_guardar + snap_cargar)
+        print(f"{n:>8} {len(app.conexiones):>10} {yaml_guardar:>12.3f}s {yaml_cargar:>11.3f}s "
+              f"{snap_guardar:>12.3f}s {snap_cargar:>11.3f}s {aceleracion:>11.1f}x")
+
+
+class AlumnoAnterior:
+    """Alumno con el modelo anterior (atributos en __dict__, MAC en texto)"""
+    def __init__(self, nombre, codigo, mac):
+        self.nombre = nombre
+        self.codigo = codigo
+        self.mac = mac.upper()
+
+
+class ConexionAnterior:
+    """Conexión con el modelo anterior"""
+    def __init__(self, handler, alumno_mac, servidor_ip, servicio,
+                 codigo_alumno=None, nombre_servidor=None, cursos=()):
+        self.handler = handler
+        self.alumno_mac = alumno_mac
+        self.servidor_ip = servidor_ip
+        self.servicio = servicio
+        self.codigo_alumno = codigo_alumno
+        self.nombre_servidor = nombre_servidor
+        self.cursos = set(cursos)
+        self.flow_entries = []
+
+
+def bytes_por_elemento(construir, n: int) -> float:
+    """Memoria asignada por elemento al construir n elementos"""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    elementos = construir(n)
+    usado = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del elementos
+    return usado / n
+
+
+def bench_memoria(args):
+    """Comparar bytes por alumno y por conexión entre el modelo anterior y el actual"""
+    n = args.n
+
+    # Los textos se generan como los produciría el parser YAML: una copia por aparición
+    def alumnos_anterior(n):
+        alumnos = {}
+        curso = []
+        for i in range(n):
+            codigo = f"{20200000 + i}"
+            alumnos[codigo] = AlumnoAnterior(f"Alumno {i}", codigo, mac_de(i).lower())
+            curso.append(f"{20200000 + i}")
+        return alumnos, curso
+
+    def alumnos_actual(n):
+        alumnos = {}
+        curso = Curso("TEL354", "Redes")
+        for i in range(n):
+            codigo = f"{20200000 + i}"
+            alumnos[codigo] = Alumno(f"Alumno {i}", codigo, mac_de(i).lower())
+        curso.alumnos = [f"{20200000 + i}" for i in range(n)]
+        return alumnos, curso
+
+    def conexiones_anterior(n):
+        conexiones = {}
+        for i in range(n):
+            c = ConexionAnterior(f"conn_{i}", mac_de(i), "10.0.0.3", "ssh", f"{20200000 + i}", "Servidor 1", ["TEL354"])
+            c.flow_entries = [f"flow_{i}_{s}" for s in range(3)]
+            conexiones[c.handler] = c
+        return conexiones
+
+    def conexiones_actual(n):
+        conexiones = {}
+        for i in range(n):
+            c = Conexion(f"conn_{i}", mac_de(i), "10.0.0.3", "ssh", f"{20200000 + i}", "Servidor 1", ["TEL354"])
+            c.flow_entries = [f"flow_{i}_{s}" for s in range(3)]
+            conexiones[c.handler] = c
+        return conexiones
+
+    print(f"{'Elemento':<10} {'Anterior':>10} {'Actual':>10} {'Ahorro':>8}")
+    for nombre, anterior, actual in (("alumno", alumnos_anterior, alumnos_actual),
+                                      ("conexión", conexiones_anterior, conexiones_actual)):
+        b_anterior = bytes_por_elemento(anterior, n)
+        b_actual = bytes_por_elemento(actual, n)
+        print(f"{nombre:<10} {b_anterior:>9.0f}B {b_actual:>9.0f}B {1 - b_actual / b_anterior:>7.0%}")
+
+
+def percentil(muestras: list, p: float) -> float:
+    ordenadas = sorted(muestras)
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+
+def resumir(muestras: list, duracion: float) -> dict:
+    """p50/p99 en milisegundos y operaciones por segundo"""
+    return {
+        'n': len(muestras),
+        'p50_ms': percentil(muestras, 50) * 1000,
+        'p99_ms': percentil(muestras, 99) * 1000,
+        'media_ms': statistics.fmean(muestras) * 1000,
+        'ops_s': len(muestras) / duracion if duracion else 0.0
+    }
+
+
+def cronometrar(operaciones) -> dict:
+    """Ejecutar una secuencia de operaciones midiendo cada una"""
+    muestras = []
+    inicio = time.perf_counter()
+    with silencio():
+        for operacion in operaciones:
+            t = time.perf_counter()
+            operacion()
+            muestras.append(time.perf_counter() - t)
+    return resumir(muestras, time.perf_counter() - inicio)
+
+
+def revision_git() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+
+def bench_suite(args):
+    """crear_conexion, eliminar_conexion, alumno_autorizado e importar_yaml contra el controlador simulado"""
+    resultados = {'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"), 'revision': revision_git(),
+                  'latencia': args.latencia, 'switches': args.switches, 'tamaños': {}}
+    for n in args.alumnos:
+        rnd = random.Random(n)
+        with FloodlightSimulado(args.switches, n, args.latencia) as simulado:
+            app = generar_app(n, floodlight=FloodlightClient(simulado.url))
+            codigos = list(app.alumnos)
+            autorizados = [c for c in codigos if app.permisos.get(c)]
+            medidas = {}
+
+            consultas = [(rnd.choice(codigos), rnd.choice(["ssh", "web"])) for _ in range(args.consultas)]
+            medidas['alumno_autorizado'] = cronometrar(
+                lambda c=c, s=s: app.alumno_autorizado(c, "Servidor 1", s) for c, s in consultas
+            )
+
+            elegidos = rnd.sample(autorizados, min(args.conexiones, len(autorizados)))
+            medidas['crear_conexion'] = cronometrar(
+                lambda c=c: app.crear_conexion(c, "Servidor 1", "ssh") for c in elegidos
+            )
+            handlers = list(app.conexiones)
+            medidas['eliminar_conexion'] = cronometrar(
+                lambda h=h: app.eliminar_conexion(h) for h in handlers
+            )
+
+            with tempfile.TemporaryDirectory() as tmp:
+                ruta_yaml = os.path.join(tmp, "datos.yaml")
+                with silencio():
+                    app.exportar_yaml(ruta_yaml)
+                medidas['importar_yaml'] = cronometrar(
+                    lambda: SDNApp(app.floodlight).importar_yaml(ruta_yaml) for _ in range(args.repeticiones)
+                )
+                medidas['importar_yaml_rapido'] = cronometrar(
+                    lambda: SDNApp(app.floodlight).importar_yaml_rapido(ruta_yaml) for _ in range(args.repeticiones)
+                )
+            medidas['solicitudes_controlador'] = simulado.solicitudes
+        resultados['tamaños'][str(n)] = medidas
+        imprimir_medidas(n, medidas)
+
+    os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_RESULTADOS, f"suite_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(ruta, 'w', encoding='utf-8') as file:
+        json.dump(resultados, file, indent=2)
+    print(f"\nResultados guardados en {ruta}")
+
+
+def imprimir_medidas(n: int, medidas: dict):
+    print(f"\n{n} alumnos ({medidas.get('solicitudes_controlador', 0)} solicitudes al controlador)")
+    print(f"{'Operación':<22} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>10}")
+    for operacion, m in medidas.items():
+        if isinstance(m, dict):
+            print(f"{operacion:<22} {m['n']:>6} {m['p50_ms']:>9.3f} {m['p99_ms']:>9.3f} {m['ops_s']:>10.1f}")
+
+
+def bench_agrupado(args):
+    """crear_conexion desde varios clientes simultáneos, una por una frente a agrupadas en lotes"""
+    print(f"{'Modo':<12} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'conex/s':>10} {'solicitudes':>12}")
+    for modo in ("individual", "agrupado"):
+        with FloodlightSimulado(args.switches, args.alumnos, args.latencia) as simulado:
+            with silencio():
+                app = generar_app(args.alumnos, floodlight=FloodlightClient(simulado.url))
+                app.device_cache.refrescar()
+            autorizados = [c for c in app.alumnos if app.permisos.get(c)]
+            elegidos = random.Random(args.alumnos).sample(autorizados, min(args.conexiones, len(autorizados)))
+            simulado.solicitudes = 0
+
+            def crear(codigo):
+                t = time.perf_counter()
+                if modo == "agrupado":
+                    app.crear_conexion_agrupada(codigo, "Servidor 1", "ssh").result()
+                else:
+                    app.crear_conexion(codigo, "Servidor 1", "ssh")
+                return time.perf_counter() - t
+
+            inicio = time.perf_counter()
+            with silencio(), ThreadPoolExecutor(max_workers=args.clientes) as clientes:
+                muestras = list(clientes.map(crear, elegidos))
+            m = resumir(muestras, time.perf_counter() - inicio)
+            print(f"{modo:<12} {m['n']:>6} {m['p50_ms']:>9.3f} {m['p99_ms']:>9.3f} "
+                  f"{m['ops_s']:>10.1f} {simulado.solicitudes:>12}")
+            if modo == "agrupado":
+                print(f"Lotes: {app._agrupador.estadisticas()}")
+
+
+def bench_prioridades(args):
+    """Latencia de crear_conexion mientras se provisionan cursos completos en segundo plano,
+    con el límite fijo de solicitudes simultáneas frente al limitador adaptativo con prioridades"""
+    print(f"{'Modo':<12} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'masivo s':>9} {'límite':>7} {'espera p0 ms':>13} {'espera p1 ms':>13}")
+    for modo in ("fijo", "adaptativo"):
+        limitador = LimitadorAdaptativo(inicial=FLOODLIGHT_POOL, adaptativo=False) if modo == "fijo" else None
+        with FloodlightSimulado(args.switches, args.alumnos, args.latencia, capacidad=args.capacidad) as simulado:
+            with silencio():
+                app = generar_app(args.alumnos, n_cursos=args.cursos,
+                                  floodlight=FloodlightClient(simulado.url, limitador=limitador))
+                app.device_cache.refrescar()
+            cursos = list(app.cursos)
+            en_cursos = {c for curso in app.cursos.values() for c in curso.alumnos}
+            # Los alumnos interactivos no están en los cursos que se provisionan en segundo plano
+            autorizados = [c for c in app.alumnos if app.permisos.get(c)]
+            elegidos = [c for c in autorizados if c not in en_cursos][:args.conexiones] or autorizados[:args.conexiones]
+            for curso in cursos[len(cursos) // 2:]:
+                del app.cursos[curso]
+            masivos = cursos[:len(cursos) // 2]
+
+            def masivo():
+                t = time.perf_counter()
+                for curso in masivos:
+                    app.crear_conexiones_curso(curso)
+                return time.perf_counter() - t
+
+            muestras = []
+            with silencio(), ThreadPoolExecutor(max_workers=1) as fondo:
+                duracion = fondo.submit(masivo)
+                time.sleep(args.latencia * 10)
+                inicio = time.perf_counter()
+                for codigo in elegidos:
+                    t = time.perf_counter()
+                    app.crear_conexion(codigo, "Servidor 1", "web")
+                    muestras.append(time.perf_counter() - t)
+                m = resumir(muestras, time.perf_counter() - inicio)
+                duracion = duracion.result()
+            e = app.floodlight.limitador.estadisticas()
+            print(f"{modo:<12} {m['n']:>6} {m['p50_ms']:>9.3f} {m['p99_ms']:>9.3f} {duracion:>9.2f} {e['limite']:>7} "
+                  f"{e.get('espera_media_ms_p0', 0.0):>13.3f} {e.get('espera_media_ms_p1', 0.0):>13.3f}")
+
+
+def bench_shards(args):
+    """Provisionamiento de cursos completos con la red repartida entre 1, 2, 4... controladores
+    simulados, cada uno con su propia capacidad y dueño de un bloque contiguo de switches.
+    Los servidores cuelgan del último switch, así que el último bloque recibe más flows y marca el tiempo"""
+    print(f"{'Controladores':>13} {'conexiones':>11} {'flows':>7} {'duración s':>11} {'flows/s':>9}  Solicitudes por controlador")
+    for n in args.controladores:
+        dpids = [dpid_de(i + 1) for i in range(args.switches)]
+        bloques = [dpids[k * len(dpids) // n:(k + 1) * len(dpids) // n] for k in range(n)]
+        simulados = [
+            FloodlightSimulado(args.switches, args.alumnos, args.latencia, capacidad=args.capacidad,
+                               propios=bloque).iniciar()
+            for bloque in bloques
+        ]
+        try:
+            # Los enlaces de la topología lineal que unen bloques no los ve ningún controlador
+            frontera = [
+                {'src-switch': a[-1], 'src-port': 1, 'dst-switch': b[0], 'dst-port': 2,
+                 'type': 'internal', 'direction': 'bidirectional'}
+                for a, b in zip(bloques, bloques[1:])
+            ]
+            if n == 1:
+                floodlight = FloodlightClient(simulados[0].url)
+            else:
+                floodlight = FloodlightFederado({s.url: b for s, b in zip(simulados, bloques)}, frontera)
+            with silencio():
+                app = generar_app(args.alumnos, n_cursos=args.cursos, floodlight=floodlight)
+                app.device_cache.refrescar()
+            for simulado in simulados:
+                simulado.solicitudes = 0
+
+            inicio = time.perf_counter()
+            with silencio():
+                for curso in list(app.cursos):
+                    app.crear_conexiones_curso(curso)
+            duracion = time.perf_counter() - inicio
+            flows = sum(len(simulado.flows) for simulado in simulados)
+            print(f"{n:>13} {len(app.conexiones):>11} {flows:>7} {duracion:>11.2f} {flows / duracion:>9.1f}  "
+                  f"{' '.join(str(simulado.solicitudes) for simulado in simulados)}")
+            floodlight.cerrar()
+        finally:
+            for simulado in simulados:
+                simulado.detener()
+
+
+def bench_arranque(args):
+    """Tiempo de arranque en frío de comandos de una sola operación (un proceso nuevo por corrida)"""
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        estado = os.path.join(tmp, "estado.db")
+        with silencio():
+            app = generar_app(args.alumnos)
+            app.guardar_snapshot(estado)
+        codigo = next(c for c in app.alumnos if app.permisos.get(c))
+        pesados = "import sys; print('cargados:', *[m for m in ('yaml', 'requests', 'numpy') if m in sys.modules], file=sys.stderr)"
+        casos = [
+            ("python vacío", [sys.executable, "-c", pesados]),
+            ("importar módulo", [sys.executable, "-c", "import controller_20210535; " + pesados]),
+            ("importar + yaml/requests/numpy", [sys.executable, "-c",
+                                                "import yaml, requests, numpy, controller_20210535; " + pesados]),
+            ("cli autorizar", [sys.executable, "-c", "import cli; cli.main(['--estado', %r, 'autorizar', '%s', "
+                               "'Servidor 1', 'ssh']); %s" % (estado, codigo, pesados)]),
+            ("cli listar servidores", [sys.executable, "-c", "import cli; cli.main(['--estado', %r, 'listar', "
+                                       "'servidores']); %s" % (estado, pesados)]),
+        ]
+        print(f"{args.alumnos} alumnos en el snapshot, {args.repeticiones} corridas por caso")
+        print(f"{'Caso':<32} {'p50 ms':>9} {'min ms':>9}  Módulos pesados cargados")
+        for nombre, comando in casos:
+            muestras = []
+            for _ in range(args.repeticiones):
+                t = time.perf_counter()
+                proceso = subprocess.run(comando, cwd=directorio, capture_output=True, text=True, check=True)
+                muestras.append(time.perf_counter() - t)
+            cargados = proceso.stderr.strip().splitlines()[-1].split()[1:]
+            print(f"{nombre:<32} {percentil(muestras, 50) * 1000:>9.1f} {min(muestras) * 1000:>9.1f}  "
+                  f"{' '.join(cargados) or '-'}")
+
+
+def bench_comparar(args):
+    """Comparar dos corridas guardadas de la suite"""
+    with open(args.base, encoding='utf-8') as file:
+        base = json.load(file)
+    with open(args.nueva, encoding='utf-8') as file:
+        nueva = json.load(file)
+    print(f"{base['revision']} -> {nueva['revision']}")
+    print(f"{'Alumnos':>8} {'Operación':<22} {'p50 base':>9} {'p50 nuevo':>10} {'Cambio':>8}")
+    for n, medidas in nueva['tamaños'].items():
+        for operacion, m in medidas.items():
+            anterior = base['tamaños'].get(n, {}).get(operacion)
+            if isinstance(m, dict) and isinstance(anterior, dict) and anterior['p50_ms']:
+                cambio = m['p50_ms'] / anterior['p50_ms'] - 1
+                print(f"{n:>8} {operacion:<22} {anterior['p50_ms']:>9.3f} {m['p50_ms']:>10.3f} {cambio:>+8.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la aplicación SDN")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = subparsers.add_parser("snapshot", help="Snapshot SQLite frente a exportar/importar YAML")
+    p.add_argument("--alumnos", type=int, nargs="+", default=[1000, 10000, 50000])
+    p.set_defaults(funcion=bench_snapshot)
+
+    p = subparsers.add_parser("memoria", help="Bytes por alumno y por conexión")
+    p.add_argument("-n", type=int, default=100000)
+    p.set_defaults(funcion=bench_memoria)
+
+    p = subparsers.add_parser("suite", help="Latencia y throughput contra el controlador simulado")
+    p.add_argument("--alumnos", type=int, nargs="+", default=[100, 1000, 10000])
+    p.add_argument("--switches", type=int, default=5)
+    p.add_argument("--latencia", type=float, default=0.001, help="latencia inyectada por solicitud (s)")
+    p.add_argument("--consultas", type=int, default=10000)
+    p.add_argument("--conexiones", type=int, default=200)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(funcion=bench_suite)
+
+    p = subparsers.add_parser("agrupado", help="Conexiones por segundo con y sin agrupar solicitudes")
+    p.add_argument("--alumnos", type=int, default=5000)
+    p.add_argument("--switches", type=int, default=5)
+    p.add_argument("--latencia", type=float, default=0.002, help="latencia inyectada por solicitud (s)")
+    p.add_argument("--conexiones", type=int, default=1000)
+    p.add_argument("--clientes", type=int, default=64, help="hilos que crean conexiones a la vez")
+    p.set_defaults(funcion=bench_agrupado)
+
+    p = subparsers.add_parser("prioridades", help="Latencia interactiva durante provisionamiento masivo")
+    p.add_argument("--alumnos", type=int, default=2000)
+    p.add_argument("--cursos", type=int, default=8)
+    p.add_argument("--switches", type=int, default=5)
+    p.add_argument("--latencia", type=float, default=0.002, help="latencia inyectada por solicitud (s)")
+    p.add_argument("--capacidad", type=int, default=4, help="solicitudes que el controlador atiende a la vez")
+    p.add_argument("--conexiones", type=int, default=100, help="conexiones interactivas medidas")
+    p.set_defaults(funcion=bench_prioridades)
+
+    p = subparsers.add_parser("shards", help="Throughput de instalación de flows según la cantidad de controladores")
+    p.add_argument("--controladores", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--alumnos", type=int, default=500)
+    p.add_argument("--cursos", type=int, default=4)
+    p.add_argument("--switches", type=int, default=8)
+    p.add_argument("--latencia", type=float, default=0.01, help="latencia inyectada por solicitud (s)")
+    p.add_argument("--capacidad", type=int, default=2, help="solicitudes que cada controlador atiende a la vez")
+    p.set_defaults(funcion=bench_shards)
+
+    p = subparsers.add_parser("arranque", help="Arranque en frío de la línea de comandos")
+    p.add_argument("--alumnos", type=int, default=1000)
+    p.add_argument("--repeticiones", type=int, default=20)
+    p.set_defaults(funcion=bench_arranque)
+
+    p = subparsers.add_parser("comparar", help="Comparar dos resultados de la suite")
+    p.add_argument("base")
+    p.add_argument("nueva")
+    p.set_defaults(funcion=bench_comparar)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+TEL354 - Laboratorio 6: Línea de comandos no interactiva de la aplicación SDN
+Cada comando escribe su resultado como JSON en stdout; los mensajes de la aplicación
+van a stderr. El estado se conserva entre invocaciones en un snapshot o en una bitácora.
+Uso: python3 cli.py [--estado estado.db | --bitacora cambios.log] <comando> [argumentos]
+     python3 cli.py --estado estado.db lote comandos.txt   (un comando por línea, salida NDJSON)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shlex
+import sys
+from typing import Dict, List, Optional
+
+from controller_20210535 import FLOODLIGHT_URL, RUTEO_LOCAL, SNAPSHOT_EXTENSION, SDNApp, crear_cliente_floodlight
+
+# Listados disponibles en el comando listar
+LISTADOS = ("alumnos", "cursos", "servidores", "conexiones")
+
+
+class ErrorComando(Exception):
+    """Error de uso de un comando (argumentos inválidos, elementos inexistentes)"""
+
+
+class _Parser(argparse.ArgumentParser):
+    # En modo lote un comando mal escrito no debe terminar el proceso
+    def error(self, mensaje):
+        raise ErrorComando(mensaje)
+
+
+def _clave(tabla: Dict, valor, tipo: str):
+    """Buscar una clave aceptando códigos numéricos recibidos como texto"""
+    if valor in tabla:
+        return valor
+    try:
+        numero = int(valor)
+    except ValueError:
+        numero = None
+    if numero not in tabla:
+        raise ErrorComando(f"{tipo} {valor} no encontrado")
+    return numero
+
+
+# Comandos: reciben la aplicación y los argumentos y devuelven el resultado como dict
+
+def importar(app: SDNApp, args) -> Dict:
+    if args.archivo.endswith(SNAPSHOT_EXTENSION):
+        ok = app.cargar_snapshot(args.archivo)
+    elif args.rapido:
+        ok = app.importar_yaml_rapido(args.archivo) is not None
+    else:
+        ok = app.importar_yaml(args.archivo)
+    return {'ok': ok, 'alumnos': len(app.alumnos), 'cursos': len(app.cursos),
+            'servidores': len(app.servidores)}
+
+
+def autorizar(app: SDNApp, args) -> Dict:
+    codigo = _clave(app.alumnos, args.alumno, "alumno")
+    return {'ok': True, 'autorizado': app.alumno_autorizado(codigo, args.servidor, args.servicio)}
+
+
+def conectar(app: SDNApp, args) -> Dict:
+    codigo = _clave(app.alumnos, args.alumno, "alumno")
+    handler = app.crear_conexion(codigo, args.servidor, args.servicio, args.vida, args.inactividad)
+    if handler is None:
+        return {'ok': False}
+    return {'ok': True, 'conexion': app.conexiones[handler].to_dict()}
+
+
+def conectar_curso(app: SDNApp, args) -> Dict:
+    codigo = _clave(app.cursos, args.curso, "curso")
+    resultados = app.crear_conexiones_curso(codigo)
+    if resultados is None:
+        return {'ok': False}
+    creadas = sum(1 for r in resultados if r['handler'])
+    # parcial: algunas conexiones se crearon aunque otras fallaron, y el estado debe guardarse
+    return {'ok': creadas == len(resultados), 'parcial': 0 < creadas < len(resultados),
+            'creadas': creadas, 'conexiones': resultados}
+
+
+def desconectar(app: SDNApp, args) -> Dict:
+    faltantes = [h for h in args.handlers if h not in app.conexiones]
+    if faltantes:
+        raise ErrorComando(f"conexiones no encontradas: {', '.join(faltantes)}")
+    if len(args.handlers) == 1:
+        resultado = {args.handlers[0]: app.eliminar_conexion(args.handlers[0])}
+    else:
+        resultado = app.eliminar_conexiones(args.handlers)
+    return {'ok': all(resultado.values()), 'eliminadas': resultado}
+
+
+def listar(app: SDNApp, args) -> Dict:
+    tabla = {'alumnos': app.alumnos, 'cursos': app.cursos,
+             'servidores': app.servidores, 'conexiones': app.conexiones}[args.que]
+    return {'ok': True, args.que: [elemento.to_dict() for elemento in tabla.values()]}
+
+
+def recolectar(app: SDNApp, args) -> Dict:
+    app.vida_conexiones = args.vida
+    app.inactividad_conexiones = args.inactividad
+    return {'ok': True, **app.recolectar_conexiones(presupuesto=float('inf'))}
+
+
+# Comandos que modifican el estado y obligan a guardar el snapshot
+MODIFICAN = {importar, conectar, conectar_curso, desconectar, recolectar}
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    parser = _Parser(prog="cli.py", description="Línea de comandos no interactiva de la aplicación SDN")
+    parser.add_argument("--floodlight", action="append", metavar="URL[=DPID,...]",
+                        help=f"controlador Floodlight y los switches que programa; repetir para varios "
+                             f"(por defecto {FLOODLIGHT_URL})")
+    parser.add_argument("--enlace", action="append", default=[], metavar="SRC/PUERTO/DST/PUERTO",
+                        help="enlace entre switches de controladores distintos")
+    parser.add_argument("--ruteo-local", action="store_true", default=RUTEO_LOCAL,
+                        help="calcular las rutas localmente en lugar de consultar a Floodlight")
+    estado = parser.add_mutually_exclusive_group()
+    estado.add_argument("--estado", metavar="ARCHIVO",
+                        help="snapshot que se carga al iniciar y se guarda si hubo cambios")
+    estado.add_argument("--bitacora", metavar="ARCHIVO",
+                        help="reproducir y registrar los cambios en esta bitácora")
+    comandos = parser.add_subparsers(dest="comando", required=True, parser_class=_Parser)
+
+    p = comandos.add_parser("importar", help="importar un archivo YAML o un snapshot")
+    p.add_argument("archivo")
+    p.add_argument("--rapido", action="store_true", help="importar el YAML con libyaml en streaming")
+    p.set_defaults(funcion=importar)
+
+    p = comandos.add_parser("autorizar", help="verificar si un alumno puede acceder a un servicio")
+    p.add_argument("alumno")
+    p.add_argument("servidor")
+    p.add_argument("servicio")
+    p.set_defaults(funcion=autorizar)
+
+    p = comandos.add_parser("conectar", help="crear una conexión alumno -> servicio")
+    p.add_argument("alumno")
+    p.add_argument("servidor")
+    p.add_argument("servicio")
+    p.add_argument("--vida", type=float, metavar="SEGUNDOS", help="eliminar la conexión tras este tiempo")
+    p.add_argument("--inactividad", type=float, metavar="SEGUNDOS",
+                   help="eliminar la conexión tras este tiempo sin tráfico")
+    p.set_defaults(funcion=conectar)
+
+    p = comandos.add_parser("conectar-curso", help="crear las conexiones de todos los alumnos de un curso")
+    p.add_argument("curso")
+    p.set_defaults(funcion=conectar_curso)
+
+    p = comandos.add_parser("desconectar", help="eliminar una o más conexiones")
+    p.add_argument("handlers", nargs="+")
+    p.set_defaults(funcion=desconectar)
+
+    p = comandos.add_parser("listar", help="listar alumnos, cursos, servidores o conexiones")
+    p.add_argument("que", choices=LISTADOS)
+    p.set_defaults(funcion=listar)
+
+    p = comandos.add_parser("recolectar", help="eliminar las conexiones vencidas e inactivas")
+    p.add_argument("--vida", type=float, metavar="SEGUNDOS",
+                   help="tiempo de vida de las conexiones que no fijan uno propio")
+    p.add_argument("--inactividad", type=float, metavar="SEGUNDOS",
+                   help="tiempo sin tráfico de las conexiones que no fijan uno propio")
+    p.set_defaults(funcion=recolectar)
+
+    p = comandos.add_parser("lote", help="ejecutar los comandos de un archivo (o de stdin con -)")
+    p.add_argument("archivo", nargs="?", default="-")
+    p.set_defaults(funcion=None)
+    return parser
+
+
+class Sesion:
+    """Aplicación cargada una sola vez sobre la que se ejecutan uno o más comandos"""
+    def __init__(self, app: SDNApp, parser: argparse.ArgumentParser):
+        self.app = app
+        self.parser = parser
+        self.cambios = False
+
+    def ejecutar(self, argumentos: List[str]) -> Dict:
+        """Ejecutar un comando capturando los mensajes de la aplicación; los errores van en el resultado"""
+        mensajes = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(mensajes):
+                args = self.parser.parse_args(argumentos)
+                if args.funcion is None:
+                    raise ErrorComando(f"el comando {args.comando} no se puede usar dentro de un lote")
+                resultado = args.funcion(self.app, args)
+                resultado['comando'] = args.comando
+                self.cambios |= (resultado['ok'] or resultado.get('parcial', False)) and args.funcion in MODIFICAN
+        except ErrorComando as e:
+            resultado = {'ok': False, 'error': str(e)}
+        except SystemExit:  # --help dentro de un lote
+            resultado = {'ok': False, 'error': "ayuda mostrada en stderr"}
+        except Exception as e:
+            resultado = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        texto = mensajes.getvalue()
+        sys.stderr.write(texto)
+        if not resultado['ok'] and 'error' not in resultado:
+            # El último mensaje de la aplicación explica el fallo
+            lineas = [linea for linea in texto.splitlines() if linea.strip()]
+            resultado['error'] = lineas[-1].strip() if lineas else "operación fallida"
+        return resultado
+
+
+def _comandos_de(archivo: str):
+    """Líneas de un archivo de lote separadas como argumentos; se ignoran vacías y comentarios"""
+    entrada = sys.stdin if archivo == "-" else open(archivo, encoding='utf-8')
+    with entrada:
+        for linea in entrada:
+            argumentos = shlex.split(linea, comments=True)
+            if argumentos:
+                yield argumentos
+
+
+def _escribir(resultado: Dict):
+    sys.stdout.write(json.dumps(resultado, ensure_ascii=False, default=str) + "\n")
+
+
+def main(argumentos: Optional[List[str]] = None) -> int:
+    parser = crear_parser()
+    try:
+        args = parser.parse_args(argumentos)
+    except ErrorComando as e:
+        parser.print_usage(sys.stderr)
+        _escribir({'ok': False, 'error': str(e)})
+        return 2
+
+    with contextlib.redirect_stdout(sys.stderr):
+        app = SDNApp(crear_cliente_floodlight(args.floodlight or [FLOODLIGHT_URL], args.enlace),
+                     ruteo_local=args.ruteo_local)
+        if args.estado and os.path.exists(args.estado):
+            app.cargar_snapshot(args.estado)
+        elif args.bitacora:
+            app.abrir_bitacora(args.bitacora)
+
+    sesion = Sesion(app, parser)
+    try:
+        if args.comando == "lote":
+            fallidos = 0
+            for comando in _comandos_de(args.archivo):
+                resultado = sesion.ejecutar(comando)
+                fallidos += not resultado['ok']
+                _escribir(resultado)
+            codigo = 1 if fallidos else 0
+        else:
+            resultado = sesion.ejecutar(argumentos if argumentos is not None else sys.argv[1:])
+            _escribir(resultado)
+            codigo = 0 if resultado['ok'] else 1
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.estado and sesion.cambios:
+                app.guardar_snapshot(args.estado)
+            app.cerrar_bitacora()
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,23 +5,233 @@ Nombres: Roberto Carlos Tafur Herrera
 Código: 20210535
 """
 
-import yaml
+import heapq
 import json
-import requests
+import os
+import sqlite3
 import sys
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional, Tuple
 
+# PyYAML, requests y NumPy se importan recién cuando se usan, para que los comandos
+# que no los necesitan arranquen rápido (ver _cargar_yaml, _cargar_numpy y FloodlightClient.session)
+yaml = None
+np = None
+
 # Configuración del controlador Floodlight
 FLOODLIGHT_HOST = "localhost"
 FLOODLIGHT_PORT = 8080
 FLOODLIGHT_URL = f"http://{FLOODLIGHT_HOST}:{FLOODLIGHT_PORT}"
 
+# Cliente REST: timeouts por endpoint (segundos), reintentos y tamaño del pool
+FLOODLIGHT_TIMEOUTS = {
+    'dispositivos': 10.0,
+    'enlaces': 5.0,
+    'ruta': 5.0,
+    'flows': 20.0,
+    'estadisticas': 20.0
+}
+FLOODLIGHT_REINTENTOS = 3
+FLOODLIGHT_BACKOFF = 0.2
+FLOODLIGHT_POOL = 32
+
+# Hilos para instalar/eliminar flows en paralelo
+FLOW_WORKERS = 16
+
+# Límite adaptativo de solicitudes simultáneas al controlador (AIMD): valor inicial, mínimo,
+# latencia promedio tolerada respecto de la mínima observada y peso de cada muestra en el promedio
+LIMITADOR_INICIAL = 8
+LIMITADOR_MINIMO = 1
+LIMITADOR_TOLERANCIA = 3.0
+LIMITADOR_SUAVIZADO = 0.1
+# Segundos tras los que la latencia mínima se vuelve a medir, para seguir cambios duraderos de latencia
+LIMITADOR_VENTANA = 10.0
+
+# Prioridades de las solicitudes al controlador (menor valor se atiende primero)
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_MASIVA = 1
+
+# Prefijo de los flows que crea la aplicación; la reconciliación no toca los demás
+FLOW_PREFIJO = "flow_"
+
+# Métricas: deshabilitadas por defecto; los límites de los histogramas están en segundos
+METRICAS_HABILITADAS = False
+METRICAS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Archivos con esta extensión se tratan como snapshots binarios en lugar de YAML
+SNAPSHOT_EXTENSION = ".db"
+
+# MAC del servidor usada cuando su IP aún no aparece en la tabla de dispositivos
+SERVIDOR_MAC = "FA:16:3E:5F:6E:D7"
+
+# Caché de dispositivos (segundos)
+DEVICE_CACHE_TTL = 30.0
+DEVICE_CACHE_INTERVALO_MINIMO = 1.0
+
+# Caché de rutas: cada cuántos segundos se verifica si cambió el conjunto de enlaces
+ROUTE_CACHE_INTERVALO_ENLACES = 5.0
+
+# Calcular rutas localmente sobre la topología en lugar de usar /wm/topology/route
+RUTEO_LOCAL = False
+
+# Vigilante de topología: segundos entre revisiones y conexiones re-enrutadas como máximo por revisión
+TOPOLOGIA_INTERVALO = 2.0
+TOPOLOGIA_MAX_REENRUTAR = 100
+
+# Bitácora de cambios: segundos entre fsync y entradas tras las que se compacta en un snapshot
+BITACORA_INTERVALO = 0.05
+BITACORA_MAX_ENTRADAS = 100000
+
+# Agrupación de solicitudes de conexión: ventana de espera (segundos) y tamaño máximo de lote
+AGRUPADOR_VENTANA = 0.005
+AGRUPADOR_MAXIMO = 256
+
+# Vigencia de las conexiones (segundos): tiempo de vida y tiempo sin tráfico antes de eliminarlas.
+# None = sin límite; cada conexión puede fijar los suyos
+CONEXION_VIDA = None
+CONEXION_INACTIVIDAD = None
+
+# Recolector de conexiones vencidas: segundos entre pasadas, tiempo máximo por pasada
+# y conexiones eliminadas por lote
+RECOLECTOR_INTERVALO = 30.0
+RECOLECTOR_PRESUPUESTO = 0.5
+RECOLECTOR_LOTE = 50
+
+# Campos de match de OpenFlow 1.3 que devuelven las estadísticas, con su nombre en los flows estáticos
+CAMPOS_MATCH = {
+    'eth_src': 'dl_src', 'eth_dst': 'dl_dst', 'eth_type': 'dl_type',
+    'ipv4_src': 'nw_src', 'ipv4_dst': 'nw_dst', 'ip_proto': 'nw_proto',
+    'tcp_src': 'tp_src', 'tcp_dst': 'tp_dst', 'udp_src': 'tp_src', 'udp_dst': 'tp_dst'
+}
+
+def _cargar_yaml():
+    """Importar PyYAML la primera vez que se necesita"""
+    global yaml
+    if yaml is None:
+        import yaml
+    return yaml
+
+def _cargar_numpy():
+    """Importar NumPy la primera vez que se necesita; None si no está instalado"""
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:  # Sin NumPy las consultas de políticas recorren los cursos
+            np = False
+    return np or None
+
+def _match_normalizado(match: Dict) -> frozenset:
+    """Match comparable entre un flow estático y las estadísticas del switch
+    (nombres de OpenFlow 1.0, números como enteros y MACs en minúsculas)"""
+    campos = []
+    for campo, valor in match.items():
+        valor = str(valor).lower()
+        try:
+            # Floodlight devuelve algunos tipos como "0x0x800"
+            valor = int(valor.replace("0x0x", "0x"), 0)
+        except ValueError:
+            pass
+        campos.append((CAMPOS_MATCH.get(campo, campo), valor))
+    return frozenset(campos)
+
+def _yaml_loader():
+    """Loader seguro de libyaml si está disponible, o el de Python puro"""
+    yaml = _cargar_yaml()
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def _tag_escalar(loader, evento) -> str:
+    tag = evento.tag
+    if tag is None or tag == '!':
+        tag = loader.resolve(yaml.ScalarNode, evento.value, evento.implicit)
+    return tag
+
+def _valor_yaml(loader, anclas: Dict):
+    """Construir el siguiente valor del flujo de eventos YAML sin armar el árbol de nodos"""
+    evento = loader.get_event()
+    if isinstance(evento, yaml.AliasEvent):
+        return anclas[evento.anchor]
+    if isinstance(evento, yaml.ScalarEvent):
+        tag = _tag_escalar(loader, evento)
+        constructor = loader.yaml_constructors.get(tag, loader.yaml_constructors[None])
+        valor = constructor(loader, yaml.ScalarNode(tag, evento.value, style=evento.style))
+    elif isinstance(evento, yaml.SequenceStartEvent):
+        valor = []
+        while not loader.check_event(yaml.SequenceEndEvent):
+            valor.append(_valor_yaml(loader, anclas))
+        loader.get_event()
+    elif isinstance(evento, yaml.MappingStartEvent):
+        valor, fusion = {}, []
+        while not loader.check_event(yaml.MappingEndEvent):
+            siguiente = loader.peek_event()
+            if (isinstance(siguiente, yaml.ScalarEvent)
+                    and _tag_escalar(loader, siguiente) == 'tag:yaml.org,2002:merge'):
+                # Clave de fusión (<<: *base o <<: [*a, *b]) con la misma precedencia que
+                # SafeConstructor.flatten_mapping: las claves propias ganan y luego las primeras bases
+                loader.get_event()
+                bases = _valor_yaml(loader, anclas)
+                bases = bases if isinstance(bases, list) else [bases]
+                if not all(isinstance(base, dict) for base in bases):
+                    raise yaml.YAMLError("Una clave de fusión (<<) debe referirse a mapeos")
+                fusion.extend(reversed(bases))
+            else:
+                clave = _valor_yaml(loader, anclas)
+                valor[clave] = _valor_yaml(loader, anclas)
+        loader.get_event()
+        if fusion:
+            combinado = {}
+            for base in fusion:
+                combinado.update(base)
+            combinado.update(valor)
+            valor = combinado
+    else:
+        raise yaml.YAMLError(f"Evento YAML inesperado: {evento}")
+    if evento.anchor:
+        anclas[evento.anchor] = valor
+    return valor
+
+def mac_a_entero(mac) -> int:
+    """Convertir una MAC en texto (aa:bb:cc:dd:ee:ff, seis octetos) a un entero de 48 bits"""
+    if isinstance(mac, int):
+        return mac
+    octetos = mac.strip().replace('-', ':').split(':')
+    if len(octetos) != 6 or not all(len(octeto) in (1, 2) for octeto in octetos):
+        raise ValueError(f"MAC inválida: {mac}")
+    return int("".join(octeto.zfill(2) for octeto in octetos), 16)
+
+def entero_a_mac(valor: int) -> str:
+    """Formatear un entero de 48 bits como MAC en mayúsculas"""
+    texto = f"{valor:012X}"
+    return ":".join(texto[i:i + 2] for i in range(0, 12, 2))
+
+def _internar(valor):
+    """Internar códigos y nombres en texto para compartir una sola copia"""
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
 class Alumno:
     """Clase para representar un alumno"""
-    def __init__(self, nombre: str, codigo: str, mac: str):
+    __slots__ = ('nombre', 'codigo', '_mac', '_mac_texto')
+    
+    def __init__(self, nombre: str, codigo: str, mac):
         self.nombre = nombre
-        self.codigo = codigo
-        self.mac = mac.upper()  
+        self.codigo = _internar(codigo)
+        self.mac = mac
+    
+    @property
+    def mac(self) -> str:
+        # El texto se arma en el primer uso y se conserva: crear conexiones lo consulta por cada flow
+        if self._mac_texto is None:
+            self._mac_texto = entero_a_mac(self._mac)
+        return self._mac_texto
+    
+    @mac.setter
+    def mac(self, mac):
+        self._mac = mac_a_entero(mac)
+        self._mac_texto = None
     
     def __str__(self):
         return f"Alumno: {self.nombre} ({self.codigo}) - MAC: {self.mac}"
@@ -35,9 +245,11 @@ class Alumno:
 
 class Servicio:
     """Clase para representar un servicio"""
+    __slots__ = ('nombre', 'protocolo', 'puerto')
+    
     def __init__(self, nombre: str, protocolo: str, puerto: int):
-        self.nombre = nombre
-        self.protocolo = protocolo.upper()
+        self.nombre = _internar(nombre)
+        self.protocolo = _internar(protocolo.upper())
         self.puerto = puerto
     
     def __str__(self):
@@ -45,9 +257,11 @@ class Servicio:
 
 class Servidor:
     """Clase para representar un servidor"""
+    __slots__ = ('nombre', 'ip', 'servicios')
+    
     def __init__(self, nombre: str, ip: str, servicios: List[Dict] = None):
-        self.nombre = nombre
-        self.ip = ip
+        self.nombre = _internar(nombre)
+        self.ip = _internar(ip)
         self.servicios = []
         if servicios:
             for servicio in servicios:
@@ -86,29 +300,64 @@ class Servidor:
 
 class Curso:
     """Clase para representar un curso"""
+    __slots__ = ('_observador', 'codigo', 'nombre', '_estado', '_alumnos', 'servidores')
+    
     def __init__(self, codigo: str, nombre: str, estado: str = "DICTANDO"):
-        self.codigo = codigo
+        self._observador = None  # SDNApp que mantiene el índice de permisos
+        self.codigo = _internar(codigo)
         self.nombre = nombre
         self.estado = estado
         self.alumnos = []  # Lista de códigos de alumnos
         self.servidores = []  # Lista de configuraciones de servidor
     
+    @property
+    def estado(self) -> str:
+        return self._estado
+    
+    @estado.setter
+    def estado(self, estado: str):
+        anterior = getattr(self, '_estado', None)
+        self._estado = _internar(estado)
+        if self._observador and anterior != estado:
+            self._observador._curso_cambio_estado(self, anterior)
+    
+    @property
+    def alumnos(self) -> List:
+        return self._alumnos
+    
+    @alumnos.setter
+    def alumnos(self, codigos):
+        self._alumnos = [_internar(codigo) for codigo in dict.fromkeys(codigos or ())]
+    
     def agregar_alumno(self, codigo_alumno: str):
         """Agregar un alumno al curso"""
         if codigo_alumno not in self.alumnos:
-            self.alumnos.append(codigo_alumno)
+            self.alumnos.append(_internar(codigo_alumno))
+            if self._observador:
+                self._observador._curso_alumno_agregado(self, codigo_alumno)
     
     def remover_alumno(self, codigo_alumno: str):
         """Remover un alumno del curso"""
         if codigo_alumno in self.alumnos:
             self.alumnos.remove(codigo_alumno)
+            if self._observador:
+                self._observador._curso_alumno_removido(self, codigo_alumno)
     
     def agregar_servidor(self, nombre_servidor: str, servicios_permitidos: List[str]):
         """Agregar un servidor con servicios permitidos"""
-        self.servidores.append({
+        servidor_config = {
             'nombre': nombre_servidor,
             'servicios_permitidos': servicios_permitidos
-        })
+        }
+        self.servidores.append(servidor_config)
+        if self._observador:
+            self._observador._curso_servidor_agregado(self, servidor_config)
+    
+    def permisos(self):
+        """Pares (servidor, servicio) que otorga el curso"""
+        for servidor_config in self.servidores:
+            for nombre_servicio in servidor_config['servicios_permitidos']:
+                yield (servidor_config['nombre'], nombre_servicio)
     
     def __str__(self):
         return f"Curso: {self.codigo} - {self.nombre} ({self.estado})"
@@ -118,33 +367,1550 @@ class Curso:
             'codigo': self.codigo,
             'nombre': self.nombre,
             'estado': self.estado,
-            'alumnos': self.alumnos,
+            'alumnos': sorted(self.alumnos, key=str),
             'servidores': self.servidores
         }
 
 class Conexion:
     """Clase para representar una conexión activa"""
-    def __init__(self, handler: str, alumno_mac: str, servidor_ip: str, servicio: str):
+    __slots__ = ('handler', '_mac', 'servidor_ip', 'servicio', 'codigo_alumno',
+                 'nombre_servidor', 'cursos', 'flow_entries', 'ruta',
+                 'creada', 'actividad', 'vida', 'inactividad')
+    
+    def __init__(self, handler: str, alumno_mac, servidor_ip: str, servicio: str,
+                 codigo_alumno: str = None, nombre_servidor: str = None, cursos=()):
         self.handler = handler
-        self.alumno_mac = alumno_mac
-        self.servidor_ip = servidor_ip
-        self.servicio = servicio
-        self.flow_entries = [] 
+        self._mac = mac_a_entero(alumno_mac)
+        self.servidor_ip = _internar(servidor_ip)
+        self.servicio = _internar(servicio)
+        self.codigo_alumno = codigo_alumno  # Normalmente ya es la clave compartida de app.alumnos
+        self.nombre_servidor = _internar(nombre_servidor)
+        self.cursos = tuple(_internar(c) for c in cursos)  # Cursos que otorgaron el acceso
+        self.flow_entries = []  # Nombres de los flows instalados para la conexión
+        self.ruta = ()  # Saltos (switch, puerto) de la ruta instalada, como /wm/topology/route
+        self.creada = self.actividad = time.time()  # actividad: último tráfico observado
+        self.vida = None  # Segundos de vida e inactividad permitidos; None = los de la aplicación
+        self.inactividad = None
+    
+    @property
+    def alumno_mac(self) -> str:
+        return entero_a_mac(self._mac)
+    
+    def enlaces(self):
+        """Enlaces (switch, puerto, switch, puerto) que atraviesa la ruta"""
+        for i in range(1, len(self.ruta) - 1, 2):
+            yield self.ruta[i] + self.ruta[i + 1]
+    
+    def to_dict(self):
+        return {
+            'handler': self.handler,
+            'alumno': self.codigo_alumno,
+            'alumno_mac': self.alumno_mac,
+            'servidor': self.nombre_servidor,
+            'servidor_ip': self.servidor_ip,
+            'servicio': self.servicio,
+            'cursos': list(self.cursos),
+            'flows': list(self.flow_entries),
+            'creada': self.creada,
+            'actividad': self.actividad,
+            'vida': self.vida,
+            'inactividad': self.inactividad
+        }
     
     def __str__(self):
         return f"Conexión {self.handler}: {self.alumno_mac} -> {self.servidor_ip}:{self.servicio}"
 
+class RegistroConexiones(MutableMapping):
+    """Conexiones activas por handler, con índices por MAC, servidor, servicio y curso"""
+    def __init__(self):
+        self._conexiones = {}
+        self._por_mac = {}
+        self._por_servidor = {}
+        self._por_servicio = {}  # (servidor_ip, servicio) -> handlers
+        self._por_curso = {}
+        self._por_switch = {}
+        self._lock = threading.RLock()
+    
+    def _indices(self, conexion: Conexion):
+        yield self._por_mac, conexion._mac
+        yield self._por_servidor, conexion.servidor_ip
+        yield self._por_servicio, (conexion.servidor_ip, conexion.servicio)
+        for codigo_curso in conexion.cursos:
+            yield self._por_curso, codigo_curso
+        for switch in {salto[0] for salto in conexion.ruta}:
+            yield self._por_switch, switch
+    
+    def _desindexar(self, conexion: Conexion):
+        for indice, clave in self._indices(conexion):
+            handlers = indice.get(clave)
+            if handlers is not None:
+                handlers.discard(conexion.handler)
+                if not handlers:
+                    del indice[clave]
+    
+    def __getitem__(self, handler: str) -> Conexion:
+        return self._conexiones[handler]
+    
+    def __setitem__(self, handler: str, conexion: Conexion):
+        with self._lock:
+            if handler in self._conexiones:
+                self._desindexar(self._conexiones[handler])
+            self._conexiones[handler] = conexion
+            for indice, clave in self._indices(conexion):
+                indice.setdefault(clave, set()).add(handler)
+    
+    def __delitem__(self, handler: str):
+        with self._lock:
+            self._desindexar(self._conexiones.pop(handler))
+    
+    def __iter__(self):
+        # Iterar sobre una copia para tolerar altas y bajas desde otros hilos
+        with self._lock:
+            return iter(list(self._conexiones))
+    
+    def __len__(self):
+        return len(self._conexiones)
+    
+    def values(self) -> List[Conexion]:
+        with self._lock:
+            return list(self._conexiones.values())
+    
+    def items(self) -> List[Tuple[str, Conexion]]:
+        with self._lock:
+            return list(self._conexiones.items())
+    
+    def actualizar_cursos(self, handler: str, cursos):
+        """Reemplazar los cursos que otorgan una conexión manteniendo el índice
+        (si la conexión ya se eliminó no hace nada)"""
+        with self._lock:
+            conexion = self._conexiones.get(handler)
+            if conexion is None:
+                return
+            self._desindexar(conexion)
+            conexion.cursos = tuple(_internar(c) for c in cursos)
+            self[handler] = conexion
+    
+    def actualizar_ruta(self, handler: str, ruta, flow_entries: List[str] = None):
+        """Reemplazar la ruta (y opcionalmente los flows) de una conexión manteniendo el índice"""
+        with self._lock:
+            conexion = self._conexiones[handler]
+            self._desindexar(conexion)
+            conexion.ruta = tuple(ruta)
+            if flow_entries is not None:
+                conexion.flow_entries = flow_entries
+            self[handler] = conexion
+    
+    def _consultar(self, indice: Dict, clave) -> set:
+        with self._lock:
+            return set(indice.get(clave, ()))
+    
+    def por_mac(self, mac) -> set:
+        return self._consultar(self._por_mac, mac_a_entero(mac))
+    
+    def por_servidor(self, servidor_ip: str) -> set:
+        return self._consultar(self._por_servidor, servidor_ip)
+    
+    def por_servicio(self, servidor_ip: str, servicio: str) -> set:
+        return self._consultar(self._por_servicio, (servidor_ip, servicio))
+    
+    def por_curso(self, codigo_curso: str) -> set:
+        return self._consultar(self._por_curso, codigo_curso)
+    
+    def por_switch(self, dpid: str) -> set:
+        return self._consultar(self._por_switch, dpid)
+
+class ConflictoFlows(Exception):
+    """Un flow usa el mismo match que otro registrado en el switch pero con otras acciones"""
+
+class RegistroFlows:
+    """Flows instalados por (switch, match) con las conexiones que los usan; un flow idéntico
+    se reutiliza y solo se elimina cuando lo libera su último dueño. El switch guarda una sola
+    entrada por match, así que dos flows con el mismo match y otras acciones no pueden convivir"""
+    def __init__(self):
+        self._por_clave = {}  # (switch, match) -> nombre
+        self._flows = {}  # nombre -> flow
+        self._duenos = {}  # nombre -> handlers que usan el flow
+        self._instalando = {}  # nombre -> Event que se activa al terminar la instalación
+        self._anteriores = {}  # nombre -> definición vigente mientras se instala su reemplazo
+        self._lock = threading.Lock()
+        self.reutilizados = 0
+    
+    @staticmethod
+    def clave(flow_entry: Dict) -> Tuple:
+        return (flow_entry['switch'], tuple(sorted(flow_entry['match'].items())))
+    
+    def reservar(self, dueno, flow_entries: List[Dict],
+                 reemplazar: bool = False) -> Tuple[List[str], List[Dict], List[str]]:
+        """Asignar flows a un dueño reutilizando los ya registrados; devuelve los nombres
+        a usar, los flows que hay que instalar y los que está instalando otro dueño.
+        Lanza ConflictoFlows, sin reservar ninguno, si alguno choca con un flow registrado.
+        Con reemplazar=True el flow que choca se reinstala con su mismo nombre y las acciones
+        nuevas, lo que modifica la entrada del switch en lugar de agregar otra"""
+        nombres, nuevos, en_curso = [], [], []
+        with self._lock:
+            for flow_entry in flow_entries:
+                nombre = self._por_clave.get(self.clave(flow_entry))
+                if (nombre is not None and self._flows[nombre]['actions'] != flow_entry['actions']
+                        and (not reemplazar or nombre in self._instalando)):
+                    raise ConflictoFlows(
+                        f"el flow {nombre} ya usa el mismo match en el switch {flow_entry['switch']} "
+                        f"con acciones {self._flows[nombre]['actions']}"
+                    )
+            for flow_entry in flow_entries:
+                clave = self.clave(flow_entry)
+                nombre = self._por_clave.get(clave)
+                if nombre is None:
+                    nombre = flow_entry['name']
+                    self._por_clave[clave] = nombre
+                    self._flows[nombre] = flow_entry
+                    self._duenos[nombre] = set()
+                    self._instalando[nombre] = threading.Event()
+                    nuevos.append(flow_entry)
+                elif self._flows[nombre]['actions'] != flow_entry['actions']:
+                    flow_entry = dict(flow_entry, name=nombre)
+                    self._anteriores[nombre] = self._flows[nombre]
+                    self._flows[nombre] = flow_entry
+                    self._instalando[nombre] = threading.Event()
+                    nuevos.append(flow_entry)
+                else:
+                    self.reutilizados += 1
+                    if nombre in self._instalando:
+                        en_curso.append(nombre)
+                self._duenos[nombre].add(dueno)
+                nombres.append(nombre)
+        return nombres, nuevos, en_curso
+    
+    def confirmar(self, nombre: str, instalado: bool):
+        """Registrar el resultado de la instalación; si falló, el flow se olvida para todos sus dueños"""
+        with self._lock:
+            evento = self._instalando.pop(nombre, None)
+            anterior = self._anteriores.pop(nombre, None)
+            if not instalado and anterior is not None:
+                # Falló el reemplazo: el switch conserva la entrada anterior
+                self._flows[nombre] = anterior
+            elif not instalado:
+                self._olvidar(nombre)
+        if evento:
+            evento.set()
+    
+    def esperar(self, nombre: str, timeout: float = None) -> bool:
+        """Esperar a que termine la instalación de un flow; devuelve si quedó instalado"""
+        evento = self._instalando.get(nombre)
+        if evento and not evento.wait(timeout):
+            return False
+        with self._lock:
+            return nombre in self._flows and nombre not in self._instalando
+    
+    def liberar(self, dueno, nombres: List[str]) -> List[str]:
+        """Quitar un dueño de sus flows; devuelve los que quedaron sin dueños y deben eliminarse.
+        Los nombres que no están registrados se consideran exclusivos del dueño"""
+        libres = []
+        with self._lock:
+            for nombre in nombres:
+                duenos = self._duenos.get(nombre)
+                if duenos is None:
+                    libres.append(nombre)
+                    continue
+                duenos.discard(dueno)
+                if not duenos:
+                    # Dejar de ofrecerlo para reutilizar mientras se elimina
+                    flow = self._flows.get(nombre)
+                    if flow is not None and self._por_clave.get(self.clave(flow)) == nombre:
+                        del self._por_clave[self.clave(flow)]
+                    libres.append(nombre)
+        return libres
+    
+    def restaurar(self, dueno, nombres: List[str]):
+        """Asignar a un dueño flows ya instalados (p. ej. los que no se pudieron eliminar)"""
+        with self._lock:
+            for nombre in nombres:
+                self._duenos.setdefault(nombre, set()).add(dueno)
+                flow = self._flows.get(nombre)
+                if flow is not None:
+                    self._por_clave.setdefault(self.clave(flow), nombre)
+    
+    def retirados(self, nombres: List[str]):
+        """Olvidar los flows eliminados que siguen sin dueños"""
+        with self._lock:
+            for nombre in nombres:
+                if not self._duenos.get(nombre):
+                    self._olvidar(nombre)
+    
+    def agregar(self, nombre: str, flow_entry: Dict):
+        """Registrar un flow ya instalado, sin dueños (al cargar un snapshot)"""
+        with self._lock:
+            self._flows[nombre] = flow_entry
+            self._duenos.setdefault(nombre, set())
+            self._por_clave.setdefault(self.clave(flow_entry), nombre)
+    
+    def _olvidar(self, nombre: str):
+        flow = self._flows.pop(nombre, None)
+        self._duenos.pop(nombre, None)
+        if flow is not None and self._por_clave.get(self.clave(flow)) == nombre:
+            del self._por_clave[self.clave(flow)]
+    
+    def items(self) -> List[Tuple[str, Dict, set]]:
+        """(nombre, flow, dueños) de cada flow registrado"""
+        with self._lock:
+            return [(nombre, flow, set(self._duenos.get(nombre, ()))) for nombre, flow in self._flows.items()]
+    
+    def obtener(self, nombre: str) -> Optional[Dict]:
+        return self._flows.get(nombre)
+    
+    def __len__(self):
+        return len(self._flows)
+    
+    def estadisticas(self) -> Dict:
+        return {
+            'instalados': len(self._flows),
+            'reutilizados': self.reutilizados,
+            'compartidos': sum(1 for duenos in list(self._duenos.values()) if len(duenos) > 1)
+        }
+
+class MatrizPoliticas:
+    """Políticas compiladas en matrices de NumPy: cursos × permisos y alumnos × permisos,
+    donde cada permiso es un par (servidor, servicio)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.construir({})
+    
+    def construir(self, cursos: Dict):
+        """Compilar las matrices completas a partir de los cursos"""
+        permisos, columna = [], {}
+        filas_alumno, alumnos = {}, []
+        otorga_filas, inscripciones = [], []
+        for i, curso in enumerate(cursos.values()):
+            columnas = set()
+            for par in curso.permisos():
+                if par not in columna:
+                    columna[par] = len(permisos)
+                    permisos.append(par)
+                columnas.add(columna[par])
+            otorga_filas.append(columnas)
+            for codigo_alumno in curso.alumnos:
+                if codigo_alumno not in filas_alumno:
+                    filas_alumno[codigo_alumno] = len(alumnos)
+                    alumnos.append(codigo_alumno)
+                inscripciones.append((filas_alumno[codigo_alumno], i))
+        
+        otorga = np.zeros((len(otorga_filas), len(permisos)), dtype=bool)
+        for i, columnas in enumerate(otorga_filas):
+            otorga[i, list(columnas)] = True
+        dictando = np.array([curso.estado == "DICTANDO" for curso in cursos.values()], dtype=bool)
+        inscripcion = np.zeros((len(alumnos), len(cursos)), dtype=np.int32)
+        if inscripciones:
+            filas, cols = zip(*inscripciones)
+            inscripcion[list(filas), list(cols)] = 1
+        
+        with self._lock:
+            self.permisos = permisos  # columna -> (servidor, servicio)
+            self._columna = columna
+            self.cursos = list(cursos)  # fila -> código de curso
+            self._fila_curso = {codigo: i for i, codigo in enumerate(self.cursos)}
+            self.alumnos = alumnos  # fila -> código de alumno
+            self._fila_alumno = filas_alumno
+            self._otorga = otorga
+            self._dictando = dictando
+            # Cantidad de cursos DICTANDO que otorgan cada permiso a cada alumno
+            self._accesos = inscripcion @ (otorga & dictando[:, None]).astype(np.int32)
+    
+    # Actualizaciones incrementales
+    
+    def _fila(self, codigo_alumno) -> int:
+        fila = self._fila_alumno.get(codigo_alumno)
+        if fila is None:
+            fila = self._fila_alumno[codigo_alumno] = len(self.alumnos)
+            self.alumnos.append(codigo_alumno)
+            if fila >= self._accesos.shape[0]:
+                # Crecer al doble para que agregar alumnos de a uno sea O(1) amortizado
+                extra = max(fila, 16)
+                self._accesos = np.vstack(
+                    [self._accesos, np.zeros((extra, self._accesos.shape[1]), dtype=np.int32)]
+                )
+        return fila
+    
+    def _columna_de(self, par: Tuple[str, str]) -> int:
+        col = self._columna.get(par)
+        if col is None:
+            col = self._columna[par] = len(self.permisos)
+            self.permisos.append(par)
+            self._otorga = np.hstack([self._otorga, np.zeros((self._otorga.shape[0], 1), dtype=bool)])
+            self._accesos = np.hstack([self._accesos, np.zeros((self._accesos.shape[0], 1), dtype=np.int32)])
+        return col
+    
+    def alumno_inscrito(self, codigo_curso, codigo_alumno, delta: int):
+        """Sumar (+1) o restar (-1) los permisos de un curso a un alumno"""
+        with self._lock:
+            c = self._fila_curso.get(codigo_curso)
+            if c is not None and self._dictando[c]:
+                fila = self._fila(codigo_alumno)  # Puede hacer crecer la matriz
+                self._accesos[fila] += delta * self._otorga[c]
+    
+    def permisos_agregados(self, codigo_curso, pares, alumnos):
+        """Registrar permisos nuevos de un curso para todos sus alumnos"""
+        with self._lock:
+            c = self._fila_curso.get(codigo_curso)
+            if c is None:
+                return
+            filas = [self._fila(a) for a in alumnos]
+            for par in pares:
+                col = self._columna_de(par)
+                if not self._otorga[c, col]:
+                    self._otorga[c, col] = True
+                    if self._dictando[c] and filas:
+                        self._accesos[filas, col] += 1
+    
+    def estado_cambiado(self, codigo_curso, dictando: bool, alumnos):
+        """Otorgar o retirar todos los permisos del curso al entrar o salir de DICTANDO"""
+        with self._lock:
+            c = self._fila_curso.get(codigo_curso)
+            if c is None or self._dictando[c] == dictando:
+                return
+            self._dictando[c] = dictando
+            filas = [self._fila(a) for a in alumnos]
+            if filas:
+                self._accesos[filas] += (1 if dictando else -1) * self._otorga[c].astype(np.int32)
+    
+    # Consultas
+    
+    def alumnos_con_permiso(self, nombre_servidor: str, nombre_servicio: str) -> List:
+        with self._lock:
+            col = self._columna.get((nombre_servidor, nombre_servicio))
+            if col is None:
+                return []
+            filas = np.flatnonzero(self._accesos[:len(self.alumnos), col])
+            return [self.alumnos[i] for i in filas]
+    
+    def permisos_de(self, codigo_alumno) -> List[Tuple[str, str]]:
+        with self._lock:
+            fila = self._fila_alumno.get(codigo_alumno)
+            if fila is None:
+                return []
+            return [self.permisos[j] for j in np.flatnonzero(self._accesos[fila])]
+    
+    def cursos_con_permiso(self, nombre_servidor: str, nombre_servicio: str) -> List:
+        with self._lock:
+            col = self._columna.get((nombre_servidor, nombre_servicio))
+            if col is None:
+                return []
+            return [self.cursos[i] for i in np.flatnonzero(self._otorga[:, col] & self._dictando)]
+    
+    def auditoria(self) -> List[Tuple]:
+        """Todos los accesos vigentes como (alumno, servidor, servicio)"""
+        with self._lock:
+            filas, cols = np.nonzero(self._accesos[:len(self.alumnos)])
+            return [(self.alumnos[i],) + self.permisos[j] for i, j in zip(filas.tolist(), cols.tolist())]
+
+class _SinMedicion:
+    """Cronómetro vacío usado cuando las métricas están deshabilitadas"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+_SIN_MEDICION = _SinMedicion()
+
+class _Cronometro:
+    """Mide la duración de un bloque y la registra en un histograma"""
+    __slots__ = ('_metricas', '_nombre', '_etiquetas', '_inicio')
+    
+    def __init__(self, metricas: 'Metricas', nombre: str, etiquetas: Tuple):
+        self._metricas = metricas
+        self._nombre = nombre
+        self._etiquetas = etiquetas
+    
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+    
+    def __exit__(self, tipo, valor, traza):
+        self._metricas._observar(self._nombre, self._etiquetas, time.perf_counter() - self._inicio)
+        if tipo is not None:
+            self._metricas._contar(f"{self._nombre}_errores_total", self._etiquetas, 1)
+        return False
+
+class Metricas:
+    """Contadores e histogramas en memoria exportables en formato de texto de Prometheus"""
+    def __init__(self, habilitadas: bool = METRICAS_HABILITADAS, buckets: Tuple[float, ...] = METRICAS_BUCKETS):
+        self.habilitadas = habilitadas
+        self.buckets = tuple(buckets)
+        self._histogramas = {}  # (nombre, etiquetas) -> [conteos por bucket, suma, total]
+        self._contadores = {}  # (nombre, etiquetas) -> valor
+        self._fuentes = {}  # prefijo -> función que devuelve un dict de valores numéricos
+        self._lock = threading.Lock()
+        self._servidor = None
+    
+    def medir(self, nombre: str, **etiquetas):
+        """Cronómetro para usar con `with`; no hace nada si las métricas están deshabilitadas"""
+        if not self.habilitadas:
+            return _SIN_MEDICION
+        return _Cronometro(self, nombre, tuple(sorted(etiquetas.items())))
+    
+    def contar(self, nombre: str, valor: float = 1, **etiquetas):
+        if self.habilitadas:
+            self._contar(nombre, tuple(sorted(etiquetas.items())), valor)
+    
+    def observar(self, nombre: str, valor: float, **etiquetas):
+        if self.habilitadas:
+            self._observar(nombre, tuple(sorted(etiquetas.items())), valor)
+    
+    def registrar_fuente(self, prefijo: str, funcion):
+        """Registrar una función de estadísticas (p. ej. de una caché) que se lee al exportar"""
+        self._fuentes[prefijo] = funcion
+    
+    def _contar(self, nombre: str, etiquetas: Tuple, valor: float):
+        clave = (nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+    
+    def _observar(self, nombre: str, etiquetas: Tuple, valor: float):
+        clave = (nombre, etiquetas)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    histograma[0][i] += 1
+                    break
+            histograma[1] += valor
+            histograma[2] += 1
+    
+    @staticmethod
+    def _formatear_etiquetas(etiquetas, extra: Tuple = ()) -> str:
+        pares = list(etiquetas) + list(extra)
+        if not pares:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}"
+    
+    def exportar_prometheus(self) -> str:
+        """Métricas en el formato de texto de Prometheus"""
+        lineas = []
+        with self._lock:
+            histogramas = {k: (list(h[0]), h[1], h[2]) for k, h in self._histogramas.items()}
+            contadores = dict(self._contadores)
+        
+        tipos = set()
+        for (nombre, etiquetas), (conteos, suma, total) in sorted(histogramas.items()):
+            metrica = f"sdn_{nombre}_segundos"
+            if metrica not in tipos:
+                tipos.add(metrica)
+                lineas.append(f"# TYPE {metrica} histogram")
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                lineas.append(f"{metrica}_bucket{self._formatear_etiquetas(etiquetas, (('le', limite),))} {acumulado}")
+            lineas.append(f"{metrica}_bucket{self._formatear_etiquetas(etiquetas, (('le', '+Inf'),))} {total}")
+            lineas.append(f"{metrica}_sum{self._formatear_etiquetas(etiquetas)} {suma}")
+            lineas.append(f"{metrica}_count{self._formatear_etiquetas(etiquetas)} {total}")
+        
+        for (nombre, etiquetas), valor in sorted(contadores.items()):
+            metrica = f"sdn_{nombre}"
+            if metrica not in tipos:
+                tipos.add(metrica)
+                lineas.append(f"# TYPE {metrica} counter")
+            lineas.append(f"{metrica}{self._formatear_etiquetas(etiquetas)} {valor}")
+        
+        for prefijo, funcion in sorted(self._fuentes.items()):
+            for clave, valor in sorted(funcion().items()):
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    metrica = f"sdn_{prefijo}_{clave}"
+                    lineas.append(f"# TYPE {metrica} gauge")
+                    lineas.append(f"{metrica} {valor}")
+        return "\n".join(lineas) + "\n"
+    
+    def resumen(self) -> Dict:
+        """Resumen legible: total, media y máximo bucket por histograma, contadores y fuentes"""
+        with self._lock:
+            histogramas = {
+                f"{nombre}{self._formatear_etiquetas(etiquetas)}": {
+                    'total': h[2],
+                    'media_ms': (h[1] / h[2] * 1000) if h[2] else 0.0
+                }
+                for (nombre, etiquetas), h in sorted(self._histogramas.items())
+            }
+            contadores = {
+                f"{nombre}{self._formatear_etiquetas(etiquetas)}": valor
+                for (nombre, etiquetas), valor in sorted(self._contadores.items())
+            }
+        fuentes = {prefijo: funcion() for prefijo, funcion in sorted(self._fuentes.items())}
+        return {'tiempos': histogramas, 'contadores': contadores, 'caches': fuentes}
+    
+    def iniciar_servidor(self, puerto: int, host: str = "0.0.0.0"):
+        """Servir /metrics en un hilo de fondo"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metricas = self
+        
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                datos = metricas.exportar_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+            
+            def log_message(self, *args):
+                pass
+        
+        self._servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        print(f"Métricas disponibles en http://{host}:{self._servidor.server_address[1]}/metrics")
+
+class FloodlightError(Exception):
+    """Error al comunicarse con el controlador Floodlight"""
+
+_contexto = threading.local()
+
+def prioridad_actual() -> int:
+    """Prioridad de las solicitudes al controlador hechas desde el hilo actual"""
+    return getattr(_contexto, 'prioridad', PRIORIDAD_INTERACTIVA)
+
+@contextmanager
+def con_prioridad(prioridad: int):
+    """Fijar la prioridad de las solicitudes al controlador en un bloque `with` o como decorador"""
+    anterior = prioridad_actual()
+    _contexto.prioridad = prioridad
+    try:
+        yield
+    finally:
+        _contexto.prioridad = anterior
+
+class LimitadorAdaptativo:
+    """Limita las solicitudes simultáneas al controlador con AIMD: el límite sube de a uno
+    por ventana mientras la latencia se mantiene cerca de la mínima observada y se reduce
+    a la mitad ante errores o latencia alta. La mínima se toma de la última `ventana` de segundos,
+    y al cerrar una ventana sin reducciones el límite sube un lugar más para tantear capacidad.
+    Las solicitudes en espera se atienden por prioridad"""
+    def __init__(self, inicial: int = LIMITADOR_INICIAL, minimo: int = LIMITADOR_MINIMO,
+                 maximo: int = FLOODLIGHT_POOL, tolerancia: float = LIMITADOR_TOLERANCIA,
+                 adaptativo: bool = True, ventana: float = LIMITADOR_VENTANA):
+        self.limite = float(inicial)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.tolerancia = tolerancia
+        self.adaptativo = adaptativo
+        self.ventana = ventana
+        self.en_curso = 0
+        self._espera = []  # heap de [prioridad, orden, concedido]
+        self._orden = 0
+        self._condicion = threading.Condition()
+        self._latencia_base = {}  # tipo de solicitud -> latencia mínima de la ventana anterior
+        self._minimo_ventana = {}  # tipo de solicitud -> latencia mínima de la ventana en curso
+        self._fin_ventana = time.monotonic() + ventana
+        self._reducciones_ventana = 0
+        self._latencia_media = {}  # tipo de solicitud -> promedio móvil de la latencia
+        self._respuestas = 0
+        self._siguiente_reduccion = 0
+        self.reducciones = 0
+        self._esperas = {}  # prioridad -> [solicitudes, espera total, espera máxima]
+    
+    def adquirir(self, prioridad: int) -> float:
+        """Esperar un lugar libre; devuelve los segundos de espera"""
+        inicio = time.perf_counter()
+        with self._condicion:
+            if not self._espera and self.en_curso < int(self.limite):
+                self.en_curso += 1
+            else:
+                self._orden += 1
+                turno = [prioridad, self._orden, False]
+                heapq.heappush(self._espera, turno)
+                self._condicion.wait_for(lambda: turno[2])
+            espera = time.perf_counter() - inicio
+            datos = self._esperas.setdefault(prioridad, [0, 0.0, 0.0])
+            datos[0] += 1
+            datos[1] += espera
+            datos[2] = max(datos[2], espera)
+        return espera
+    
+    def liberar(self, latencia: float, error: bool = False, tipo: str = None):
+        """Devolver el lugar informando la latencia de la solicitud, si falló y su tipo
+        (las latencias solo se comparan entre solicitudes del mismo tipo)"""
+        with self._condicion:
+            self.en_curso -= 1
+            if self.adaptativo:
+                self._ajustar(latencia, error, tipo)
+            # Conceder los lugares libres a las solicitudes de mayor prioridad
+            while self._espera and self.en_curso < int(self.limite):
+                heapq.heappop(self._espera)[2] = True
+                self.en_curso += 1
+            self._condicion.notify_all()
+    
+    def _cerrar_ventana(self):
+        """Reemplazar las latencias base por las mínimas de la ventana que termina; sin
+        reducciones en la ventana, subir el límite un lugar"""
+        for tipo, minimo in self._minimo_ventana.items():
+            self._latencia_base[tipo] = minimo
+        self._minimo_ventana = {}
+        if not self._reducciones_ventana:
+            self.limite = min(self.maximo, self.limite + 1)
+        self._reducciones_ventana = 0
+        self._fin_ventana = time.monotonic() + self.ventana
+    
+    def _ajustar(self, latencia: float, error: bool, tipo: str):
+        self._respuestas += 1
+        if time.monotonic() >= self._fin_ventana:
+            self._cerrar_ventana()
+        base = self._latencia_base.get(tipo)
+        media = self._latencia_media.get(tipo, latencia)
+        if not error:
+            if base is None or latencia < base:
+                self._latencia_base[tipo] = base = latencia
+            if latencia < self._minimo_ventana.get(tipo, latencia + 1):
+                self._minimo_ventana[tipo] = latencia
+            self._latencia_media[tipo] = media = media + LIMITADOR_SUAVIZADO * (latencia - media)
+        if error or media > base * self.tolerancia:
+            # Reducir como máximo una vez por ronda: las respuestas siguientes aún salieron con el límite anterior
+            if self._respuestas >= self._siguiente_reduccion and self.limite > self.minimo:
+                self.limite = max(self.minimo, self.limite / 2)
+                self._siguiente_reduccion = self._respuestas + self.en_curso + 1
+                self.reducciones += 1
+                self._reducciones_ventana += 1
+        else:
+            self.limite = min(self.maximo, self.limite + 1 / self.limite)
+    
+    def estadisticas(self) -> Dict:
+        with self._condicion:
+            cola = {}
+            for prioridad, _, _ in self._espera:
+                cola[prioridad] = cola.get(prioridad, 0) + 1
+            estadisticas = {
+                'limite': round(self.limite, 2),
+                'en_curso': self.en_curso,
+                'en_cola': len(self._espera),
+                'reducciones': self.reducciones
+            }
+            for tipo, base in self._latencia_base.items():
+                estadisticas[f'latencia_base_ms_{tipo}'] = base * 1000
+            for prioridad, (n, total, maxima) in self._esperas.items():
+                estadisticas[f'cola_p{prioridad}'] = cola.get(prioridad, 0)
+                estadisticas[f'espera_media_ms_p{prioridad}'] = total / n * 1000 if n else 0.0
+                estadisticas[f'espera_max_ms_p{prioridad}'] = maxima * 1000
+            return estadisticas
+
+class FloodlightClient:
+    """Cliente REST de Floodlight con conexiones persistentes, timeouts y reintentos"""
+    def __init__(self, base_url: str = FLOODLIGHT_URL, timeouts: Dict[str, float] = None,
+                 reintentos: int = FLOODLIGHT_REINTENTOS, backoff: float = FLOODLIGHT_BACKOFF,
+                 pool: int = FLOODLIGHT_POOL, metricas: Metricas = None,
+                 limitador: LimitadorAdaptativo = None):
+        self.base_url = base_url.rstrip('/')
+        self.metricas = metricas or Metricas()
+        self.limitador = limitador or LimitadorAdaptativo(maximo=pool)
+        self.timeouts = dict(FLOODLIGHT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.pool = pool
+        self._session = None
+        self._lock = threading.Lock()
+    
+    @property
+    def session(self):
+        """Sesión HTTP, creada en la primera solicitud para no importar requests antes de tiempo"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    from urllib3.util.retry import Retry
+                    
+                    # El static flow pusher identifica los flows por nombre, así que
+                    # reintentar POST y DELETE es seguro
+                    retry = Retry(
+                        total=self.reintentos,
+                        backoff_factor=self.backoff,
+                        status_forcelist=(500, 502, 503, 504),
+                        allowed_methods=frozenset({'GET', 'POST', 'DELETE'}),
+                        raise_on_status=False
+                    )
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool, max_retries=retry)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._errores_red = requests.RequestException
+                    self._session = session
+        return self._session
+    
+    def _solicitud(self, metodo: str, endpoint: str, ruta: str, **kwargs):
+        """Enviar una solicitud y devolver el JSON de la respuesta"""
+        url = f"{self.base_url}{ruta}"
+        prioridad = prioridad_actual()
+        session = self.session
+        espera = self.limitador.adquirir(prioridad)
+        inicio = time.perf_counter()
+        error = True
+        # El lugar se devuelve ante cualquier excepción, no solo los errores de red
+        try:
+            self.metricas.observar('floodlight_espera', espera, prioridad=prioridad)
+            with self.metricas.medir('floodlight', endpoint=endpoint, metodo=metodo):
+                response = session.request(metodo, url, timeout=self.timeouts[endpoint], **kwargs)
+            error = response.status_code >= 500
+        except self._errores_red as e:
+            raise FloodlightError(f"{metodo} {ruta}: {e}") from e
+        finally:
+            self.limitador.liberar(time.perf_counter() - inicio, error=error, tipo=endpoint)
+        
+        if response.status_code != 200:
+            self.metricas.contar('floodlight_respuestas_error_total', endpoint=endpoint, codigo=response.status_code)
+            raise FloodlightError(f"[{response.status_code}] {metodo} {ruta}: {response.text}")
+        
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError as e:
+            raise FloodlightError(f"{metodo} {ruta}: respuesta no es JSON") from e
+    
+    def dispositivos(self) -> List[Dict]:
+        """Tabla de dispositivos (hosts) conocidos por el controlador"""
+        data = self._solicitud('GET', 'dispositivos', '/wm/device/')
+        # Versiones recientes de Floodlight devuelven {"devices": [...]}
+        if isinstance(data, dict):
+            data = data.get("devices", [])
+        return data or []
+    
+    def switches(self) -> List[Dict]:
+        """Switches conectados al controlador"""
+        return self._solicitud('GET', 'enlaces', '/wm/core/controller/switches/json') or []
+    
+    def enlaces(self) -> List[Dict]:
+        """Enlaces entre switches"""
+        return self._solicitud('GET', 'enlaces', '/wm/topology/links/json') or []
+    
+    def ruta(self, src_dpid, src_port, dst_dpid, dst_port) -> List[Tuple[str, int]]:
+        """Ruta entre dos attachment points como lista de (switch, puerto)"""
+        ruta = self._solicitud(
+            'GET', 'ruta',
+            f"/wm/topology/route/{src_dpid}/{src_port}/{dst_dpid}/{dst_port}/json"
+        ) or []
+        return [(hop["switch"], hop["port"]["portNumber"]) for hop in ruta]
+    
+    def instalar_flow(self, flow_entry: Dict):
+        """Instalar un flow estático"""
+        return self._solicitud('POST', 'flows', '/wm/staticflowpusher/json', json=flow_entry)
+    
+    def flows_instalados(self) -> Dict[str, List[str]]:
+        """Nombres de los flows estáticos instalados en cada switch, en una sola consulta"""
+        data = self._solicitud('GET', 'flows', '/wm/staticflowpusher/list/all/json') or {}
+        # Formato de Floodlight: {dpid: [{nombre: flow}, ...]}
+        return {switch: [nombre for flow in flows for nombre in flow] for switch, flows in data.items()}
+    
+    def estadisticas_flows(self) -> Dict[str, List[Dict]]:
+        """Estadísticas (match, packet_count, byte_count...) de todos los flows de todos los switches"""
+        data = self._solicitud('GET', 'estadisticas', '/wm/core/switch/all/flow/json') or {}
+        # Floodlight 1.x: {dpid: {"flows": [...]}}; versiones anteriores: {dpid: [...]}
+        return {switch: flows.get('flows', []) if isinstance(flows, dict) else flows
+                for switch, flows in data.items()}
+    
+    def eliminar_flow(self, nombre: str):
+        """Eliminar un flow estático por nombre"""
+        return self._solicitud('DELETE', 'flows', '/wm/staticflowpusher/json', json={"name": nombre})
+    
+    def estadisticas_limitador(self) -> Dict:
+        return self.limitador.estadisticas()
+    
+    def cerrar(self):
+        if self._session is not None:
+            self._session.close()
+
+class FloodlightFederado:
+    """Varios controladores Floodlight, cada uno dueño de un conjunto de switches, con la misma
+    interfaz que FloodlightClient. Los flows se instalan y eliminan en el controlador dueño del
+    switch, que se recuerda por nombre de flow; dispositivos, switches, enlaces y tablas de
+    flows se combinan. Cada controlador tiene su propio pool de conexiones y su propio limitador"""
+    def __init__(self, controladores: Dict[str, Optional[List[str]]], enlaces: List[Dict] = (), **opciones):
+        # controladores: URL -> DPIDs que controla; None para tomar los que informe el controlador
+        self.shards = [FloodlightClient(url, **opciones) for url in controladores]
+        self._asignados = {
+            dpid: shard for shard, dpids in zip(self.shards, controladores.values()) for dpid in dpids or ()
+        }
+        self._descubrir = {shard for shard, dpids in zip(self.shards, controladores.values()) if not dpids}
+        self._duenos = dict(self._asignados)  # dpid -> controlador dueño
+        self.enlaces_extra = list(enlaces)  # Enlaces entre switches de controladores distintos
+        self._topologia = None
+        self._topologia_cargada = 0.0
+        self._lock = threading.Lock()
+        self._flows = {}  # nombre de flow -> controlador donde está instalado
+        self._lock_flows = threading.Lock()
+        self._ejecutor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="controladores")
+    
+    @property
+    def metricas(self) -> Metricas:
+        return self.shards[0].metricas
+    
+    @metricas.setter
+    def metricas(self, metricas: Metricas):
+        for shard in self.shards:
+            shard.metricas = metricas
+    
+    def _en_todos(self, operacion) -> List:
+        """Aplicar operacion(controlador) a todos los controladores en paralelo, conservando la prioridad"""
+        prioridad = prioridad_actual()
+        
+        def tarea(shard):
+            with con_prioridad(prioridad):
+                return operacion(shard)
+        return list(self._ejecutor.map(tarea, self.shards))
+    
+    def dueno(self, dpid: str) -> FloodlightClient:
+        """Controlador dueño de un switch"""
+        shard = self._duenos.get(dpid)
+        if shard is None and self._descubrir:
+            self.switches()
+            shard = self._duenos.get(dpid)
+        if shard is None:
+            raise FloodlightError(f"Ningún controlador tiene el switch {dpid}")
+        return shard
+    
+    def switches(self) -> List[Dict]:
+        """Switches de todos los controladores; actualiza los dueños de los no asignados"""
+        duenos = dict(self._asignados)
+        switches = {}
+        for shard, lista in zip(self.shards, self._en_todos(lambda shard: shard.switches())):
+            for switch in lista:
+                if shard in self._descubrir:
+                    duenos.setdefault(switch['switchDPID'], shard)
+                switches.setdefault(switch['switchDPID'], switch)
+        self._duenos = duenos
+        return list(switches.values())
+    
+    def dispositivos(self) -> List[Dict]:
+        """Hosts de todos los controladores; si un host aparece en varios se usa lo que informa
+        el dueño del switch donde está conectado"""
+        hosts = {}
+        for shard, lista in zip(self.shards, self._en_todos(lambda shard: shard.dispositivos())):
+            for host in lista:
+                clave = tuple(host.get('mac') or ()) or id(host)
+                aps = host.get('attachmentPoint') or []
+                propio = bool(aps) and self._duenos.get(aps[0]['switchDPID']) is shard
+                if clave not in hosts or propio:
+                    hosts[clave] = host
+        return list(hosts.values())
+    
+    def enlaces(self) -> List[Dict]:
+        """Enlaces de todos los controladores más los configurados entre controladores"""
+        enlaces = {}
+        for lista in self._en_todos(lambda shard: shard.enlaces()) + [self.enlaces_extra]:
+            for enlace in lista:
+                clave = (enlace['src-switch'], enlace['src-port'], enlace['dst-switch'], enlace['dst-port'])
+                enlaces.setdefault(clave, enlace)
+        return list(enlaces.values())
+    
+    def _topologia_combinada(self) -> "TopologiaLocal":
+        with self._lock:
+            ahora = time.monotonic()
+            if self._topologia is None or ahora - self._topologia_cargada > ROUTE_CACHE_INTERVALO_ENLACES:
+                switches = [switch['switchDPID'] for switch in self.switches()]
+                self._topologia = TopologiaLocal(switches, self.enlaces())
+                self._topologia_cargada = ahora
+            return self._topologia
+    
+    def ruta(self, src_dpid, src_port, dst_dpid, dst_port) -> List[Tuple[str, int]]:
+        """Ruta calculada por el controlador dueño si ambos switches son suyos; si cruza
+        controladores, sobre la topología combinada"""
+        origen = self.dueno(src_dpid)
+        if origen is self.dueno(dst_dpid):
+            return origen.ruta(src_dpid, src_port, dst_dpid, dst_port)
+        return self._topologia_combinada().ruta(src_dpid, int(src_port), dst_dpid, int(dst_port))
+    
+    def instalar_flow(self, flow_entry: Dict):
+        shard = self.dueno(flow_entry['switch'])
+        resultado = shard.instalar_flow(flow_entry)
+        with self._lock_flows:
+            self._flows[flow_entry['name']] = shard
+        return resultado
+    
+    def eliminar_flow(self, nombre: str):
+        with self._lock_flows:
+            shard = self._flows.get(nombre)
+        if shard is not None:
+            resultado = shard.eliminar_flow(nombre)
+        else:
+            # Flow desconocido (instalado antes de iniciar): se elimina en todos, el static
+            # flow pusher ignora los nombres que no conoce
+            resultado = self._en_todos(lambda shard: shard.eliminar_flow(nombre))
+        with self._lock_flows:
+            self._flows.pop(nombre, None)
+        return resultado
+    
+    def flows_instalados(self) -> Dict[str, List[str]]:
+        tabla, ubicados = {}, {}
+        for shard, parcial in zip(self.shards, self._en_todos(lambda shard: shard.flows_instalados())):
+            for switch, nombres in parcial.items():
+                tabla.setdefault(switch, []).extend(nombres)
+                ubicados.update(dict.fromkeys(nombres, shard))
+        with self._lock_flows:
+            self._flows.update(ubicados)
+        return tabla
+    
+    def estadisticas_flows(self) -> Dict[str, List[Dict]]:
+        tabla = {}
+        for parcial in self._en_todos(lambda shard: shard.estadisticas_flows()):
+            for switch, flows in parcial.items():
+                tabla.setdefault(switch, []).extend(flows)
+        return tabla
+    
+    def estadisticas_limitador(self) -> Dict:
+        return {
+            f"c{i}_{clave}": valor
+            for i, shard in enumerate(self.shards) for clave, valor in shard.estadisticas_limitador().items()
+        }
+    
+    def cerrar(self):
+        for shard in self.shards:
+            shard.cerrar()
+        self._ejecutor.shutdown(wait=False)
+
+def crear_cliente_floodlight(controladores: List[str] = (), enlaces: List[str] = ()):
+    """Cliente para uno o varios controladores. Cada controlador es URL o URL=DPID,DPID,...
+    y cada enlace entre controladores es SRC_DPID/PUERTO/DST_DPID/PUERTO"""
+    if not controladores:
+        return FloodlightClient()
+    if len(controladores) == 1 and '=' not in controladores[0]:
+        return FloodlightClient(controladores[0])
+    asignacion = {}
+    for controlador in controladores:
+        url, _, dpids = controlador.partition('=')
+        asignacion[url] = [dpid for dpid in dpids.split(',') if dpid] or None
+    extra = []
+    for enlace in enlaces:
+        src, src_port, dst, dst_port = enlace.split('/')
+        extra.append({'src-switch': src, 'src-port': int(src_port), 'dst-switch': dst, 'dst-port': int(dst_port),
+                      'type': 'internal', 'direction': 'bidirectional'})
+    return FloodlightFederado(asignacion, extra)
+
+class DeviceCache:
+    """Caché de la tabla de dispositivos de Floodlight indexada por MAC e IP"""
+    def __init__(self, descargar, ttl: float = DEVICE_CACHE_TTL,
+                 intervalo_minimo: float = DEVICE_CACHE_INTERVALO_MINIMO):
+        self._descargar = descargar  # función que devuelve la lista de hosts o None
+        self.ttl = ttl
+        self.intervalo_minimo = intervalo_minimo
+        self._por_mac = {}  # MAC como entero -> (switchDPID, port) o None si no tiene attachmentPoint
+        self._por_ip = {}
+        self._movidos = set()  # MACs (enteros) e IPs cuyo attachment point cambió
+        self._actualizado = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+    
+    @staticmethod
+    def normalizar_mac(mac) -> int:
+        return mac_a_entero(mac)
+    
+    def refrescar(self) -> bool:
+        """Descargar la tabla completa de dispositivos y reconstruir los índices"""
+        dispositivos = self._descargar()
+        with self._lock:
+            self._actualizado = time.monotonic()
+            if dispositivos is None:
+                return False
+            por_mac = {}
+            por_ip = {}
+            for host in dispositivos:
+                aps = host.get("attachmentPoint", [])
+                punto = (aps[0]["switchDPID"], aps[0]["port"]) if aps else None
+                for mac in host.get("mac", []):
+                    # Como la búsqueda original: vale el primer host con attachment point; una
+                    # entrada vencida (sin attachmentPoint) no reemplaza una ubicación conocida
+                    mac = self.normalizar_mac(mac)
+                    if por_mac.get(mac) is None:
+                        por_mac[mac] = punto
+                for ip in host.get("ipv4", []):
+                    if punto:
+                        por_ip[ip] = punto
+            if self.refreshes:
+                self._movidos.update(mac for mac, punto in self._por_mac.items() if por_mac.get(mac) != punto)
+                self._movidos.update(ip for ip, punto in self._por_ip.items() if por_ip.get(ip) != punto)
+            self._por_mac = por_mac
+            self._por_ip = por_ip
+            self.refreshes += 1
+            return True
+    
+    def tomar_movidos(self) -> set:
+        """MACs e IPs que cambiaron de attachment point (o desaparecieron) desde la última llamada"""
+        with self._lock:
+            movidos, self._movidos = self._movidos, set()
+            return movidos
+    
+    def _edad(self) -> Optional[float]:
+        if self._actualizado is None:
+            return None
+        return time.monotonic() - self._actualizado
+    
+    def _buscar(self, indice: str, clave: str):
+        """Buscar en un índice refrescando si venció el TTL o si la clave falta"""
+        edad = self._edad()
+        if edad is None or edad > self.ttl:
+            self.refrescar()
+        elif clave not in getattr(self, indice) and edad > self.intervalo_minimo:
+            self.refrescar()
+        tabla = getattr(self, indice)
+        if clave in tabla:
+            self.hits += 1
+            return True, tabla[clave]
+        self.misses += 1
+        return False, None
+    
+    def buscar_mac(self, mac: str) -> Tuple[bool, Optional[Tuple[str, int]]]:
+        """Devuelve (encontrada, attachment point) para una MAC"""
+        return self._buscar('_por_mac', self.normalizar_mac(mac))
+    
+    def buscar_ip(self, ip: str) -> Optional[Tuple[str, int]]:
+        """Devuelve el attachment point del host con la IP dada, si se conoce"""
+        return self._buscar('_por_ip', ip)[1]
+    
+    def estadisticas(self) -> Dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'hosts': len(self._por_mac),
+            'edad': self._edad()
+        }
+
+class TopologiaLocal:
+    """Grafo de switches y enlaces para calcular rutas sin consultar al controlador.
+    La adyacencia y sus tablas de siguiente salto se reemplazan juntas al recargar, y cada
+    consulta trabaja sobre el par que leyó al empezar, así que un cálculo que se cruza con
+    una recarga nunca guarda tablas del grafo anterior en las del nuevo"""
+    def __init__(self, switches: List[str] = (), enlaces: List[Dict] = ()):
+        self.generacion = 0
+        self._lock = threading.Lock()
+        self.cargar(switches, enlaces)
+    
+    def cargar(self, switches: List[str], enlaces: List[Dict]):
+        """Reconstruir la adyacencia a partir de DPIDs y enlaces con el formato de Floodlight"""
+        adyacencia = {dpid: {} for dpid in switches}
+        for enlace in enlaces:
+            a, pa = enlace['src-switch'], enlace['src-port']
+            b, pb = enlace['dst-switch'], enlace['dst-port']
+            # Los enlaces se tratan como bidireccionales; ante enlaces paralelos se usa el primero
+            adyacencia.setdefault(a, {}).setdefault(b, (pa, pb))
+            adyacencia.setdefault(b, {}).setdefault(a, (pb, pa))
+        with self._lock:
+            # adyacencia: dpid -> {vecino: (puerto local, puerto del vecino)}
+            # siguientes: dst_dpid -> {dpid: (puerto de salida, siguiente dpid)}
+            self._grafo = (adyacencia, {})
+            self.generacion += 1
+    
+    @property
+    def adyacencia(self) -> Dict[str, Dict[str, Tuple[int, int]]]:
+        return self._grafo[0]
+    
+    def siguientes_saltos(self, dst_dpid: str) -> Dict[str, Tuple[int, str]]:
+        """Tabla de siguiente salto hacia dst_dpid para cada switch alcanzable (BFS)"""
+        return self._siguientes_saltos(self._grafo, dst_dpid)
+    
+    @staticmethod
+    def _siguientes_saltos(grafo, dst_dpid: str) -> Dict[str, Tuple[int, str]]:
+        adyacencia, siguientes = grafo
+        tabla = siguientes.get(dst_dpid)
+        if tabla is not None:
+            return tabla
+        tabla = {dst_dpid: None}
+        frontera = [dst_dpid]
+        while frontera:
+            siguiente_frontera = []
+            for actual in frontera:
+                for vecino in sorted(adyacencia.get(actual, {})):
+                    if vecino not in tabla:
+                        puerto_vecino = adyacencia[actual][vecino][1]
+                        tabla[vecino] = (puerto_vecino, actual)
+                        siguiente_frontera.append(vecino)
+            frontera = siguiente_frontera
+        siguientes[dst_dpid] = tabla
+        return tabla
+    
+    def precalcular(self, destinos):
+        """Precalcular las tablas de siguiente salto hacia varios switches"""
+        for dst_dpid in destinos:
+            self.siguientes_saltos(dst_dpid)
+    
+    def ruta(self, src_dpid: str, src_port: int, dst_dpid: str, dst_port: int) -> List[Tuple[str, int]]:
+        """Ruta más corta con el mismo formato que /wm/topology/route: (switch, puerto)
+        de entrada y de salida por cada switch del camino"""
+        grafo = self._grafo
+        adyacencia = grafo[0]
+        tabla = self._siguientes_saltos(grafo, dst_dpid)
+        if src_dpid not in tabla:
+            return []
+        ruta = []
+        actual, puerto_entrada = src_dpid, src_port
+        while tabla[actual] is not None:
+            puerto_salida, siguiente = tabla[actual]
+            ruta.append((actual, puerto_entrada))
+            ruta.append((actual, puerto_salida))
+            puerto_entrada = adyacencia[actual][siguiente][1]
+            actual = siguiente
+        ruta.append((actual, puerto_entrada))
+        ruta.append((actual, dst_port))
+        return ruta
+
+class RouteCache:
+    """Caché de rutas invalidada cuando cambia el conjunto de enlaces del controlador"""
+    def __init__(self, calcular, descargar_enlaces,
+                 intervalo_enlaces: float = ROUTE_CACHE_INTERVALO_ENLACES, al_cambiar=None):
+        self._calcular = calcular  # función (src_dpid, src_port, dst_dpid, dst_port) -> lista de saltos
+        self._descargar_enlaces = descargar_enlaces  # función que devuelve la lista de enlaces o None
+        self._al_cambiar = al_cambiar  # función llamada con los enlaces nuevos cuando cambian
+        self.intervalo_enlaces = intervalo_enlaces
+        self._rutas = {}  # (src_dpid, src_port, dst_dpid, dst_port) -> [(switch, port), ...]
+        self._generacion = 0  # Aumenta con cada invalidación
+        self._firma = None
+        self._verificado = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+    
+    @staticmethod
+    def firma_enlaces(enlaces: List[Dict]) -> frozenset:
+        return frozenset(
+            (l['src-switch'], l['src-port'], l['dst-switch'], l['dst-port'])
+            for l in enlaces
+        )
+    
+    @property
+    def enlaces(self) -> Optional[frozenset]:
+        """Enlaces vistos en la última verificación, como (src, src_port, dst, dst_port)"""
+        return self._firma
+    
+    def invalidar(self):
+        with self._lock:
+            self._rutas = {}
+            self._generacion += 1
+            self.invalidaciones += 1
+    
+    def verificar_enlaces(self, forzar: bool = False):
+        """Invalidar las rutas si el conjunto de enlaces cambió desde la última verificación"""
+        ahora = time.monotonic()
+        if (not forzar and self._verificado is not None and
+                ahora - self._verificado < self.intervalo_enlaces):
+            return
+        self._verificado = ahora
+        enlaces = self._descargar_enlaces()
+        if enlaces is None:
+            return
+        firma = self.firma_enlaces(enlaces)
+        if firma != self._firma:
+            # Primero se carga la topología nueva y después se invalida: una ruta calculada
+            # antes de la invalidación no se guarda y una calculada después ya usa la nueva
+            anterior, self._firma = self._firma, firma
+            if self._al_cambiar:
+                self._al_cambiar(enlaces)
+            if anterior is not None:
+                self.invalidar()
+    
+    def obtener(self, src_dpid: str, src_port: int, dst_dpid: str, dst_port: int) -> List[Tuple[str, int]]:
+        """Obtener una ruta, calculándola solo si no está en caché"""
+        self.verificar_enlaces()
+        clave = (src_dpid, src_port, dst_dpid, dst_port)
+        ruta = self._rutas.get(clave)
+        if ruta is not None:
+            self.hits += 1
+            return ruta
+        self.misses += 1
+        generacion = self._generacion
+        ruta = self._calcular(*clave)
+        if ruta:
+            with self._lock:
+                # Si hubo una invalidación mientras se calculaba, la ruta puede ser de la topología anterior
+                if generacion == self._generacion:
+                    self._rutas[clave] = ruta
+        return ruta
+    
+    def estadisticas(self) -> Dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidaciones': self.invalidaciones,
+            'rutas': len(self._rutas)
+        }
+
+class TareaPeriodica:
+    """Ejecuta una función cada cierto intervalo en un hilo de fondo"""
+    def __init__(self, nombre: str, funcion, intervalo: float):
+        self.nombre = nombre
+        self._funcion = funcion
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self._hilo = None
+    
+    def _ejecutar(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self._funcion()
+            except Exception as e:
+                print(f"Error en {self.nombre}: {e}")
+    
+    def iniciar(self) -> "TareaPeriodica":
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name=self.nombre, daemon=True)
+        self._hilo.start()
+        return self
+    
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+def _reemplazar_durable(temporal: str, destino: str):
+    """Reemplazar `destino` por `temporal` de forma que sobreviva a un corte de energía:
+    fsync del archivo nuevo, os.replace y fsync del directorio que registra el cambio de nombre"""
+    with open(temporal, 'rb') as file:
+        os.fsync(file.fileno())
+    os.replace(temporal, destino)
+    if os.name == 'posix':
+        directorio = os.open(os.path.dirname(os.path.abspath(destino)), os.O_RDONLY)
+        try:
+            os.fsync(directorio)
+        finally:
+            os.close(directorio)
+
+class Bitacora:
+    """Bitácora de cambios de solo anexado (una línea JSON por cambio) con fsync agrupado:
+    registrar solo encola la línea y un hilo la escribe cada `intervalo` segundos"""
+    def __init__(self, filename: str, intervalo: float = BITACORA_INTERVALO,
+                 max_entradas: int = BITACORA_MAX_ENTRADAS, compactar=None):
+        self.filename = filename
+        self.max_entradas = max_entradas
+        self._compactar = compactar  # función llamada cuando la bitácora supera max_entradas
+        self._reparar(filename)
+        self._archivo = open(filename, 'ab')
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self.entradas = sum(1 for _ in self.leer(filename))
+        self._compactando = False
+        self._tarea = TareaPeriodica("bitácora", self.sincronizar, intervalo).iniciar()
+    
+    @staticmethod
+    def leer(filename: str):
+        """Entradas de una bitácora; una última línea incompleta (caída a mitad de escritura)
+        se ignora y una línea dañada en medio del archivo se omite sin descartar las siguientes"""
+        if not os.path.exists(filename):
+            return
+        with open(filename, 'rb') as file:
+            danada = None
+            for numero, linea in enumerate(file, 1):
+                if danada is not None:
+                    print(f"Bitácora {filename}: se omite la línea {danada}, dañada")
+                    danada = None
+                try:
+                    yield json.loads(linea)
+                except ValueError:
+                    danada = numero
+    
+    @staticmethod
+    def _reparar(filename: str):
+        """Dejar el archivo terminado en una línea completa antes de seguir anexando: una última
+        línea cortada se descarta y a una entrada completa sin salto de línea se le agrega"""
+        if not os.path.exists(filename):
+            return
+        with open(filename, 'r+b') as file:
+            datos = file.read()
+            fin = datos.rfind(b"\n") + 1
+            cola = datos[fin:]
+            if not cola:
+                return
+            try:
+                json.loads(cola)
+            except ValueError:
+                file.truncate(fin)
+            else:
+                file.write(b"\n")
+    
+    def registrar(self, op: str, **datos):
+        linea = json.dumps({'op': op, **datos}, separators=(',', ':'))
+        with self._lock:
+            self._pendientes.append(linea)
+    
+    def sincronizar(self) -> int:
+        """Escribir las entradas pendientes y hacer fsync; devuelve la posición final del archivo"""
+        with self._lock:
+            if self._pendientes:
+                self._archivo.write(("\n".join(self._pendientes) + "\n").encode())
+                self._archivo.flush()
+                os.fsync(self._archivo.fileno())
+                self.entradas += len(self._pendientes)
+                self._pendientes = []
+            posicion = self._archivo.tell()
+            compactar = (self._compactar is not None and not self._compactando
+                         and self.entradas > self.max_entradas)
+            if compactar:
+                self._compactando = True
+        if compactar:
+            try:
+                self._compactar()
+            finally:
+                self._compactando = False
+        return posicion
+    
+    def reiniciar(self, base: Optional[str], desde: int = None):
+        """Empezar una bitácora nueva sobre `base` (YAML o snapshot), conservando las entradas
+        escritas después de la posición `desde`"""
+        with self._lock:
+            cola = b""
+            if desde is not None:
+                if self._pendientes:
+                    self._archivo.write(("\n".join(self._pendientes) + "\n").encode())
+                    self._archivo.flush()
+                with open(self.filename, 'rb') as file:
+                    file.seek(desde)
+                    cola = file.read()
+            # Sin `desde` lo pendiente queda reemplazado por la base nueva
+            self._pendientes = []
+            temporal = f"{self.filename}.tmp"
+            with open(temporal, 'wb') as file:
+                file.write((json.dumps({'op': 'base', 'archivo': base}) + "\n").encode() + cola)
+            self._archivo.close()
+            _reemplazar_durable(temporal, self.filename)
+            self._archivo = open(self.filename, 'ab')
+            self.entradas = 1 + cola.count(b"\n")
+    
+    def cerrar(self):
+        self._tarea.detener()
+        self.sincronizar()
+        self._archivo.close()
+
+class AgrupadorConexiones:
+    """Junta las solicitudes de conexión que llegan dentro de una ventana corta (o hasta
+    un máximo) y las provisiona como un solo lote; cada solicitud recibe un Future"""
+    def __init__(self, provisionar, ventana: float = AGRUPADOR_VENTANA, maximo: int = AGRUPADOR_MAXIMO):
+        self._provisionar = provisionar  # función [(alumno, servidor, servicio, vida, inactividad)] -> [resultado]
+        self.ventana = ventana
+        self.maximo = maximo
+        self._pendientes = []  # [(solicitud, Future)]
+        self._condicion = threading.Condition()
+        self._hilo = None
+        self._detenido = False
+        self.lotes = 0
+        self.solicitudes = 0
+        self.lote_maximo = 0
+    
+    def enviar(self, codigo_alumno, nombre_servidor: str, nombre_servicio: str,
+               vida: float = None, inactividad: float = None) -> Future:
+        """Encolar una solicitud; el Future se resuelve con el resultado de _provisionar"""
+        futuro = Future()
+        with self._condicion:
+            if self._detenido:
+                raise RuntimeError("el agrupador está detenido")
+            self._pendientes.append(
+                ((codigo_alumno, nombre_servidor, nombre_servicio, vida, inactividad), futuro)
+            )
+            self._condicion.notify()
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, name="agrupador", daemon=True)
+                self._hilo.start()
+        return futuro
+    
+    def _siguiente_lote(self) -> List:
+        with self._condicion:
+            while not self._pendientes and not self._detenido:
+                self._condicion.wait()
+            # Esperar más solicitudes hasta completar el lote o vencer la ventana
+            limite = time.monotonic() + self.ventana
+            while len(self._pendientes) < self.maximo and not self._detenido:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicion.wait(restante)
+            lote = self._pendientes[:self.maximo]
+            del self._pendientes[:self.maximo]
+            return lote
+    
+    def _ejecutar(self):
+        while True:
+            lote = self._siguiente_lote()
+            if not lote:
+                return
+            self.lotes += 1
+            self.solicitudes += len(lote)
+            self.lote_maximo = max(self.lote_maximo, len(lote))
+            try:
+                resultados = self._provisionar([solicitud for solicitud, _ in lote])
+            except Exception as e:
+                for _, futuro in lote:
+                    futuro.set_exception(e)
+                continue
+            for (_, futuro), resultado in zip(lote, resultados):
+                futuro.set_result(resultado)
+    
+    def detener(self):
+        """Procesar lo pendiente y terminar el hilo"""
+        with self._condicion:
+            self._detenido = True
+            self._condicion.notify()
+            hilo = self._hilo
+        if hilo is not None:
+            hilo.join()
+    
+    def estadisticas(self) -> Dict:
+        return {
+            'lotes': self.lotes,
+            'solicitudes': self.solicitudes,
+            'lote_medio': self.solicitudes / self.lotes if self.lotes else 0.0,
+            'lote_maximo': self.lote_maximo,
+            'pendientes': len(self._pendientes)
+        }
+
 class SDNApp:
     """Aplicación principal SDN"""
-    def __init__(self):
+    def __init__(self, floodlight: FloodlightClient = None, ruteo_local: bool = RUTEO_LOCAL,
+                 metricas: Metricas = None):
+        self.metricas = metricas or Metricas()
+        self.floodlight = floodlight or FloodlightClient()
+        self.floodlight.metricas = self.metricas
+        self._ejecutores = {}  # prioridad -> pool de hilos
+        self._lock_ejecutores = threading.Lock()
+        self._agrupador = None
+        self.bitacora = None
+        self._reproduciendo = False
+        self._lock = threading.RLock()
         self.alumnos = {} 
         self.cursos = {}  
         self.servidores = {}
-        self.conexiones = {} 
+        self.conexiones = RegistroConexiones()
+        self.flows = RegistroFlows()
         self.connection_counter = 0
+        # Índice de permisos: código de alumno -> {(servidor, servicio): {cursos que lo otorgan}}
+        self.permisos = {}
+        # Las mismas políticas como matrices para consultas masivas (requiere NumPy)
+        self._matriz = None  # Se compila en la primera consulta de políticas
+        self.device_cache = DeviceCache(self._descargar_dispositivos)
+        self.topologia = TopologiaLocal() if ruteo_local else None
+        self._vigilante = None
+        self._enlaces_vigilados = None
+        self._por_reenrutar = set()
+        self.vida_conexiones = CONEXION_VIDA
+        self.inactividad_conexiones = CONEXION_INACTIVIDAD
+        self._recolector = None
+        self._paquetes = {}  # flow -> packet_count de la última pasada del recolector
+        self.route_cache = RouteCache(
+            self._calcular_ruta, self._descargar_enlaces,
+            al_cambiar=self._enlaces_cambiaron if ruteo_local else None
+        )
+        self.metricas.registrar_fuente('device_cache', self.device_cache.estadisticas)
+        self.metricas.registrar_fuente('route_cache', self.route_cache.estadisticas)
+        self.metricas.registrar_fuente('conexiones', lambda: {'activas': len(self.conexiones)})
+        self.metricas.registrar_fuente('flows', lambda: self.flows.estadisticas())
+        self.metricas.registrar_fuente('limitador', lambda: self.floodlight.estadisticas_limitador())
     
-    def importar_yaml(self, filename: str):
-        """Importar datos desde archivo YAML"""
+    def importar_yaml(self, filename: str) -> bool:
+        """Importar datos desde archivo YAML; devuelve si se pudo importar"""
+        yaml = _cargar_yaml()
         try:
             with open(filename, 'r', encoding='utf-8') as file:
                 data = yaml.safe_load(file)
@@ -181,7 +1947,97 @@ class SDNApp:
                     curso.servidores = curso_data.get('servidores', [])
                     self.cursos[curso.codigo] = curso
             
+            self.reconstruir_permisos()
+            self._nueva_base(filename)
+            print(f"Datos importados exitosamente desde {filename}")
+            return True
+            
+        except FileNotFoundError:
+            print(f"Error: No se encontró el archivo {filename}")
+        except yaml.YAMLError as e:
+            print(f"Error al leer el archivo YAML: {e}")
+        except Exception as e:
+            print(f"Error inesperado: {e}")
+        return False
+    
+    def importar_yaml_rapido(self, filename: str) -> Optional[Dict[str, float]]:
+        """Importar datos desde archivo YAML con libyaml, procesando los alumnos a medida
+        que se leen y actualizando el índice de permisos en la misma pasada"""
+        yaml = _cargar_yaml()
+        construccion = 0.0
+        inicio = time.perf_counter()
+        try:
+            with open(filename, 'rb') as file:
+                loader = _yaml_loader()(file)
+                anclas = {}
+                try:
+                    loader.get_event()  # StreamStart
+                    if loader.check_event(yaml.StreamEndEvent):
+                        data = {}
+                    else:
+                        loader.get_event()  # DocumentStart
+                        if not loader.check_event(yaml.MappingStartEvent):
+                            raise yaml.YAMLError("El documento debe ser un mapeo")
+                        loader.get_event()
+                        data = {}
+                        while not loader.check_event(yaml.MappingEndEvent):
+                            clave = _valor_yaml(loader, anclas)
+                            if clave == 'alumnos' and loader.check_event(yaml.SequenceStartEvent):
+                                loader.get_event()
+                                while not loader.check_event(yaml.SequenceEndEvent):
+                                    alumno_data = _valor_yaml(loader, anclas)
+                                    t = time.perf_counter()
+                                    alumno = Alumno(
+                                        alumno_data['nombre'],
+                                        alumno_data['codigo'],
+                                        alumno_data['mac']
+                                    )
+                                    self.alumnos[alumno.codigo] = alumno
+                                    construccion += time.perf_counter() - t
+                                loader.get_event()
+                            else:
+                                data[clave] = _valor_yaml(loader, anclas)
+                finally:
+                    loader.dispose()
+            
+            t = time.perf_counter()
+            for servidor_data in data.get('servidores') or []:
+                servidor = Servidor(
+                    servidor_data['nombre'],
+                    servidor_data['ip'],
+                    servidor_data.get('servicios', [])
+                )
+                self.servidores[servidor.nombre] = servidor
+            
+            for curso_data in data.get('cursos') or []:
+                curso = Curso(
+                    curso_data['codigo'],
+                    curso_data['nombre'],
+                    curso_data.get('estado', 'DICTANDO')
+                )
+                curso.alumnos = curso_data.get('alumnos', [])
+                curso.servidores = curso_data.get('servidores', [])
+                
+                # Actualizar el índice de permisos en la misma pasada
+                anterior = self.cursos.get(curso.codigo)
+                if anterior is not None and anterior.estado == "DICTANDO":
+                    for codigo_alumno in anterior.alumnos:
+                        self._revocar_permisos(codigo_alumno, anterior, anterior.permisos())
+                curso._observador = self
+                if curso.estado == "DICTANDO":
+                    pares = list(curso.permisos())
+                    for codigo_alumno in curso.alumnos:
+                        self._otorgar_permisos(codigo_alumno, curso, pares)
+                self.cursos[curso.codigo] = curso
+            self._matriz = None
+            construccion += time.perf_counter() - t
+            
+            total = time.perf_counter() - inicio
+            tiempos = {'parseo': total - construccion, 'construccion': construccion, 'total': total}
+            self._nueva_base(filename)
             print(f"Datos importados exitosamente desde {filename}")
+            print(f"Parseo: {tiempos['parseo']:.3f} s, construcción: {construccion:.3f} s, total: {total:.3f} s")
+            return tiempos
             
         except FileNotFoundError:
             print(f"Error: No se encontró el archivo {filename}")
@@ -189,9 +2045,11 @@ class SDNApp:
             print(f"Error al leer el archivo YAML: {e}")
         except Exception as e:
             print(f"Error inesperado: {e}")
+        return None
     
     def exportar_yaml(self, filename: str):
         """Exportar datos a archivo YAML"""
+        yaml = _cargar_yaml()
         try:
             data = {
                 'alumnos': [alumno.to_dict() for alumno in self.alumnos.values()],
@@ -207,6 +2065,358 @@ class SDNApp:
         except Exception as e:
             print(f"Error al exportar: {e}")
     
+    def guardar_snapshot(self, filename: str) -> bool:
+        """Guardar el estado completo, incluidas las conexiones, en un snapshot SQLite"""
+        temporal = f"{filename}.tmp"
+        try:
+            # Copias tomadas antes de escribir: la compactación de la bitácora guarda el snapshot
+            # desde su propio hilo mientras otros hilos siguen modificando el estado
+            alumnos = list(self.alumnos.values())
+            servidores = list(self.servidores.values())
+            cursos = [(c, list(c.alumnos), list(c.servidores)) for c in list(self.cursos.values())]
+            conexiones = self.conexiones.values()
+            flows = self.flows.items()
+            paquetes = dict(self._paquetes)
+            
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            db = sqlite3.connect(temporal)
+            try:
+                db.executescript("""
+                    PRAGMA journal_mode = OFF;
+                    PRAGMA synchronous = OFF;
+                    CREATE TABLE meta (clave TEXT PRIMARY KEY, valor);
+                    CREATE TABLE alumnos (codigo, nombre TEXT, mac INTEGER);
+                    CREATE TABLE servidores (nombre TEXT, ip TEXT, servicios TEXT);
+                    CREATE TABLE cursos (codigo, nombre TEXT, estado TEXT, alumnos TEXT, servidores TEXT);
+                    CREATE TABLE conexiones (handler TEXT, alumno_mac INTEGER, servidor_ip TEXT, servicio TEXT,
+                                             codigo_alumno, nombre_servidor TEXT, cursos TEXT, flows TEXT);
+                    CREATE TABLE flows (nombre TEXT, flow TEXT);
+                    CREATE TABLE rutas (handler TEXT, ruta TEXT);
+                    CREATE TABLE vigencias (handler TEXT, creada REAL, actividad REAL, vida REAL, inactividad REAL);
+                """)
+                db.execute("INSERT INTO meta VALUES ('connection_counter', ?)", (self.connection_counter,))
+                db.execute("INSERT INTO meta VALUES ('paquetes', ?)", (json.dumps(paquetes),))
+                db.executemany("INSERT INTO alumnos VALUES (?, ?, ?)", (
+                    (a.codigo, a.nombre, a._mac) for a in alumnos
+                ))
+                db.executemany("INSERT INTO servidores VALUES (?, ?, ?)", (
+                    (srv.nombre, srv.ip, json.dumps(srv.to_dict()['servicios'])) for srv in servidores
+                ))
+                db.executemany("INSERT INTO cursos VALUES (?, ?, ?, ?, ?)", (
+                    (c.codigo, c.nombre, c.estado, json.dumps(codigos), json.dumps(servidores_curso))
+                    for c, codigos, servidores_curso in cursos
+                ))
+                db.executemany("INSERT INTO conexiones VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+                    (c.handler, c._mac, c.servidor_ip, c.servicio, c.codigo_alumno,
+                     c.nombre_servidor, json.dumps(list(c.cursos)), json.dumps(c.flow_entries))
+                    for c in conexiones
+                ))
+                db.executemany("INSERT INTO flows VALUES (?, ?)", (
+                    (nombre, json.dumps(flow)) for nombre, flow, _ in flows
+                ))
+                db.executemany("INSERT INTO rutas VALUES (?, ?)", (
+                    (c.handler, json.dumps(c.ruta)) for c in conexiones if c.ruta
+                ))
+                db.executemany("INSERT INTO vigencias VALUES (?, ?, ?, ?, ?)", (
+                    (c.handler, c.creada, c.actividad, c.vida, c.inactividad) for c in conexiones
+                ))
+                db.commit()
+            finally:
+                db.close()
+            # Sin journal ni synchronous de SQLite: la durabilidad la da el fsync antes de
+            # reemplazar, para que la bitácora nunca apunte a un snapshot incompleto
+            _reemplazar_durable(temporal, filename)
+            print(f"Snapshot guardado en {filename}")
+            return True
+            
+        except Exception as e:
+            print(f"Error al guardar snapshot: {e}")
+            return False
+    
+    def cargar_snapshot(self, filename: str) -> bool:
+        """Reemplazar el estado actual por el de un snapshot SQLite"""
+        if not os.path.exists(filename):
+            print(f"Error: No se encontró el archivo {filename}")
+            return False
+        try:
+            db = sqlite3.connect(filename)
+            try:
+                alumnos = {}
+                for codigo, nombre, mac in db.execute("SELECT * FROM alumnos"):
+                    alumnos[codigo] = Alumno(nombre, codigo, mac)
+                
+                servidores = {}
+                for nombre, ip, servicios in db.execute("SELECT * FROM servidores"):
+                    servidores[nombre] = Servidor(nombre, ip, json.loads(servicios))
+                
+                cursos = {}
+                for codigo, nombre, estado, codigos, servidores_curso in db.execute("SELECT * FROM cursos"):
+                    curso = Curso(codigo, nombre, estado)
+                    curso.alumnos = json.loads(codigos)
+                    curso.servidores = json.loads(servidores_curso)
+                    cursos[codigo] = curso
+                
+                # Los snapshots anteriores no guardan los flows; sus nombres se tratan como exclusivos
+                flows = RegistroFlows()
+                if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'flows'").fetchone():
+                    for nombre, flow in db.execute("SELECT * FROM flows"):
+                        flows.agregar(nombre, json.loads(flow))
+                rutas = {}
+                if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'rutas'").fetchone():
+                    rutas = {handler: ruta for handler, ruta in db.execute("SELECT * FROM rutas")}
+                vigencias = {}
+                if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'vigencias'").fetchone():
+                    vigencias = {fila[0]: fila[1:] for fila in db.execute("SELECT * FROM vigencias")}
+                
+                conexiones = RegistroConexiones()
+                for (handler, mac, ip, servicio, codigo_alumno,
+                     nombre_servidor, cursos_conexion, nombres) in db.execute("SELECT * FROM conexiones"):
+                    conexion = Conexion(handler, mac, ip, servicio, codigo_alumno,
+                                        nombre_servidor, json.loads(cursos_conexion))
+                    conexion.flow_entries = json.loads(nombres)
+                    if handler in rutas:
+                        conexion.ruta = tuple(tuple(salto) for salto in json.loads(rutas[handler]))
+                    if handler in vigencias:
+                        conexion.creada, conexion.actividad, conexion.vida, conexion.inactividad = vigencias[handler]
+                    flows.restaurar(handler, conexion.flow_entries)
+                    conexiones[handler] = conexion
+                
+                (contador,) = db.execute(
+                    "SELECT valor FROM meta WHERE clave = 'connection_counter'"
+                ).fetchone()
+                paquetes = db.execute("SELECT valor FROM meta WHERE clave = 'paquetes'").fetchone()
+            finally:
+                db.close()
+            
+            self.alumnos = alumnos
+            self.servidores = servidores
+            self.cursos = cursos
+            self.conexiones = conexiones
+            self.flows = flows
+            self.connection_counter = contador
+            self._enlaces_vigilados = None
+            self._paquetes = json.loads(paquetes[0]) if paquetes else {}
+            self.reconstruir_permisos()
+            self._nueva_base(filename)
+            print(f"Snapshot cargado desde {filename}")
+            return True
+            
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Error al leer el snapshot: {e}")
+            return False
+    
+    def abrir_bitacora(self, filename: str):
+        """Cargar la base (YAML o snapshot) indicada en la bitácora, reproducir sus cambios
+        y seguir registrando en ella los cambios nuevos"""
+        entradas = Bitacora.leer(filename)
+        primera = next(entradas, None)
+        if primera is not None and primera.get('op') == 'base':
+            base = primera.get('archivo')
+            if base and base.endswith(SNAPSHOT_EXTENSION):
+                self.cargar_snapshot(base)
+            elif base:
+                self.importar_yaml(base)
+        elif primera is not None:
+            entradas = iter([primera, *entradas])
+        
+        aplicadas = 0
+        self._reproduciendo = True
+        try:
+            for entrada in entradas:
+                self._aplicar_entrada(entrada)
+                aplicadas += 1
+        finally:
+            self._reproduciendo = False
+        self.bitacora = Bitacora(filename, compactar=self.compactar_bitacora)
+        if primera is None:
+            self.bitacora.reiniciar(None)
+        print(f"Bitácora {filename}: {aplicadas} cambios reproducidos")
+    
+    def compactar_bitacora(self):
+        """Guardar el estado en un snapshot y reiniciar la bitácora sobre él"""
+        bitacora = self.bitacora
+        posicion = bitacora.sincronizar()
+        snapshot = f"{bitacora.filename}{SNAPSHOT_EXTENSION}"
+        if self.guardar_snapshot(snapshot):
+            bitacora.reiniciar(os.path.abspath(snapshot), desde=posicion)
+    
+    def cerrar_bitacora(self):
+        if self.bitacora is not None:
+            self.bitacora.cerrar()
+            self.bitacora = None
+    
+    def _nueva_base(self, filename: str):
+        """Tras importar un estado completo, los cambios anteriores de la bitácora ya no aplican"""
+        if self.bitacora is not None:
+            self.bitacora.reiniciar(os.path.abspath(filename))
+    
+    def _registrar(self, op: str, **datos):
+        if self.bitacora is not None and not self._reproduciendo:
+            self.bitacora.registrar(op, **datos)
+    
+    def _registrar_flows(self, op: str, conexion: Conexion, **datos):
+        """Registrar una conexión con sus flows y la definición de cada uno"""
+        if self.bitacora is None or self._reproduciendo:
+            return
+        definiciones = {nombre: self.flows.obtener(nombre) for nombre in conexion.flow_entries}
+        self.bitacora.registrar(
+            op, handler=conexion.handler, flows=conexion.flow_entries, ruta=conexion.ruta,
+            definiciones={nombre: flow for nombre, flow in definiciones.items() if flow is not None},
+            contador=self.connection_counter, **datos
+        )
+    
+    def _aplicar_entrada(self, entrada: Dict):
+        """Reproducir un cambio de la bitácora sin tocar el controlador"""
+        op = entrada['op']
+        if op in ('crear', 'flows'):
+            # Un re-enrutamiento puede haber modificado la definición de un flow con el mismo nombre
+            for nombre, flow in entrada['definiciones'].items():
+                if self.flows.obtener(nombre) != flow:
+                    self.flows.agregar(nombre, flow)
+            self.connection_counter = max(self.connection_counter, entrada['contador'])
+        
+        if op == 'crear':
+            conexion = Conexion(entrada['handler'], entrada['mac'], entrada['servidor_ip'], entrada['servicio'],
+                                entrada['alumno'], entrada['servidor'], entrada['cursos'])
+            conexion.flow_entries = entrada['flows']
+            conexion.ruta = tuple(tuple(salto) for salto in entrada['ruta'])
+            conexion.creada = conexion.actividad = entrada.get('creada', conexion.creada)
+            conexion.vida = entrada.get('vida')
+            conexion.inactividad = entrada.get('inactividad')
+            self.flows.restaurar(conexion.handler, conexion.flow_entries)
+            self.conexiones[conexion.handler] = conexion
+        elif op == 'flows':
+            conexion = self.conexiones.get(entrada['handler'])
+            if conexion is not None:
+                anteriores = [nombre for nombre in conexion.flow_entries if nombre not in set(entrada['flows'])]
+                self.flows.retirados(self.flows.liberar(conexion.handler, anteriores))
+                self.flows.restaurar(conexion.handler, entrada['flows'])
+                self.conexiones.actualizar_ruta(conexion.handler, (tuple(salto) for salto in entrada['ruta']),
+                                                entrada['flows'])
+        elif op == 'eliminar':
+            conexion = self.conexiones.get(entrada['handler'])
+            if conexion is not None:
+                self.flows.retirados(self.flows.liberar(conexion.handler, conexion.flow_entries))
+                del self.conexiones[conexion.handler]
+        elif op == 'vigencia':
+            conexion = self.conexiones.get(entrada['handler'])
+            if conexion is not None:
+                conexion.vida = entrada['vida']
+                conexion.inactividad = entrada['inactividad']
+        elif op == 'agregar_alumno':
+            self.alumnos[entrada['codigo']] = Alumno(entrada['nombre'], entrada['codigo'], entrada['mac'])
+        elif op == 'agregar_alumno_a_curso':
+            if entrada['curso'] in self.cursos:
+                self.cursos[entrada['curso']].agregar_alumno(entrada['alumno'])
+        elif op == 'remover_alumno':
+            if entrada['curso'] in self.cursos:
+                self.cursos[entrada['curso']].remover_alumno(entrada['alumno'])
+        elif op == 'estado_curso':
+            if entrada['curso'] in self.cursos:
+                self.cursos[entrada['curso']].estado = entrada['estado']
+    
+    def reconstruir_permisos(self):
+        """Reconstruir el índice de permisos a partir de los cursos"""
+        self.permisos = {}
+        for curso in self.cursos.values():
+            curso._observador = self
+            if curso.estado == "DICTANDO":
+                for codigo_alumno in curso.alumnos:
+                    self._otorgar_permisos(codigo_alumno, curso, curso.permisos())
+        self._matriz = None
+    
+    @property
+    def matriz(self) -> Optional[MatrizPoliticas]:
+        """Políticas compiladas en matrices; se construyen en la primera consulta y luego
+        se actualizan de forma incremental. None si NumPy no está instalado"""
+        if self._matriz is None and _cargar_numpy() is not None:
+            matriz = MatrizPoliticas()
+            matriz.construir(self.cursos)
+            self._matriz = matriz
+        return self._matriz
+    
+    def _otorgar_permisos(self, codigo_alumno: str, curso: Curso, pares):
+        permisos_alumno = self.permisos.setdefault(codigo_alumno, {})
+        for par in pares:
+            permisos_alumno.setdefault(par, set()).add(curso.codigo)
+    
+    def _revocar_permisos(self, codigo_alumno: str, curso: Curso, pares):
+        permisos_alumno = self.permisos.get(codigo_alumno)
+        if not permisos_alumno:
+            return
+        for par in pares:
+            cursos = permisos_alumno.get(par)
+            if cursos:
+                cursos.discard(curso.codigo)
+                if not cursos:
+                    del permisos_alumno[par]
+        if not permisos_alumno:
+            del self.permisos[codigo_alumno]
+    
+    def _curso_alumno_agregado(self, curso: Curso, codigo_alumno: str):
+        self._registrar('agregar_alumno_a_curso', curso=curso.codigo, alumno=codigo_alumno)
+        if self._matriz is not None:
+            self._matriz.alumno_inscrito(curso.codigo, codigo_alumno, 1)
+        if curso.estado == "DICTANDO":
+            self._otorgar_permisos(codigo_alumno, curso, curso.permisos())
+    
+    def _curso_alumno_removido(self, curso: Curso, codigo_alumno: str):
+        self._registrar('remover_alumno', curso=curso.codigo, alumno=codigo_alumno)
+        if self._matriz is not None:
+            self._matriz.alumno_inscrito(curso.codigo, codigo_alumno, -1)
+        if curso.estado == "DICTANDO":
+            self._revocar_permisos(codigo_alumno, curso, curso.permisos())
+            # Al reproducir la bitácora las revocaciones ya están registradas como eliminaciones
+            if codigo_alumno in self.alumnos and not self._reproduciendo:
+                afectadas = (self.conexiones.por_mac(self.alumnos[codigo_alumno].mac) &
+                             self.conexiones.por_curso(curso.codigo))
+                self._revisar_conexiones(afectadas)
+    
+    def _curso_servidor_agregado(self, curso: Curso, servidor_config: Dict):
+        pares = [(servidor_config['nombre'], s) for s in servidor_config['servicios_permitidos']]
+        if self._matriz is not None:
+            self._matriz.permisos_agregados(curso.codigo, pares, curso.alumnos)
+        if curso.estado == "DICTANDO":
+            for codigo_alumno in curso.alumnos:
+                self._otorgar_permisos(codigo_alumno, curso, pares)
+    
+    def _curso_cambio_estado(self, curso: Curso, estado_anterior: str):
+        self._registrar('estado_curso', curso=curso.codigo, estado=curso.estado)
+        if self._matriz is not None:
+            self._matriz.estado_cambiado(curso.codigo, curso.estado == "DICTANDO", curso.alumnos)
+        if curso.estado == "DICTANDO":
+            for codigo_alumno in curso.alumnos:
+                self._otorgar_permisos(codigo_alumno, curso, curso.permisos())
+        elif estado_anterior == "DICTANDO":
+            for codigo_alumno in curso.alumnos:
+                self._revocar_permisos(codigo_alumno, curso, curso.permisos())
+            # Al reproducir la bitácora las revocaciones ya están registradas como eliminaciones
+            if not self._reproduciendo:
+                self._revisar_conexiones(self.conexiones.por_curso(curso.codigo))
+    
+    def _cursos_que_otorgan(self, codigo_alumno: str, nombre_servidor: str, nombre_servicio: str) -> set:
+        return set(self.permisos.get(codigo_alumno, {}).get((nombre_servidor, nombre_servicio), ()))
+    
+    def _revisar_conexiones(self, handlers):
+        """Revocar las conexiones que perdieron su autorización tras un cambio de política"""
+        revocar = []
+        for handler in handlers:
+            # Otro hilo (recolector, vigilante de topología o la API) pudo eliminarla mientras tanto
+            conexion = self.conexiones.get(handler)
+            if conexion is None:
+                continue
+            cursos = self._cursos_que_otorgan(
+                conexion.codigo_alumno, conexion.nombre_servidor, conexion.servicio
+            )
+            if cursos:
+                self.conexiones.actualizar_cursos(handler, cursos)
+            else:
+                revocar.append(handler)
+        if revocar:
+            print(f"Revocando {len(revocar)} conexiones sin autorización")
+            self.eliminar_conexiones(revocar)
+    
     def alumno_autorizado(self, codigo_alumno: str, nombre_servidor: str, nombre_servicio: str) -> bool:
         """Verificar si un alumno está autorizado para acceder a un servicio"""
         if codigo_alumno not in self.alumnos:
@@ -220,115 +2430,254 @@ class SDNApp:
         if not servicio:
             return False
         
-        # Verificar en todos los cursos
-        for curso in self.cursos.values():
-            if (curso.estado == "DICTANDO" and 
-                codigo_alumno in curso.alumnos):
-                
-                # Verificar si el curso tiene acceso al servidor y servicio
-                for servidor_config in curso.servidores:
-                    if (servidor_config['nombre'] == nombre_servidor and
-                        nombre_servicio in servidor_config['servicios_permitidos']):
-                        return True
-        
-        return False
+        # Consultar el índice de permisos de cursos en estado DICTANDO
+        permisos_alumno = self.permisos.get(codigo_alumno)
+        return bool(permisos_alumno) and (nombre_servidor, nombre_servicio) in permisos_alumno
     
     
 
 
-    def build_route(self, alumno_mac: str, servidor_ip: str, servicio: Servicio) -> bool:
-        """Construir e instalar rutas en la red"""
+    def _descargar_dispositivos(self) -> Optional[List[Dict]]:
+        """Descargar la tabla de dispositivos del controlador"""
+        try:
+            return self.floodlight.dispositivos()
+        except FloodlightError as e:
+            print(f"Error al consultar dispositivos: {e}")
+            return None
+    
+    def _descargar_enlaces(self) -> Optional[List[Dict]]:
+        """Descargar el conjunto de enlaces entre switches"""
+        try:
+            return self.floodlight.enlaces()
+        except FloodlightError as e:
+            print(f"Error al consultar enlaces: {e}")
+            return None
+    
+    def _enlaces_cambiaron(self, enlaces: List[Dict]):
+        """Recargar la topología local y precalcular los saltos hacia los servidores"""
+        try:
+            switches = [sw['switchDPID'] for sw in self.floodlight.switches()]
+        except FloodlightError as e:
+            print(f"Error al consultar switches: {e}")
+            switches = []
+        self.topologia.cargar(switches, enlaces)
+        self.precalcular_rutas_servidores()
+    
+    def precalcular_rutas_servidores(self):
+        """Precalcular en la topología local los siguientes saltos hacia cada servidor"""
+        if self.topologia is None:
+            return
+        puntos = (self._punto_servidor(servidor.ip) for servidor in self.servidores.values())
+        self.topologia.precalcular(punto[0] for punto in puntos if punto)
+    
+    def _calcular_ruta(self, src_dpid, src_port, dst_dpid, dst_port) -> List[Tuple[str, int]]:
+        """Calcular la ruta entre dos attachment points, localmente o con el controlador"""
+        if self.topologia is not None:
+            return self.topologia.ruta(src_dpid, src_port, dst_dpid, dst_port)
+        try:
+            return self.floodlight.ruta(src_dpid, src_port, dst_dpid, dst_port)
+        except FloodlightError as e:
+            print(f"Error al calcular ruta: {e}")
+            return []
+    
+    def _nuevo_handler(self) -> Tuple[str, str]:
+        """Reservar un handler de conexión y el prefijo de nombre de sus flows"""
+        with self._lock:
+            handler = f"conn_{self.connection_counter}"
+            self.connection_counter += 1
+            return handler, f"{FLOW_PREFIJO}{self.connection_counter}"
+    
+    def build_route(self, alumno_mac: str, servidor_ip: str, servicio: Servicio,
+                    prefijo: str = None, handler: str = None) -> Optional[List[str]]:
+        """Construir e instalar rutas en la red; devuelve los nombres de los flows que usa
+        la conexión, reutilizando los idénticos que ya estén instalados"""
         def get_attachment_points(mac_address):
-            url = f"{FLOODLIGHT_URL}/wm/device/"
-            response = requests.get(url)
-
-            if response.status_code == 200:
-                data = response.json()
-                for host in data:
-                    if mac_address.lower() in [m.lower() for m in host.get("mac", [])]:
-                        aps = host.get("attachmentPoint", [])
-                        if aps:
-                            punto = aps[0]
-                            return punto["switchDPID"], punto["port"]
-                        else:
-                            print(f"La MAC {mac_address} no tiene attachmentPoint.")
-                print(f"La MAC {mac_address} no fue encontrada.")
+            encontrada, punto = self.device_cache.buscar_mac(mac_address)
+            if punto:
+                return punto
+            if encontrada:
+                print(f"La MAC {mac_address} no tiene attachmentPoint.")
             else:
-                print(f"[{response.status_code}]")
-                print(f"Respuesta: {response.text}")
-            
+                print(f"La MAC {mac_address} no fue encontrada.")
             return None, None
         
-        def get_route(src_dpid, src_port, dst_dpid, dst_port):
-
-            url = f"{FLOODLIGHT_URL}/wm/topology/route/{src_dpid}/{src_port}/{dst_dpid}/{dst_port}/json"
-            response = requests.get(url)
-
-            if response.status_code == 200:
-                ruta = response.json()
-                
-                return [(hop["switch"], hop["port"]["portNumber"]) for hop in ruta]
-            return []
         try:
             # Obtener attachment points
-            
-            src_dpid, src_port = get_attachment_points(alumno_mac)
-            dst_dpid, dst_port = get_attachment_points("FA:16:3E:5F:6E:D7")
+            with self.metricas.medir('etapa', etapa='attachment_points'):
+                src_dpid, src_port = get_attachment_points(alumno_mac)
+                dst_dpid, dst_port = self._punto_servidor(servidor_ip) or get_attachment_points(SERVIDOR_MAC)
             
             if not src_dpid or not dst_dpid:
                 print("Error: No se pudieron obtener los attachment points")
-                return False
+                return None
             
             # Obtener ruta
-            route = get_route(src_dpid, src_port, dst_dpid, dst_port)
+            with self.metricas.medir('etapa', etapa='ruta'):
+                route = self.route_cache.obtener(src_dpid, src_port, dst_dpid, dst_port)
             
             print(f'{src_dpid} "/" {src_port} "/" {dst_dpid} "/" {dst_port}')
             print("Ruta encontrada")
             
             if not route:
                 print("Error: No se pudo calcular la ruta")
-                return False
+                return None
             
-            # Instalar flows
-            flow_entries = []
-
-            # Flow para tráfico alumno hacia el server
-            for hop in route:
-                switch_dpid, output_port = hop
-                flow_entry = {
-                    "switch": switch_dpid,
-                    "name": f"flow_{self.connection_counter}_{switch_dpid}",
-                    "cookie": "0",
-                    "priority": "1000",
-                    "active": "true",
-                    "match": {
-                        "dl_src": alumno_mac,
-                        "dl_type": "0x0800",
-                        "nw_dst": servidor_ip,
-                        "nw_proto": "6" if servicio.protocolo == "TCP" else "17",
-                        "tp_dst": str(servicio.puerto)
-                    },
-                    "actions": f"output={output_port}"
-                }
-                
-                # Instalar flow
-                url = f"{FLOODLIGHT_URL}/wm/staticflowpusher/json"
-                response = requests.post(url, json=flow_entry, timeout=20)
-                
-                if response.status_code == 200:
-                    flow_entries.append(flow_entry)
-                else:
-                    print(f"Error al instalar flow en switch {switch_dpid}")
-                    return False
+            # Instalar flows para tráfico alumno hacia el server
+            prefijo = prefijo or f"{FLOW_PREFIJO}{self.connection_counter}"
+            flow_entries = self._construir_flows(prefijo, alumno_mac, servidor_ip, servicio, route)
+            with self.metricas.medir('etapa', etapa='instalar_flows'):
+                return self._instalar_flows(flow_entries, handler or prefijo)
             
         except Exception as e:
             print(f"Error al construir ruta: {e}")
-            return False
+            return None
     
+    def _construir_flows(self, prefijo: str, alumno_mac: str, servidor_ip: str,
+                         servicio: Servicio, route: List[Tuple[str, int]]) -> List[Dict]:
+        """Construir un flow por switch de la ruta"""
+        # La ruta de Floodlight lista (switch, puerto de entrada) y (switch, puerto de salida);
+        # nos quedamos con el último puerto de cada switch, que es el de salida
+        salidas = dict(route)
+        return [
+            {
+                "switch": switch_dpid,
+                "name": f"{prefijo}_{switch_dpid}",
+                "cookie": "0",
+                "priority": "1000",
+                "active": "true",
+                "match": {
+                    "dl_src": alumno_mac,
+                    "dl_type": "0x0800",
+                    "nw_dst": servidor_ip,
+                    "nw_proto": "6" if servicio.protocolo == "TCP" else "17",
+                    "tp_dst": str(servicio.puerto)
+                },
+                "actions": f"output={output_port}"
+            }
+            for switch_dpid, output_port in salidas.items()
+        ]
     
-    def crear_conexion(self, codigo_alumno: str, nombre_servidor: str, nombre_servicio: str) -> Optional[str]:
-        """Crear una conexión entre alumno y servidor"""
-        if not self.alumno_autorizado(codigo_alumno, nombre_servidor, nombre_servicio):
+    def _pool(self, prioridad: int = PRIORIDAD_INTERACTIVA) -> ThreadPoolExecutor:
+        # Un pool por prioridad: las tareas interactivas no esperan detrás de las masivas en la cola
+        ejecutor = self._ejecutores.get(prioridad)
+        if ejecutor is None:
+            with self._lock_ejecutores:
+                ejecutor = self._ejecutores.get(prioridad)
+                if ejecutor is None:
+                    ejecutor = self._ejecutores[prioridad] = ThreadPoolExecutor(
+                        max_workers=FLOW_WORKERS, thread_name_prefix=f"flows_p{prioridad}"
+                    )
+        return ejecutor
+    
+    def _enviar(self, funcion, *args) -> Future:
+        """Ejecutar en el pool de la prioridad del hilo que encola la tarea, conservándola"""
+        prioridad = prioridad_actual()
+        
+        def tarea():
+            with con_prioridad(prioridad):
+                return funcion(*args)
+        return self._pool(prioridad).submit(tarea)
+    
+    def _punto_servidor(self, servidor_ip: str) -> Optional[Tuple[str, int]]:
+        """Attachment point de un servidor por IP o, si no se conoce, por la MAC del servidor"""
+        punto = self.device_cache.buscar_ip(servidor_ip)
+        if punto:
+            return punto
+        return self.device_cache.buscar_mac(SERVIDOR_MAC)[1]
+    
+    def _ruta_actual(self, alumno_mac, servidor_ip: str) -> Tuple:
+        """Ruta vigente entre un alumno y un servidor según las cachés, o () si no se conoce"""
+        src = self.device_cache.buscar_mac(alumno_mac)[1]
+        dst = self._punto_servidor(servidor_ip)
+        if not src or not dst:
+            return ()
+        return tuple(self.route_cache.obtener(*src, *dst))
+    
+    def _instalar_flows(self, flow_entries: List[Dict], dueno: str) -> Optional[List[str]]:
+        """Instalar flows en paralelo; si alguno falla se retiran los ya instalados"""
+        return self._instalar_grupos({dueno: flow_entries})[dueno]
+    
+    def _instalar_grupos(self, grupos: Dict[str, List[Dict]],
+                         reemplazar: bool = False) -> Dict[str, Optional[List[str]]]:
+        """Instalar en paralelo los flows de varias conexiones, cada grupo de forma atómica.
+        Los flows idénticos a uno registrado no se vuelven a enviar; devuelve por grupo
+        los nombres de los flows que usa, o None si no se pudo instalar.
+        Con reemplazar=True los flows con el match de uno registrado lo modifican (ver RegistroFlows.reservar)"""
+        reservas, fallidos = {}, set()
+        for dueno, flow_entries in grupos.items():
+            try:
+                reservas[dueno] = self.flows.reservar(dueno, flow_entries, reemplazar)
+            except ConflictoFlows as e:
+                print(f"Error: {e}")
+                fallidos.add(dueno)
+        futuros = {}
+        for dueno, (_, nuevos, _) in reservas.items():
+            for flow_entry in nuevos:
+                futuros[self._enviar(self.floodlight.instalar_flow, flow_entry)] = (dueno, flow_entry)
+        
+        sin_confirmar = dict(futuros)
+        try:
+            for futuro in as_completed(futuros):
+                dueno, flow_entry = futuros[futuro]
+                try:
+                    futuro.result()
+                    self.flows.confirmar(flow_entry["name"], True)
+                except FloodlightError as e:
+                    print(f"Error al instalar flow en switch {flow_entry['switch']}: {e}")
+                    self.flows.confirmar(flow_entry["name"], False)
+                    fallidos.add(dueno)
+                del sin_confirmar[futuro]
+        finally:
+            # Ante cualquier otra excepción, no dejar a otros hilos esperando estos flows
+            for dueno, flow_entry in sin_confirmar.values():
+                self.flows.confirmar(flow_entry["name"], False)
+        
+        # Los flows reutilizados que otro hilo estaba instalando deben haber quedado instalados
+        for dueno, (_, _, en_curso) in reservas.items():
+            if dueno not in fallidos and not all(
+                self.flows.esperar(nombre, FLOODLIGHT_TIMEOUTS['flows']) for nombre in en_curso
+            ):
+                fallidos.add(dueno)
+        
+        # Liberar los grupos incompletos y retirar los flows que quedaron sin dueño. Los que no
+        # llegaron a instalarse ya no están registrados y no se envían al controlador
+        a_retirar = [
+            nombre for dueno in fallidos if dueno in reservas
+            for nombre in self.flows.liberar(dueno, reservas[dueno][0]) if self.flows.obtener(nombre) is not None
+        ]
+        if a_retirar:
+            pendientes = self._retirar_flows(a_retirar)
+            self.flows.retirados(a_retirar)
+            if pendientes:
+                print(f"Advertencia: no se pudieron retirar los flows {', '.join(pendientes)}")
+        return {dueno: None if dueno in fallidos else reservas[dueno][0] for dueno in grupos}
+    
+    def _retirar_flows(self, nombres: List[str]) -> List[str]:
+        """Eliminar flows en paralelo; devuelve los que no se pudieron eliminar"""
+        futuros = {self._enviar(self.floodlight.eliminar_flow, n): n for n in nombres}
+        pendientes = []
+        for futuro in as_completed(futuros):
+            try:
+                futuro.result()
+            except FloodlightError as e:
+                print(f"Error al eliminar flow {futuros[futuro]}: {e}")
+                pendientes.append(futuros[futuro])
+        return pendientes
+    
+    
+    def crear_conexion(self, codigo_alumno: str, nombre_servidor: str, nombre_servicio: str,
+                       vida: float = None, inactividad: float = None) -> Optional[str]:
+        """Crear una conexión entre alumno y servidor, opcionalmente con su propio tiempo de vida
+        e inactividad máximos (segundos)"""
+        with self.metricas.medir('etapa', etapa='crear_conexion'):
+            return self._crear_conexion(codigo_alumno, nombre_servidor, nombre_servicio, vida, inactividad)
+    
+    def _crear_conexion(self, codigo_alumno: str, nombre_servidor: str, nombre_servicio: str,
+                        vida: float = None, inactividad: float = None) -> Optional[str]:
+        with self.metricas.medir('etapa', etapa='autorizacion'):
+            autorizado = self.alumno_autorizado(codigo_alumno, nombre_servidor, nombre_servicio)
+        if not autorizado:
+            self.metricas.contar('conexiones_rechazadas_total', motivo='no_autorizado')
             print(f"Error: El alumno {codigo_alumno} no está autorizado para acceder al servicio {nombre_servicio} en {nombre_servidor}")
             return None
         
@@ -341,19 +2690,175 @@ class SDNApp:
             return None
         
         # crear handler único
-        handler = f"conn_{self.connection_counter}"
-        self.connection_counter += 1
+        handler, prefijo = self._nuevo_handler()
         
         # construir ruta
-        if self.build_route(alumno.mac, servidor.ip, servicio):
-            conexion = Conexion(handler, alumno.mac, servidor.ip, nombre_servicio)
+        flows = self.build_route(alumno.mac, servidor.ip, servicio, prefijo, handler)
+        if flows:
+            conexion = Conexion(
+                handler, alumno.mac, servidor.ip, nombre_servicio, codigo_alumno, nombre_servidor,
+                self._cursos_que_otorgan(codigo_alumno, nombre_servidor, nombre_servicio)
+            )
+            conexion.flow_entries = flows
+            conexion.ruta = self._ruta_actual(alumno.mac, servidor.ip)
+            conexion.vida = vida
+            conexion.inactividad = inactividad
             self.conexiones[handler] = conexion
+            self._registrar_conexion(conexion)
+            self.metricas.contar('conexiones_creadas_total')
             print(f"Conexión creada exitosamente: {handler}")
             return handler
         else:
+            self.metricas.contar('conexiones_rechazadas_total', motivo='ruta')
             print("Error: No se pudo crear la conexión")
             return None
     
+    def _registrar_conexion(self, conexion: Conexion):
+        self._registrar_flows(
+            'crear', conexion, mac=conexion._mac, servidor_ip=conexion.servidor_ip, servicio=conexion.servicio,
+            alumno=conexion.codigo_alumno, servidor=conexion.nombre_servidor, cursos=conexion.cursos,
+            creada=conexion.creada, vida=conexion.vida, inactividad=conexion.inactividad
+        )
+    
+    def _resolver_solicitud(self, codigo_alumno, nombre_servidor: str,
+                            nombre_servicio: str) -> Tuple[Optional[Servicio], Optional[str]]:
+        """Validar una solicitud de conexión; devuelve (servicio, error)"""
+        if not self.alumno_autorizado(codigo_alumno, nombre_servidor, nombre_servicio):
+            return None, "no autorizado"
+        servicio = self.servidores[nombre_servidor].obtener_servicio(nombre_servicio)
+        if not servicio:
+            return None, "servicio no encontrado"
+        return servicio, None
+    
+    def _provisionar(self, solicitudes: List[Tuple], refrescar: bool = True) -> List[Dict]:
+        """Crear varias conexiones con una sola consulta de dispositivos,
+        cada ruta distinta calculada una vez y todos los flows en paralelo.
+        Cada solicitud es (alumno, servidor, servicio) u opcionalmente con (vida, inactividad).
+        Con refrescar=False se usa la caché de dispositivos mientras esté vigente"""
+        resultados = [
+            {'alumno': a, 'servidor': srv, 'servicio': svc, 'handler': None, 'error': None}
+            for a, srv, svc, *_ in solicitudes
+        ]
+        vigencias = [tuple(vigencia) or (None, None) for _, _, _, *vigencia in solicitudes]
+        
+        # Validar y resolver attachment points con una sola descarga de la tabla
+        pendientes = []
+        with self.metricas.medir('etapa', etapa='lote_attachment_points'):
+            if refrescar:
+                self.device_cache.refrescar()
+            for resultado, (vida, inactividad) in zip(resultados, vigencias):
+                with self.metricas.medir('etapa', etapa='autorizacion'):
+                    servicio, error = self._resolver_solicitud(
+                        resultado['alumno'], resultado['servidor'], resultado['servicio']
+                    )
+                if error:
+                    resultado['error'] = error
+                    if error == "no autorizado":
+                        self.metricas.contar('conexiones_rechazadas_total', motivo='no_autorizado')
+                    continue
+                alumno = self.alumnos[resultado['alumno']]
+                servidor = self.servidores[resultado['servidor']]
+                src = self.device_cache.buscar_mac(alumno.mac)[1]
+                dst = self._punto_servidor(servidor.ip)
+                if not src or not dst:
+                    resultado['error'] = "sin attachment point"
+                    self.metricas.contar('conexiones_rechazadas_total', motivo='ruta')
+                    continue
+                pendientes.append((resultado, alumno, servidor, servicio, vida, inactividad, src, dst))
+        
+        # Calcular cada ruta distinta una sola vez. Los flows solo usan los puertos de salida,
+        # así que los alumnos del mismo switch comparten ruta aunque estén en otro puerto
+        with self.metricas.medir('etapa', etapa='lote_rutas'):
+            claves = {}
+            for *_, src, dst in pendientes:
+                claves.setdefault((src[0],) + dst, src + dst)
+            futuros = {self._enviar(self.route_cache.obtener, *consulta): clave
+                       for clave, consulta in claves.items()}
+            rutas = {futuros[futuro]: futuro.result() for futuro in as_completed(futuros)}
+        
+        # Construir los flows de todas las conexiones e instalarlos juntos
+        grupos = {}
+        conexiones = {}
+        for resultado, alumno, servidor, servicio, vida, inactividad, src, dst in pendientes:
+            route = rutas[(src[0],) + dst]
+            if not route:
+                resultado['error'] = "sin ruta"
+                self.metricas.contar('conexiones_rechazadas_total', motivo='ruta')
+                continue
+            # El primer salto es el attachment point propio del alumno
+            route = [src] + list(route[1:])
+            handler, prefijo = self._nuevo_handler()
+            grupos[handler] = self._construir_flows(prefijo, alumno.mac, servidor.ip, servicio, route)
+            conexion = Conexion(
+                handler, alumno.mac, servidor.ip, servicio.nombre, resultado['alumno'], servidor.nombre,
+                self._cursos_que_otorgan(resultado['alumno'], servidor.nombre, servicio.nombre)
+            )
+            conexion.ruta = tuple(route)
+            conexion.vida = vida
+            conexion.inactividad = inactividad
+            conexiones[handler] = (resultado, conexion)
+        
+        with self.metricas.medir('etapa', etapa='lote_instalar_flows'):
+            instalados = self._instalar_grupos(grupos)
+        for handler, flows in instalados.items():
+            resultado, conexion = conexiones[handler]
+            if flows is not None:
+                conexion.flow_entries = flows
+                self.conexiones[handler] = conexion
+                self._registrar_conexion(conexion)
+                self.metricas.contar('conexiones_creadas_total')
+                resultado['handler'] = handler
+            else:
+                resultado['error'] = "error al instalar flows"
+                self.metricas.contar('conexiones_rechazadas_total', motivo='ruta')
+        return resultados
+    
+    def crear_conexion_agrupada(self, codigo_alumno, nombre_servidor: str, nombre_servicio: str,
+                                vida: float = None, inactividad: float = None) -> Future:
+        """Encolar una solicitud de conexión para provisionarla junto con las que lleguen
+        al mismo tiempo; el Future devuelve el resultado con 'handler' o 'error'.
+        Registra las mismas métricas que crear_conexion, con la latencia de cada solicitud"""
+        if self._agrupador is None:
+            with self._lock:
+                if self._agrupador is None:
+                    self._agrupador = AgrupadorConexiones(lambda lote: self._provisionar(lote, refrescar=False))
+                    self.metricas.registrar_fuente('agrupador', self._agrupador.estadisticas)
+        inicio = time.perf_counter()
+        futuro = self._agrupador.enviar(codigo_alumno, nombre_servidor, nombre_servicio, vida, inactividad)
+        futuro.add_done_callback(lambda _: self.metricas.observar(
+            'etapa', time.perf_counter() - inicio, etapa='crear_conexion'
+        ))
+        return futuro
+    
+    @con_prioridad(PRIORIDAD_MASIVA)
+    def crear_conexiones_curso(self, codigo_curso: str) -> Optional[List[Dict]]:
+        """Crear conexiones de todos los alumnos de un curso a los servicios que tiene permitidos"""
+        if codigo_curso not in self.cursos:
+            print(f"Error: Curso {codigo_curso} no encontrado")
+            return None
+        
+        curso = self.cursos[codigo_curso]
+        if curso.estado != "DICTANDO":
+            print(f"Error: El curso {codigo_curso} no está en estado DICTANDO")
+            return None
+        
+        inicio = time.perf_counter()
+        solicitudes = [
+            (codigo_alumno, nombre_servidor, nombre_servicio)
+            for codigo_alumno in curso.alumnos
+            for nombre_servidor, nombre_servicio in curso.permisos()
+        ]
+        resultados = self._provisionar(solicitudes)
+        duracion = time.perf_counter() - inicio
+        
+        print(f"\nConexiones del curso {codigo_curso}:")
+        print(f"{'Alumno':<12} {'Servidor':<20} {'Servicio':<12} Resultado")
+        for r in resultados:
+            print(f"{str(r['alumno']):<12} {r['servidor']:<20} {r['servicio']:<12} {r['handler'] or 'Error: ' + r['error']}")
+        creadas = sum(1 for r in resultados if r['handler'])
+        print(f"{creadas}/{len(resultados)} conexiones creadas en {duracion:.2f} s")
+        return resultados
+    
     def eliminar_conexion(self, handler: str) -> bool:
         """Eliminar una conexión"""
         if handler not in self.conexiones:
@@ -363,9 +2868,22 @@ class SDNApp:
         conexion = self.conexiones[handler]
         
         try:
-            url = f"{FLOODLIGHT_URL}/wm/staticflowpusher/json"
+            # Solo se eliminan los flows que ninguna otra conexión usa
+            libres = self.flows.liberar(handler, conexion.flow_entries)
+            with self.metricas.medir('etapa', etapa='eliminar_conexion'):
+                pendientes = self._retirar_flows(libres)
+            if pendientes:
+                self.flows.restaurar(handler, pendientes)
+            self.flows.retirados(libres)
+            if pendientes:
+                # Conservar la conexión con los flows que quedaron instalados
+                conexion.flow_entries = pendientes
+                self._registrar_flows('flows', conexion)
+                print(f"Error al eliminar conexión: quedaron {len(pendientes)} flows instalados")
+                return False
             
             del self.conexiones[handler]
+            self._registrar('eliminar', handler=handler)
             print(f"Conexión {handler} eliminada exitosamente")
             return True
             
@@ -373,6 +2891,365 @@ class SDNApp:
             print(f"Error al eliminar conexión: {e}")
             return False
     
+    @con_prioridad(PRIORIDAD_MASIVA)
+    def eliminar_conexiones(self, handlers) -> Dict[str, bool]:
+        """Eliminar varias conexiones borrando todos sus flows en paralelo"""
+        conexiones = [self.conexiones[h] for h in dict.fromkeys(handlers) if h in self.conexiones]
+        libres = {
+            conexion.handler: self.flows.liberar(conexion.handler, conexion.flow_entries)
+            for conexion in conexiones
+        }
+        pendientes = set(self._retirar_flows([nombre for nombres in libres.values() for nombre in nombres]))
+        
+        resultado = {}
+        for conexion in conexiones:
+            restantes = [nombre for nombre in libres[conexion.handler] if nombre in pendientes]
+            if restantes:
+                self.flows.restaurar(conexion.handler, restantes)
+                conexion.flow_entries = restantes
+                self._registrar_flows('flows', conexion)
+                resultado[conexion.handler] = False
+            else:
+                del self.conexiones[conexion.handler]
+                self._registrar('eliminar', handler=conexion.handler)
+                resultado[conexion.handler] = True
+        for nombres in libres.values():
+            self.flows.retirados(nombres)
+        
+        eliminadas = sum(resultado.values())
+        print(f"{eliminadas}/{len(resultado)} conexiones eliminadas")
+        return resultado
+    
+    @con_prioridad(PRIORIDAD_MASIVA)
+    def reconciliar(self, simular: bool = False) -> Optional[Dict]:
+        """Comparar los flows que deberían estar instalados según las conexiones y la política
+        con la tabla de flows estáticos del controlador y aplicar solo la diferencia.
+        Con simular=True solo se informa lo que se haría"""
+        inicio = time.perf_counter()
+        try:
+            with self.metricas.medir('etapa', etapa='reconciliar_lectura'):
+                tabla = self.floodlight.flows_instalados()
+        except FloodlightError as e:
+            print(f"Error al leer los flows del controlador: {e}")
+            return None
+        instalados = {nombre for nombres in tabla.values() for nombre in nombres}
+        
+        # Las conexiones que ya no otorga ningún curso se revocan en lugar de reparar
+        vigentes, revocar = set(), []
+        for conexion in self.conexiones.values():
+            if self._cursos_que_otorgan(conexion.codigo_alumno, conexion.nombre_servidor, conexion.servicio):
+                vigentes.add(conexion.handler)
+            else:
+                revocar.append(conexion)
+        deseados = {nombre: flow for nombre, flow, duenos in self.flows.items() if duenos & vigentes}
+        # Flows de conexiones vigentes sin definición registrada (snapshots anteriores): se conservan
+        sin_definicion = {
+            nombre for handler in vigentes if handler in self.conexiones
+            for nombre in self.conexiones[handler].flow_entries if nombre not in deseados
+        }
+        revocados = {nombre for conexion in revocar for nombre in conexion.flow_entries}
+        
+        agregar = [flow for nombre, flow in deseados.items() if nombre not in instalados]
+        eliminar = [
+            nombre for nombre in instalados
+            if nombre.startswith(FLOW_PREFIJO) and nombre not in deseados
+            and nombre not in sin_definicion and nombre not in revocados
+        ]
+        reporte = {
+            'simulado': simular,
+            'instalados': len(instalados),
+            'deseados': len(deseados) + len(sin_definicion),
+            'agregar': sorted(flow['name'] for flow in agregar),
+            'eliminar': sorted(eliminar),
+            'revocar': [conexion.handler for conexion in revocar],
+            'sin_definicion': sorted(nombre for nombre in sin_definicion if nombre not in instalados),
+            'errores': []
+        }
+        
+        if not simular:
+            with self.metricas.medir('etapa', etapa='reconciliar_aplicar'):
+                if revocar:
+                    self.eliminar_conexiones(reporte['revocar'])
+                # Altas y bajas en paralelo en el mismo pool
+                futuros = {self._enviar(self.floodlight.instalar_flow, flow): flow['name'] for flow in agregar}
+                pendientes = self._retirar_flows(eliminar)
+                for futuro in as_completed(futuros):
+                    try:
+                        futuro.result()
+                    except FloodlightError as e:
+                        reporte['errores'].append(f"{futuros[futuro]}: {e}")
+                reporte['errores'].extend(f"{nombre}: no se pudo eliminar" for nombre in pendientes)
+                self.flows.retirados([nombre for nombre in eliminar if nombre not in pendientes])
+            self.metricas.contar('reconciliacion_flows_total', len(agregar), accion='agregar')
+            self.metricas.contar('reconciliacion_flows_total', len(eliminar), accion='eliminar')
+        reporte['duracion'] = time.perf_counter() - inicio
+        
+        accion = "Se agregarían" if simular else "Agregados"
+        print(f"Flows en el controlador: {reporte['instalados']}, deseados: {reporte['deseados']}")
+        print(f"{accion}: {len(reporte['agregar'])}, "
+              f"{'se eliminarían' if simular else 'eliminados'}: {len(reporte['eliminar'])}, "
+              f"conexiones {'a revocar' if simular else 'revocadas'}: {len(reporte['revocar'])}")
+        if reporte['sin_definicion']:
+            print(f"Advertencia: {len(reporte['sin_definicion'])} flows faltantes sin definición; "
+                  "vuelva a crear sus conexiones")
+        for error in reporte['errores']:
+            print(f"Error: {error}")
+        print(f"Reconciliación {'simulada' if simular else 'aplicada'} en {reporte['duracion']:.2f} s")
+        return reporte
+    
+    @con_prioridad(PRIORIDAD_MASIVA)
+    def revisar_topologia(self) -> Optional[Dict]:
+        """Detectar enlaces caídos y hosts que cambiaron de attachment point y re-enrutar solo
+        las conexiones afectadas, como máximo TOPOLOGIA_MAX_REENRUTAR por llamada"""
+        self.route_cache.verificar_enlaces(forzar=True)
+        enlaces = self.route_cache.enlaces
+        if enlaces is None or not self.device_cache.refrescar():
+            return None
+        
+        if self._enlaces_vigilados is None:
+            # Primera revisión: completar la ruta de las conexiones que no la tienen (snapshots anteriores)
+            for conexion in self.conexiones.values():
+                if not conexion.ruta and conexion.handler in self.conexiones:
+                    ruta = self._ruta_actual(conexion._mac, conexion.servidor_ip)
+                    if ruta:
+                        self.conexiones.actualizar_ruta(conexion.handler, ruta)
+            self._enlaces_vigilados = enlaces
+            self.device_cache.tomar_movidos()
+            return {'afectadas': 0, 'reenrutadas': 0, 'pendientes': 0}
+        
+        # Candidatas: conexiones que pasan por los dos extremos de un enlace que desapareció,
+        # y conexiones de hosts o servidores que se movieron
+        caidos = set()
+        for a, pa, b, pb in self._enlaces_vigilados - enlaces:
+            caidos.update({(a, pa, b, pb), (b, pb, a, pa)})
+        self._enlaces_vigilados = enlaces
+        candidatas = set()
+        for a, _, b, _ in caidos:
+            candidatas |= self.conexiones.por_switch(a) & self.conexiones.por_switch(b)
+        for movido in self.device_cache.tomar_movidos():
+            if isinstance(movido, int):
+                candidatas |= self.conexiones.por_mac(movido)
+            else:
+                candidatas |= self.conexiones.por_servidor(movido)
+        
+        afectadas = 0
+        for handler in candidatas:
+            conexion = self.conexiones.get(handler)
+            if conexion is None:
+                continue
+            src = self.device_cache.buscar_mac(conexion._mac)[1]
+            dst = self._punto_servidor(conexion.servidor_ip)
+            movida = not conexion.ruta or (src, dst) != (conexion.ruta[0], conexion.ruta[-1])
+            if movida or any(enlace in caidos for enlace in conexion.enlaces()):
+                self._por_reenrutar.add(handler)
+                afectadas += 1
+        
+        # Limitar el trabajo por revisión; el resto queda para la siguiente
+        lote = []
+        while self._por_reenrutar and len(lote) < TOPOLOGIA_MAX_REENRUTAR:
+            lote.append(self._por_reenrutar.pop())
+        reenrutadas = self._reenrutar(lote) if lote else []
+        if lote:
+            print(f"Topología: {len(reenrutadas)}/{len(lote)} conexiones re-enrutadas, "
+                  f"{len(self._por_reenrutar)} pendientes")
+        return {'afectadas': afectadas, 'reenrutadas': len(reenrutadas), 'pendientes': len(self._por_reenrutar)}
+    
+    def _reenrutar(self, handlers: List[str]) -> List[str]:
+        """Instalar la ruta vigente de cada conexión antes de retirar sus flows anteriores;
+        las que no se pueden re-enrutar conservan sus flows y se reintentan más tarde"""
+        grupos, rutas = {}, {}
+        for handler in handlers:
+            conexion = self.conexiones.get(handler)
+            servidor = self.servidores.get(conexion.nombre_servidor) if conexion else None
+            servicio = servidor.obtener_servicio(conexion.servicio) if servidor else None
+            if servicio is None:
+                continue
+            ruta = self._ruta_actual(conexion._mac, conexion.servidor_ip)
+            if not ruta:
+                self._por_reenrutar.add(handler)
+                continue
+            _, prefijo = self._nuevo_handler()
+            # Los flows nuevos se reservan con un dueño temporal para que un fallo no libere los actuales
+            grupos[(handler, 'reenrutar')] = self._construir_flows(
+                prefijo, conexion.alumno_mac, conexion.servidor_ip, servicio, ruta
+            )
+            rutas[handler] = ruta
+        
+        # En los switches donde solo cambia el puerto de salida el flow se modifica con su mismo
+        # nombre: agregar otro con el mismo match reemplaza la entrada del switch, y eliminar
+        # después el anterior (borrado estricto por match y prioridad) se llevaría la nueva
+        with self.metricas.medir('etapa', etapa='reenrutar'):
+            instalados = self._instalar_grupos(grupos, reemplazar=True)
+        reenrutadas, a_retirar = [], []
+        for (handler, _), nombres in instalados.items():
+            conexion = self.conexiones.get(handler)
+            if nombres is None:
+                self._por_reenrutar.add(handler)
+                continue
+            if conexion is None:
+                # La conexión se eliminó mientras se instalaba la ruta nueva
+                a_retirar.extend(self.flows.liberar((handler, 'reenrutar'), nombres))
+                continue
+            self.flows.restaurar(handler, nombres)
+            self.flows.liberar((handler, 'reenrutar'), nombres)
+            anteriores = [nombre for nombre in conexion.flow_entries if nombre not in set(nombres)]
+            self.conexiones.actualizar_ruta(handler, rutas[handler], nombres)
+            self._registrar_flows('flows', conexion)
+            a_retirar.extend(self.flows.liberar(handler, anteriores))
+            reenrutadas.append(handler)
+        if a_retirar:
+            pendientes = self._retirar_flows(a_retirar)
+            self.flows.retirados(a_retirar)
+            if pendientes:
+                print(f"Advertencia: no se pudieron retirar los flows {', '.join(pendientes)}")
+        self.metricas.contar('conexiones_reenrutadas_total', len(reenrutadas))
+        return reenrutadas
+    
+    def iniciar_vigilante(self, intervalo: float = TOPOLOGIA_INTERVALO):
+        """Revisar la topología en segundo plano cada `intervalo` segundos"""
+        if self._vigilante is None:
+            self._vigilante = TareaPeriodica("vigilante de topología", self.revisar_topologia, intervalo).iniciar()
+    
+    def detener_vigilante(self):
+        if self._vigilante is not None:
+            self._vigilante.detener()
+            self._vigilante = None
+    
+    def fijar_vigencia(self, handler: str, vida: float = None, inactividad: float = None) -> bool:
+        """Fijar el tiempo de vida y la inactividad máxima (segundos) de una conexión;
+        None usa los valores de la aplicación"""
+        conexion = self.conexiones.get(handler)
+        if conexion is None:
+            print(f"Error: Conexión {handler} no encontrada")
+            return False
+        conexion.vida = vida
+        conexion.inactividad = inactividad
+        self._registrar('vigencia', handler=handler, vida=vida, inactividad=inactividad)
+        return True
+    
+    def _actualizar_actividad(self, conexiones: List[Conexion], ahora: float) -> bool:
+        """Marcar como activas las conexiones cuyos flows cambiaron de packet_count desde la
+        pasada anterior, con una sola consulta de estadísticas para todos los switches"""
+        try:
+            with self.metricas.medir('etapa', etapa='estadisticas_flows'):
+                estadisticas = self.floodlight.estadisticas_flows()
+        except FloodlightError as e:
+            print(f"Error al consultar estadísticas de flows: {e}")
+            return False
+        
+        por_match = {}  # (switch, match) -> (flow, conexiones que lo usan)
+        for conexion in conexiones:
+            for nombre in conexion.flow_entries:
+                flow = self.flows.obtener(nombre)
+                if flow is not None:
+                    clave = (flow['switch'], _match_normalizado(flow.get('match', {})))
+                    por_match.setdefault(clave, (nombre, []))[1].append(conexion)
+        
+        paquetes = {}
+        for switch, flows in estadisticas.items():
+            for estadistica in flows:
+                entrada = por_match.get((switch, _match_normalizado(estadistica.get('match', {}))))
+                if entrada is None:
+                    continue
+                nombre, usuarias = entrada
+                paquetes[nombre] = int(estadistica.get('packet_count', 0))
+                if paquetes[nombre] != self._paquetes.get(nombre, 0):
+                    for conexion in usuarias:
+                        conexion.actividad = ahora
+        self._paquetes = paquetes
+        return True
+    
+    def _eliminar_por_lotes(self, handlers: List[str], presupuesto: float) -> Tuple[int, int]:
+        """Eliminar conexiones por lotes de RECOLECTOR_LOTE hasta pasar `presupuesto` segundos;
+        el primer lote siempre se procesa. Devuelve (eliminadas, procesadas)"""
+        inicio = time.perf_counter()
+        eliminadas = procesadas = 0
+        for i in range(0, len(handlers), RECOLECTOR_LOTE):
+            if i and time.perf_counter() - inicio > presupuesto:
+                break
+            lote = handlers[i:i + RECOLECTOR_LOTE]
+            eliminadas += sum(self.eliminar_conexiones(lote).values())
+            procesadas += len(lote)
+        return eliminadas, procesadas
+    
+    @con_prioridad(PRIORIDAD_MASIVA)
+    def recolectar_conexiones(self, presupuesto: float = RECOLECTOR_PRESUPUESTO) -> Dict:
+        """Eliminar las conexiones que superaron su tiempo de vida o que no tuvieron tráfico
+        durante su inactividad máxima, por lotes de RECOLECTOR_LOTE. Las vencidas se eliminan
+        primero, sin consultar estadísticas. Deja de eliminar al pasar `presupuesto` segundos
+        (sin contar la consulta de estadísticas); las restantes quedan para la siguiente pasada"""
+        inicio = time.perf_counter()
+        ahora = time.time()
+        vencidas, vigiladas = [], []
+        for conexion in list(self.conexiones.values()):
+            vida = conexion.vida if conexion.vida is not None else self.vida_conexiones
+            if vida is not None and ahora - conexion.creada >= vida:
+                vencidas.append(conexion.handler)
+            elif (conexion.inactividad if conexion.inactividad is not None else self.inactividad_conexiones) is not None:
+                vigiladas.append(conexion)
+        
+        t = time.perf_counter()
+        eliminadas, procesadas = self._eliminar_por_lotes(vencidas, presupuesto)
+        restante = presupuesto - (time.perf_counter() - t)
+        
+        # Sin estadísticas no se puede saber si una conexión está inactiva. Si las vencidas
+        # agotaron el presupuesto, las inactivas esperan a la siguiente pasada
+        inactivas = []
+        if vigiladas and procesadas == len(vencidas) and restante > 0 and self._actualizar_actividad(vigiladas, ahora):
+            for conexion in vigiladas:
+                limite = conexion.inactividad if conexion.inactividad is not None else self.inactividad_conexiones
+                if ahora - conexion.actividad >= limite:
+                    inactivas.append(conexion.handler)
+            if inactivas:
+                parcial = self._eliminar_por_lotes(inactivas, restante)
+                eliminadas += parcial[0]
+                procesadas += parcial[1]
+        
+        candidatas = vencidas + inactivas
+        reporte = {
+            'vencidas': len(vencidas),
+            'inactivas': len(inactivas),
+            'eliminadas': eliminadas,
+            'pendientes': len(candidatas) - procesadas,
+            'duracion': time.perf_counter() - inicio
+        }
+        self.metricas.contar('conexiones_recolectadas_total', eliminadas)
+        if candidatas:
+            print(f"Recolector: {eliminadas} conexiones eliminadas ({len(vencidas)} vencidas, "
+                  f"{len(inactivas)} inactivas, {reporte['pendientes']} pendientes)")
+        return reporte
+    
+    def iniciar_recolector(self, intervalo: float = RECOLECTOR_INTERVALO):
+        """Recolectar conexiones vencidas e inactivas en segundo plano cada `intervalo` segundos"""
+        if self._recolector is None:
+            self._recolector = TareaPeriodica("recolector de conexiones", self.recolectar_conexiones, intervalo).iniciar()
+    
+    def detener_recolector(self):
+        if self._recolector is not None:
+            self._recolector.detener()
+            self._recolector = None
+    
+    def eliminar_conexiones_alumno(self, codigo_alumno: str) -> Dict[str, bool]:
+        """Eliminar todas las conexiones de un alumno"""
+        if codigo_alumno not in self.alumnos:
+            print(f"Error: Alumno {codigo_alumno} no encontrado")
+            return {}
+        return self.eliminar_conexiones(self.conexiones.por_mac(self.alumnos[codigo_alumno].mac))
+    
+    def eliminar_conexiones_servidor(self, nombre_servidor: str) -> Dict[str, bool]:
+        """Eliminar todas las conexiones hacia un servidor"""
+        if nombre_servidor not in self.servidores:
+            print(f"Error: Servidor {nombre_servidor} no encontrado")
+            return {}
+        return self.eliminar_conexiones(self.conexiones.por_servidor(self.servidores[nombre_servidor].ip))
+    
+    def eliminar_conexiones_curso(self, codigo_curso: str) -> Dict[str, bool]:
+        """Eliminar las conexiones autorizadas por un curso"""
+        if codigo_curso not in self.cursos:
+            print(f"Error: Curso {codigo_curso} no encontrado")
+            return {}
+        return self.eliminar_conexiones(self.conexiones.por_curso(codigo_curso))
+    
     def listar_alumnos(self, filtro_curso: str = None):
         """Listar alumnos, opcionalmente filtrados por curso"""
         if filtro_curso:
@@ -439,6 +3316,21 @@ class SDNApp:
         for conexion in self.conexiones.values():
             print(f"- {conexion}")
     
+    def mostrar_metricas(self):
+        """Mostrar tiempos por etapa, latencias del controlador y estadísticas de cachés"""
+        if not self.metricas.habilitadas:
+            print("Las métricas están deshabilitadas")
+        resumen = self.metricas.resumen()
+        print("\nTiempos:")
+        for nombre, datos in resumen['tiempos'].items():
+            print(f"  {nombre}: {datos['total']} llamadas, media {datos['media_ms']:.2f} ms")
+        print("Contadores:")
+        for nombre, valor in resumen['contadores'].items():
+            print(f"  {nombre}: {valor}")
+        print("Cachés:")
+        for nombre, datos in resumen['caches'].items():
+            print(f"  {nombre}: {datos}")
+    
     def agregar_alumno(self, nombre: str, codigo: str, mac: str):
         """Agregar un nuevo alumno"""
         if codigo in self.alumnos:
@@ -447,6 +3339,7 @@ class SDNApp:
         
         alumno = Alumno(nombre, codigo, mac)
         self.alumnos[codigo] = alumno
+        self._registrar('agregar_alumno', nombre=nombre, codigo=codigo, mac=alumno.mac)
         print(f"Alumno agregado: {alumno}")
     
     def agregar_alumno_a_curso(self, codigo_alumno: str, codigo_curso: str):
@@ -462,8 +3355,11 @@ class SDNApp:
         self.cursos[codigo_curso].agregar_alumno(codigo_alumno)
         print(f"Alumno {codigo_alumno} agregado al curso {codigo_curso}")
     
-    def listar_cursos_con_servicio(self, nombre_servidor: str, nombre_servicio: str):
-        """Listar cursos que tienen acceso a un servicio específico"""
+    def cursos_con_servicio(self, nombre_servidor: str, nombre_servicio: str) -> List[Curso]:
+        """Cursos en estado DICTANDO que tienen acceso a un servicio específico"""
+        if self.matriz is not None:
+            codigos = self.matriz.cursos_con_permiso(nombre_servidor, nombre_servicio)
+            return [self.cursos[codigo] for codigo in codigos if codigo in self.cursos]
         cursos_con_acceso = []
         
         for curso in self.cursos.values():
@@ -473,11 +3369,48 @@ class SDNApp:
                         nombre_servicio in servidor_config['servicios_permitidos']):
                         cursos_con_acceso.append(curso)
                         break
+        return cursos_con_acceso
+    
+    def listar_cursos_con_servicio(self, nombre_servidor: str, nombre_servicio: str):
+        """Listar cursos que tienen acceso a un servicio específico"""
+        cursos_con_acceso = self.cursos_con_servicio(nombre_servidor, nombre_servicio)
         
         print(f"\nCursos con acceso al servicio {nombre_servicio} en {nombre_servidor}:")
         for curso in cursos_con_acceso:
             print(f"- {curso}")
     
+    def alumnos_con_servicio(self, nombre_servidor: str, nombre_servicio: str) -> List:
+        """Códigos de los alumnos autorizados a un servicio por algún curso en estado DICTANDO"""
+        if self.matriz is not None:
+            return self.matriz.alumnos_con_permiso(nombre_servidor, nombre_servicio)
+        par = (nombre_servidor, nombre_servicio)
+        return [codigo for codigo, permisos in self.permisos.items() if par in permisos]
+    
+    def permisos_alumno(self, codigo_alumno) -> List[Tuple[str, str]]:
+        """Pares (servidor, servicio) a los que está autorizado un alumno"""
+        if self.matriz is not None:
+            return self.matriz.permisos_de(codigo_alumno)
+        return list(self.permisos.get(codigo_alumno, ()))
+    
+    def auditoria_accesos(self) -> List[Tuple]:
+        """Todos los accesos vigentes como (alumno, servidor, servicio)"""
+        if self.matriz is not None:
+            return self.matriz.auditoria()
+        return [(codigo,) + par for codigo, permisos in self.permisos.items() for par in permisos]
+    
+    def exportar_auditoria(self, filename: str):
+        """Exportar todos los accesos vigentes a un archivo CSV"""
+        import csv
+        try:
+            accesos = self.auditoria_accesos()
+            with open(filename, 'w', newline='', encoding='utf-8') as file:
+                escritor = csv.writer(file)
+                escritor.writerow(['alumno', 'servidor', 'servicio'])
+                escritor.writerows(accesos)
+            print(f"{len(accesos)} accesos exportados a {filename}")
+        except OSError as e:
+            print(f"Error al exportar: {e}")
+    
     def menu(self):
         """Menú principal"""
         while True:
@@ -525,14 +3458,18 @@ class SDNApp:
     
     def menu_importar(self):
         """Submenú para importar"""
-        filename = input("Ingrese el nombre del archivo YAML: ").strip()
-        if filename:
+        filename = input("Ingrese el nombre del archivo YAML o snapshot (.db): ").strip()
+        if filename.endswith(SNAPSHOT_EXTENSION):
+            self.cargar_snapshot(filename)
+        elif filename:
             self.importar_yaml(filename)
     
     def menu_exportar(self):
         """Submenú para exportar"""
-        filename = input("Ingrese el nombre del archivo YAML: ").strip()
-        if filename:
+        filename = input("Ingrese el nombre del archivo YAML o snapshot (.db): ").strip()
+        if filename.endswith(SNAPSHOT_EXTENSION):
+            self.guardar_snapshot(filename)
+        elif filename:
             self.exportar_yaml(filename)
     
     def menu_cursos(self):
@@ -542,6 +3479,7 @@ class SDNApp:
             print("1) Listar cursos")
             print("2) Mostrar detalle de curso")
             print("3) Actualizar curso (agregar/eliminar alumno)")
+            print("4) Crear conexiones de todo el curso")
             print("0) Volver al menú principal")
             
             opcion = input("Seleccione una opción: ").strip()
@@ -564,6 +3502,9 @@ class SDNApp:
                     if codigo_curso in self.cursos:
                         self.cursos[codigo_curso].remover_alumno(codigo_alumno)
                         print(f"Alumno {codigo_alumno} removido del curso {codigo_curso}")
+            elif opcion == '4':
+                codigo = input("Ingrese el código del curso: ").strip()
+                self.crear_conexiones_curso(codigo)
             else:
                 print("Opción no válida")
     
@@ -626,6 +3567,8 @@ class SDNApp:
         while True:
             print("\n--- GESTIÓN DE POLÍTICAS ---")
             print("1) Listar cursos con acceso a servicio")
+            print("2) Listar alumnos con acceso a servicio")
+            print("3) Exportar auditoría de accesos (CSV)")
             print("0) Volver al menú principal")
             
             opcion = input("Seleccione una opción: ").strip()
@@ -636,6 +3579,16 @@ class SDNApp:
                 servidor = input("Ingrese el nombre del servidor: ").strip()
                 servicio = input("Ingrese el nombre del servicio: ").strip()
                 self.listar_cursos_con_servicio(servidor, servicio)
+            elif opcion == '2':
+                servidor = input("Ingrese el nombre del servidor: ").strip()
+                servicio = input("Ingrese el nombre del servicio: ").strip()
+                alumnos = self.alumnos_con_servicio(servidor, servicio)
+                print(f"\nAlumnos con acceso al servicio {servicio} en {servidor}: {len(alumnos)}")
+                for codigo in alumnos:
+                    print(f"- {self.alumnos.get(codigo, codigo)}")
+            elif opcion == '3':
+                filename = input("Ingrese el nombre del archivo CSV: ").strip()
+                self.exportar_auditoria(filename)
             else:
                 print("Opción no válida")
     
@@ -646,6 +3599,10 @@ class SDNApp:
             print("1) Crear conexión")
             print("2) Listar conexiones")
             print("3) Eliminar conexión")
+            print("4) Eliminar conexiones de alumno/servidor/curso")
+            print("5) Mostrar métricas")
+            print("6) Reconciliar flows con el controlador")
+            print("7) Eliminar conexiones vencidas e inactivas")
             print("0) Volver al menú principal")
             
             opcion = input("Seleccione una opción: ").strip()
@@ -662,14 +3619,90 @@ class SDNApp:
             elif opcion == '3':
                 handler = input("Ingrese el handler de la conexión: ").strip()
                 self.eliminar_conexion(handler)
+            elif opcion == '4':
+                tipo = input("¿Alumno, servidor o curso? (a/s/c): ").strip().lower()
+                if tipo == 'a':
+                    self.eliminar_conexiones_alumno(input("Ingrese el código del alumno: ").strip())
+                elif tipo == 's':
+                    self.eliminar_conexiones_servidor(input("Ingrese el nombre del servidor: ").strip())
+                elif tipo == 'c':
+                    self.eliminar_conexiones_curso(input("Ingrese el código del curso: ").strip())
+            elif opcion == '5':
+                self.mostrar_metricas()
+            elif opcion == '6':
+                simular = input("¿Solo mostrar los cambios? (s/n): ").strip().lower() == 's'
+                reporte = self.reconciliar(simular)
+                if reporte and simular:
+                    for nombre in reporte['agregar'][:20]:
+                        print(f"  + {nombre}")
+                    for nombre in reporte['eliminar'][:20]:
+                        print(f"  - {nombre}")
+            elif opcion == '7':
+                reporte = self.recolectar_conexiones(presupuesto=float('inf'))
+                print(f"{reporte['eliminadas']} conexiones eliminadas "
+                      f"({reporte['vencidas']} vencidas, {reporte['inactivas']} inactivas)")
             else:
                 print("Opción no válida")
 
 def main():
     """Función principal"""
-    app = SDNApp()
+    import argparse
+    parser = argparse.ArgumentParser(description="Network Policy Manager de la UPSM")
+    parser.add_argument("--metricas-puerto", type=int,
+                        help="habilitar métricas y servirlas en /metrics en este puerto")
+    parser.add_argument("--api", type=int, metavar="PUERTO",
+                        help="servir la API HTTP/JSON en este puerto")
+    parser.add_argument("--sin-menu", action="store_true",
+                        help="con --api, no mostrar el menú interactivo")
+    parser.add_argument("--bitacora", metavar="ARCHIVO",
+                        help="reproducir y registrar los cambios en esta bitácora")
+    parser.add_argument("--vigilar-topologia", type=float, nargs="?", const=TOPOLOGIA_INTERVALO,
+                        metavar="SEGUNDOS", help="re-enrutar las conexiones afectadas por cambios de topología")
+    parser.add_argument("--vida", type=float, metavar="SEGUNDOS",
+                        help="tiempo de vida de las conexiones que no fijan uno propio")
+    parser.add_argument("--inactividad", type=float, metavar="SEGUNDOS",
+                        help="tiempo sin tráfico tras el que se eliminan las conexiones que no fijan uno propio")
+    parser.add_argument("--recolectar", type=float, nargs="?", const=RECOLECTOR_INTERVALO, metavar="SEGUNDOS",
+                        help="eliminar en segundo plano las conexiones vencidas e inactivas")
+    parser.add_argument("--controlador", action="append", default=[], metavar="URL[=DPID,...]",
+                        help="controlador Floodlight y los switches que programa; repetir para varios")
+    parser.add_argument("--enlace", action="append", default=[], metavar="SRC/PUERTO/DST/PUERTO",
+                        help="enlace entre switches de controladores distintos")
+    parser.add_argument("--ruteo-local", action="store_true", default=RUTEO_LOCAL,
+                        help="calcular las rutas localmente en lugar de consultar a Floodlight")
+    args = parser.parse_args()
     
-    app.menu()
+    app = SDNApp(crear_cliente_floodlight(args.controlador, args.enlace),
+                 ruteo_local=args.ruteo_local,
+                 metricas=Metricas(habilitadas=args.metricas_puerto is not None))
+    if args.metricas_puerto is not None:
+        app.metricas.iniciar_servidor(args.metricas_puerto)
+    if args.bitacora:
+        app.abrir_bitacora(args.bitacora)
+    if args.vigilar_topologia:
+        app.iniciar_vigilante(args.vigilar_topologia)
+    app.vida_conexiones = args.vida
+    app.inactividad_conexiones = args.inactividad
+    if args.recolectar:
+        app.iniciar_recolector(args.recolectar)
+    
+    try:
+        if args.api is not None:
+            import asyncio
+            from api import APIServidor
+            servidor = APIServidor(app, puerto=args.api)
+            if args.sin_menu:
+                try:
+                    asyncio.run(servidor.servir())
+                except KeyboardInterrupt:
+                    pass
+                return
+            threading.Thread(target=lambda: asyncio.run(servidor.servir()), daemon=True).start()
+        
+        app.menu()
+    finally:
+        # Escribir el último lote de la bitácora antes de salir
+        app.cerrar_bitacora()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
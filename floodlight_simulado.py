@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+TEL354 - Laboratorio 6: Controlador Floodlight simulado
+Implementa la parte de la API REST que usa la aplicación SDN para poder
+medirla y probarla sin un controlador real.
+Uso: python3 floodlight_simulado.py --puerto 8080 --switches 10 --hosts 100
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from controller_20210535 import SERVIDOR_MAC, TopologiaLocal
+
+# Nombres de OpenFlow 1.3 con los que las estadísticas devuelven el match de los flows estáticos
+CAMPOS_ESTADISTICAS = {
+    'dl_src': 'eth_src', 'dl_dst': 'eth_dst', 'dl_type': 'eth_type',
+    'nw_src': 'ipv4_src', 'nw_dst': 'ipv4_dst', 'nw_proto': 'ip_proto'
+}
+
+
+def dpid_de(i: int) -> str:
+    """DPID con el formato de Floodlight (00:00:00:00:00:00:00:01)"""
+    texto = f"{i:016x}"
+    return ":".join(texto[j:j + 2] for j in range(0, 16, 2))
+
+
+def mac_de(i: int) -> str:
+    """MAC del i-ésimo host simulado"""
+    return "FA:16:3E:" + ":".join(f"{(i >> s) & 0xFF:02X}" for s in (16, 8, 0))
+
+
+def ip_de(i: int) -> str:
+    """IP del i-ésimo host simulado (10.1.0.0/16 en adelante)"""
+    return f"10.{1 + (i >> 16)}.{(i >> 8) & 0xFF}.{i & 0xFF}"
+
+
+class FloodlightSimulado:
+    """Controlador simulado con topología lineal, hosts sintéticos y latencia configurable.
+    Con capacidad > 0 solo se atienden esa cantidad de solicitudes a la vez y el resto espera,
+    de modo que la latencia crece con la carga como en un controlador saturado.
+    Con propios el controlador solo ve y programa esos switches (y los hosts conectados a ellos),
+    como uno de varios controladores que se reparten la red"""
+    def __init__(self, switches: int = 5, hosts: int = 100, latencia: float = 0.0,
+                 servidores: List[str] = ("10.0.0.3",), tasa_error: float = 0.0,
+                 host: str = "127.0.0.1", puerto: int = 0, capacidad: int = 0, propios: List[str] = None):
+        self.latencia = latencia
+        self._capacidad = threading.BoundedSemaphore(capacidad) if capacidad else None
+        self.tasa_error = tasa_error
+        self.switches = [dpid_de(i + 1) for i in range(switches)]
+        # Topología lineal: puerto 1 hacia el switch siguiente, puerto 2 hacia el anterior
+        self.enlaces = [
+            {'src-switch': a, 'src-port': 1, 'dst-switch': b, 'dst-port': 2,
+             'type': 'internal', 'direction': 'bidirectional'}
+            for a, b in zip(self.switches, self.switches[1:])
+        ]
+        self.dispositivos = []
+        for i in range(hosts):
+            switch = self.switches[i % switches]
+            self._agregar_host(mac_de(i), ip_de(i), switch, 3 + i // switches)
+        # Los servidores cuelgan del último switch; el primero también con la MAC por defecto
+        for k, ip in enumerate(servidores):
+            mac = SERVIDOR_MAC if k == 0 else f"FA:16:3F:00:00:{k:02X}"
+            self._agregar_host(mac, ip, self.switches[-1], 1000 + k)
+        if propios is not None:
+            propios = set(propios)
+            self.switches = [sw for sw in self.switches if sw in propios]
+            self.enlaces = [e for e in self.enlaces if e['src-switch'] in propios and e['dst-switch'] in propios]
+            self.dispositivos = [d for d in self.dispositivos if d['attachmentPoint'][0]['switchDPID'] in propios]
+        self.topologia = TopologiaLocal(self.switches, self.enlaces)
+        self.flows = {}  # nombre -> flow
+        # Entradas de cada switch como en OpenFlow: una por (prioridad, match); un flow nuevo con
+        # el mismo match reemplaza la entrada y el borrado es estricto por prioridad y match
+        self.tablas = {}  # switch -> {(prioridad, match): flow}
+        self.paquetes = {}  # nombre -> paquetes que coincidieron con el flow
+        self.solicitudes = 0
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, puerto), self._manejador())
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    def _agregar_host(self, mac: str, ip: str, switch: str, puerto: int):
+        self.dispositivos.append({
+            'mac': [mac.lower()],
+            'ipv4': [ip],
+            'attachmentPoint': [{'switchDPID': switch, 'port': puerto}]
+        })
+
+    @property
+    def url(self) -> str:
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self) -> "FloodlightSimulado":
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    # Endpoints
+
+    def _ruta(self, src, src_port, dst, dst_port) -> List[Dict]:
+        if src not in self.topologia.adyacencia or dst not in self.topologia.adyacencia:
+            return []
+        ruta = self.topologia.ruta(src, int(src_port), dst, int(dst_port))
+        return [{'switch': sw, 'port': {'portNumber': p}} for sw, p in ruta]
+
+    def _flows_por_switch(self) -> Dict:
+        tabla = {sw: [] for sw in self.switches}
+        with self._lock:
+            for nombre, flow in self.flows.items():
+                tabla.setdefault(flow['switch'], []).append({nombre: flow})
+        return tabla
+
+    @staticmethod
+    def _clave_entrada(flow: Dict):
+        match = tuple(sorted((campo, str(valor)) for campo, valor in flow.get('match', {}).items()))
+        return str(flow.get('priority', "0")), match
+
+    def entrada(self, switch: str, flow: Dict):
+        """Flow que escribió la entrada del switch con la prioridad y el match de `flow`, o None"""
+        with self._lock:
+            return self.tablas.get(switch, {}).get(self._clave_entrada(flow))
+
+    def trafico(self, mac: str, paquetes: int = 1):
+        """Simular tráfico de un host: suma paquetes a los flows cuyo dl_src es su MAC"""
+        with self._lock:
+            for nombre, flow in self.flows.items():
+                if str(flow.get('match', {}).get('dl_src', '')).lower() == mac.lower():
+                    self.paquetes[nombre] = self.paquetes.get(nombre, 0) + paquetes
+
+    @staticmethod
+    def _match_estadisticas(match: Dict) -> Dict:
+        tcp = str(match.get('nw_proto')) == "6"
+        resultado = {}
+        for campo, valor in match.items():
+            if campo in ('tp_src', 'tp_dst'):
+                campo = ("tcp_" if tcp else "udp_") + campo[3:]
+            elif campo == 'dl_type':
+                valor = hex(int(str(valor), 0))
+            resultado[CAMPOS_ESTADISTICAS.get(campo, campo)] = str(valor)
+        return resultado
+
+    def _estadisticas(self) -> Dict:
+        tabla = {sw: {'flows': []} for sw in self.switches}
+        with self._lock:
+            for nombre, flow in self.flows.items():
+                paquetes = self.paquetes.get(nombre, 0)
+                tabla.setdefault(flow['switch'], {'flows': []})['flows'].append({
+                    'match': self._match_estadisticas(flow.get('match', {})),
+                    'packet_count': str(paquetes),
+                    'byte_count': str(paquetes * 100),
+                    'priority': flow.get('priority', "0")
+                })
+        return tabla
+
+    def atender(self, metodo: str, ruta: str, cuerpo):
+        """Resolver una solicitud; devuelve (código, respuesta)"""
+        with self._lock:
+            self.solicitudes += 1
+        if self._capacidad:
+            with self._capacidad:
+                time.sleep(self.latencia)
+        elif self.latencia:
+            time.sleep(self.latencia)
+
+        if metodo == 'GET':
+            if ruta == '/wm/device/':
+                return 200, self.dispositivos
+            if ruta == '/wm/core/controller/switches/json':
+                return 200, [{'switchDPID': sw} for sw in self.switches]
+            if ruta == '/wm/topology/links/json':
+                return 200, self.enlaces
+            if ruta == '/wm/staticflowpusher/list/all/json':
+                return 200, self._flows_por_switch()
+            if ruta == '/wm/core/switch/all/flow/json':
+                return 200, self._estadisticas()
+            m = re.fullmatch(r'/wm/topology/route/([^/]+)/(\d+)/([^/]+)/(\d+)/json', ruta)
+            if m:
+                return 200, self._ruta(*m.groups())
+
+        if ruta == '/wm/staticflowpusher/json':
+            if self.tasa_error and random.random() < self.tasa_error:
+                return 500, {'status': 'error simulado'}
+            if metodo == 'POST':
+                if not cuerpo or 'name' not in cuerpo or 'switch' not in cuerpo:
+                    return 400, {'status': 'flow inválido'}
+                if cuerpo['switch'] not in self.switches:
+                    return 400, {'status': f"switch {cuerpo['switch']} no conectado"}
+                with self._lock:
+                    # Con el mismo nombre el static flow pusher modifica el flow
+                    anterior = self.flows.get(cuerpo['name'])
+                    if anterior is not None:
+                        tabla = self.tablas.get(anterior['switch'], {})
+                        if tabla.get(self._clave_entrada(anterior)) is anterior:
+                            del tabla[self._clave_entrada(anterior)]
+                    self.flows[cuerpo['name']] = cuerpo
+                    self.tablas.setdefault(cuerpo['switch'], {})[self._clave_entrada(cuerpo)] = cuerpo
+                    self.paquetes.pop(cuerpo['name'], None)
+                return 200, {'status': 'Entry pushed'}
+            if metodo == 'DELETE':
+                with self._lock:
+                    flow = self.flows.pop((cuerpo or {}).get('name'), None)
+                    if flow is not None:
+                        self.tablas.get(flow['switch'], {}).pop(self._clave_entrada(flow), None)
+                    self.paquetes.pop((cuerpo or {}).get('name'), None)
+                return 200, {'status': 'Entry deleted'}
+
+        return 404, {'status': f'{metodo} {ruta} no implementado'}
+
+    def _manejador(self):
+        simulado = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _responder(self):
+                longitud = int(self.headers.get('Content-Length') or 0)
+                cuerpo = json.loads(self.rfile.read(longitud)) if longitud else None
+                codigo, respuesta = simulado.atender(self.command, self.path, cuerpo)
+                datos = json.dumps(respuesta).encode()
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            do_GET = do_POST = do_DELETE = _responder
+
+            def log_message(self, *args):
+                pass
+
+        return Manejador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controlador Floodlight simulado")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--switches", type=int, default=5)
+    parser.add_argument("--hosts", type=int, default=100)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por solicitud")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="fracción de flows que fallan")
+    parser.add_argument("--capacidad", type=int, default=0, help="solicitudes atendidas a la vez (0 = sin límite)")
+    parser.add_argument("--propios", type=int, nargs="+", metavar="N",
+                        help="números de los switches que controla esta instancia (por defecto todos)")
+    args = parser.parse_args()
+
+    simulado = FloodlightSimulado(args.switches, args.hosts, args.latencia,
+                                  tasa_error=args.tasa_error, host=args.host, puerto=args.puerto,
+                                  capacidad=args.capacidad,
+                                  propios=args.propios and [dpid_de(n) for n in args.propios])
+    print(f"Floodlight simulado en {simulado.url} ({len(simulado.switches)} switches, "
+          f"{len(simulado.dispositivos)} hosts)")
+    try:
+        simulado._servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Una conexión creada en un lote del agrupador equivale a una creada con crear_conexion"""
+
+import pytest
+
+from controller_20210535 import Alumno, Curso, FloodlightClient, Metricas, SDNApp, Servidor
+from floodlight_simulado import FloodlightSimulado, mac_de
+
+
+@pytest.fixture
+def simulado():
+    with FloodlightSimulado(switches=3, hosts=3) as simulado:
+        yield simulado
+
+
+def crear_app(simulado):
+    app = SDNApp(FloodlightClient(simulado.url), metricas=Metricas(habilitadas=True))
+    for i in range(2):
+        app.alumnos[20200000 + i] = Alumno(f"Alumno {i}", 20200000 + i, mac_de(i))
+    servidor = Servidor("Servidor 1", "10.0.0.3")
+    servidor.agregar_servicio("ssh", "TCP", 22)
+    app.servidores[servidor.nombre] = servidor
+    curso = Curso("TEL354", "Redes")
+    curso.alumnos = [20200000]
+    curso.servidores = [{'nombre': servidor.nombre, 'servicios_permitidos': ['ssh']}]
+    app.cursos[curso.codigo] = curso
+    app.reconstruir_permisos()
+    return app
+
+
+def metricas_de_conexion(app):
+    resumen = app.metricas.resumen()
+    tiempos = {clave: valor['total'] for clave, valor in resumen['tiempos'].items()
+               if 'crear_conexion' in clave or 'autorizacion' in clave}
+    contadores = {clave: valor for clave, valor in resumen['contadores'].items() if clave.startswith('conexiones_')}
+    return tiempos, contadores
+
+
+def test_lote_registra_metricas_y_vigencia_como_crear_conexion(simulado):
+    directa, agrupada = crear_app(simulado), crear_app(simulado)
+    h1 = directa.crear_conexion(20200000, "Servidor 1", "ssh", vida=30, inactividad=5)
+    assert directa.crear_conexion(20200001, "Servidor 1", "ssh") is None
+    resultado = agrupada.crear_conexion_agrupada(20200000, "Servidor 1", "ssh", vida=30, inactividad=5).result()
+    assert agrupada.crear_conexion_agrupada(20200001, "Servidor 1", "ssh").result()['error'] == "no autorizado"
+
+    agrupada._agrupador.detener()  # las métricas de cada solicitud se registran al resolver su Future
+    h2 = resultado['handler']
+    assert (agrupada.conexiones[h2].vida, agrupada.conexiones[h2].inactividad) == (30, 5)
+    assert (directa.conexiones[h1].vida, directa.conexiones[h1].inactividad) == (30, 5)
+    assert metricas_de_conexion(agrupada) == metricas_de_conexion(directa)
+    for app in (directa, agrupada):
+        app.floodlight.cerrar()
@@ -0,0 +1,50 @@
+"""API HTTP/JSON sobre SDNApp"""
+
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from api import APIServidor
+from controller_20210535 import FloodlightClient, SDNApp
+
+
+@pytest.fixture
+def api():
+    servidor = APIServidor(SDNApp(FloodlightClient("http://127.0.0.1:1")), puerto=0)
+    loop = asyncio.new_event_loop()
+    hilo = threading.Thread(target=loop.run_forever, daemon=True)
+    hilo.start()
+    asyncio.run_coroutine_threadsafe(servidor.iniciar(), loop).result(5)
+    yield servidor
+    asyncio.run_coroutine_threadsafe(servidor.detener(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    hilo.join()
+
+
+def solicitud(servidor, metodo, ruta, cuerpo=None):
+    conexion = http.client.HTTPConnection("127.0.0.1", servidor.puerto, timeout=5)
+    conexion.request(metodo, ruta, body=cuerpo, headers={'Content-Type': 'application/json'})
+    respuesta = conexion.getresponse()
+    contenido = json.loads(respuesta.read() or b"null")
+    conexion.close()
+    return respuesta.status, contenido
+
+
+@pytest.mark.parametrize("cuerpo", ["[]", '"x"', "3", "null", "{"])
+def test_cuerpo_que_no_es_un_objeto_es_400(api, cuerpo):
+    estado, contenido = solicitud(api, 'POST', '/alumnos', cuerpo)
+    assert estado == 400 and 'error' in contenido
+
+
+def test_agregar_y_listar_alumno(api):
+    alumno = {'nombre': "Ana", 'codigo': 20210001, 'mac': "fa:16:3e:00:00:01"}
+    estado, contenido = solicitud(api, 'POST', '/alumnos', json.dumps(alumno))
+    assert estado == 201 and contenido['codigo'] == 20210001
+    conexion = http.client.HTTPConnection("127.0.0.1", api.puerto, timeout=5)
+    conexion.request('GET', '/alumnos')
+    lineas = conexion.getresponse().read().decode().splitlines()
+    conexion.close()
+    assert [json.loads(linea)['nombre'] for linea in lineas] == ["Ana"]
@@ -0,0 +1,120 @@
+"""Bitácora de cambios: reproducción, última línea cortada y compactación en un snapshot"""
+
+import time
+
+import pytest
+
+from controller_20210535 import SNAPSHOT_EXTENSION, FloodlightClient, SDNApp
+from floodlight_simulado import FloodlightSimulado, mac_de
+
+
+DATOS = f"""
+alumnos:
+- {{nombre: Ana, codigo: 20210001, mac: "{mac_de(0)}"}}
+- {{nombre: Beto, codigo: 20210002, mac: "{mac_de(1)}"}}
+servidores:
+- nombre: Servidor 1
+  ip: 10.0.0.3
+  servicios:
+  - {{nombre: ssh, protocolo: TCP, puerto: 22}}
+  - {{nombre: web, protocolo: TCP, puerto: 80}}
+cursos:
+- codigo: TEL354
+  nombre: Redes
+  estado: DICTANDO
+  alumnos: [20210001]
+  servidores:
+  - {{nombre: Servidor 1, servicios_permitidos: [ssh]}}
+"""
+
+
+@pytest.fixture
+def simulado():
+    with FloodlightSimulado(switches=3, hosts=3) as simulado:
+        yield simulado
+
+
+@pytest.fixture
+def abrir(simulado):
+    apps = []
+
+    def abrir(filename):
+        app = SDNApp(FloodlightClient(simulado.url))
+        app.abrir_bitacora(str(filename))
+        apps.append(app)
+        return app
+    yield abrir
+    for app in apps:
+        app.cerrar_bitacora()
+        app.floodlight.cerrar()
+
+
+def estado(app):
+    return (
+        {str(codigo): alumno.to_dict() for codigo, alumno in app.alumnos.items()},
+        {codigo: curso.to_dict() for codigo, curso in app.cursos.items()},
+        {h: (c.alumno_mac, c.servicio, list(c.flow_entries), c.ruta, sorted(c.cursos))
+         for h, c in app.conexiones.items()},
+        sorted((nombre, str(flow), sorted(duenos)) for nombre, flow, duenos in app.flows.items()),
+        app.connection_counter,
+    )
+
+
+@pytest.fixture
+def bitacora(tmp_path, abrir):
+    """Bitácora con altas, bajas y una revocación, sin cerrar (como tras una caída)"""
+    datos = tmp_path / "datos.yaml"
+    datos.write_text(DATOS)
+    filename = tmp_path / "cambios.log"
+    app = abrir(filename)
+    assert app.importar_yaml(str(datos))
+    app.agregar_alumno("Caro", 20210003, mac_de(2))
+    app.agregar_alumno_a_curso(20210003, "TEL354")
+    h1 = app.crear_conexion(20210001, "Servidor 1", "ssh")
+    h2 = app.crear_conexion(20210003, "Servidor 1", "ssh")
+    assert h1 and h2
+    app.crear_conexion(20210001, "Servidor 1", "ssh")
+    app.eliminar_conexion(h1)
+    app.cursos["TEL354"].remover_alumno(20210003)  # revoca h2
+    assert len(app.conexiones) == 1
+    app.bitacora.sincronizar()
+    return filename, app
+
+
+def test_reabrir_reproduce_el_estado(bitacora, abrir):
+    filename, app = bitacora
+    assert estado(abrir(filename)) == estado(app)
+
+
+def test_ultima_linea_cortada_se_descarta(bitacora, abrir):
+    filename, app = bitacora
+    with open(filename, 'ab') as file:
+        file.write(b'{"op":"elimi')
+    reabierta = abrir(filename)
+    assert estado(reabierta) == estado(app)
+    # Lo que se registre después queda en una línea propia y también se reproduce
+    handler = reabierta.crear_conexion(20210001, "Servidor 1", "ssh")
+    reabierta.bitacora.sincronizar()
+    assert handler in abrir(filename).conexiones
+
+
+def test_compactar_y_recargar(bitacora, abrir):
+    filename, app = bitacora
+    app.compactar_bitacora()
+    app.crear_conexion(20210001, "Servidor 1", "ssh")  # cambio posterior al snapshot
+    app.bitacora.sincronizar()
+    with open(filename) as file:
+        lineas = file.read().splitlines()
+    assert SNAPSHOT_EXTENSION in lineas[0] and len(lineas) < 10
+    assert estado(abrir(filename)) == estado(app)
+
+
+def test_compactacion_automatica(bitacora, abrir):
+    filename, app = bitacora
+    app.bitacora.max_entradas = 5
+    for _ in range(5):
+        app.crear_conexion(20210001, "Servidor 1", "ssh")
+    app.bitacora.sincronizar()
+    time.sleep(0.1)
+    assert app.bitacora.entradas <= 5
+    assert estado(abrir(filename)) == estado(app)
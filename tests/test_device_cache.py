@@ -0,0 +1,21 @@
+"""Índices de DeviceCache a partir de la tabla de dispositivos de Floodlight"""
+
+from controller_20210535 import DeviceCache
+
+
+def host(mac, ip=None, punto=None):
+    return {'mac': [mac], 'ipv4': [ip] if ip else [],
+            'attachmentPoint': [{'switchDPID': punto[0], 'port': punto[1]}] if punto else []}
+
+
+def test_entrada_sin_attachment_point_no_reemplaza_la_ubicacion():
+    dispositivos = [
+        host("fa:16:3e:00:00:01", punto=("00:01", 1)),
+        host("FA:16:3E:00:00:01"),  # entrada vencida del mismo host
+        host("fa:16:3e:00:00:02"),
+        host("fa:16:3e:00:00:02", "10.0.0.2", ("00:02", 3)),
+    ]
+    cache = DeviceCache(lambda: dispositivos)
+    assert cache.buscar_mac("fa:16:3e:00:00:01")[1] == ("00:01", 1)
+    assert cache.buscar_mac("fa:16:3e:00:00:02")[1] == ("00:02", 3)
+    assert cache.buscar_ip("10.0.0.2") == ("00:02", 3)
@@ -0,0 +1,63 @@
+"""La importación rápida acepta lo mismo que importar_yaml (safe_load)"""
+
+import pytest
+
+from controller_20210535 import FloodlightClient, SDNApp
+
+pytest.importorskip("yaml")
+
+DATOS = """
+base_alumno: &alumno
+  nombre: Sin nombre
+  mac: "fa:16:3e:00:00:ff"
+servicio_ssh: &ssh {nombre: ssh, protocolo: TCP, puerto: 22}
+servicio_web: &web {nombre: web, protocolo: TCP, puerto: 80}
+alumnos:
+- <<: *alumno
+  codigo: 20210001
+  mac: "fa:16:3e:00:00:01"
+- &beto
+  <<: *alumno
+  nombre: Beto
+  codigo: 20210002
+- <<: [*beto, *alumno]
+  codigo: 20210003
+servidores:
+- nombre: Servidor 1
+  ip: 10.0.0.3
+  servicios:
+  - *ssh
+  - <<: *web
+    puerto: 8080
+cursos:
+- &curso
+  codigo: TEL354
+  nombre: Redes
+  estado: DICTANDO
+  alumnos: [20210001, 20210003]
+  servidores:
+  - {nombre: Servidor 1, servicios_permitidos: [ssh, web]}
+- <<: *curso
+  codigo: TEL355
+  estado: CERRADO
+"""
+
+
+def estado(app):
+    return (
+        {codigo: alumno.to_dict() for codigo, alumno in app.alumnos.items()},
+        {nombre: servidor.to_dict() for nombre, servidor in app.servidores.items()},
+        {codigo: curso.to_dict() for codigo, curso in app.cursos.items()},
+        {codigo: sorted(permisos) for codigo, permisos in app.permisos.items()},
+    )
+
+
+def test_anclas_y_claves_de_fusion(tmp_path):
+    filename = tmp_path / "datos.yaml"
+    filename.write_text(DATOS)
+    normal, rapida = SDNApp(FloodlightClient()), SDNApp(FloodlightClient())
+    assert normal.importar_yaml(str(filename))
+    assert rapida.importar_yaml_rapido(str(filename)) is not None
+    assert estado(rapida) == estado(normal)
+    assert rapida.alumnos[20210003].nombre == "Beto"
+    assert [s.puerto for s in rapida.servidores["Servidor 1"].servicios] == [22, 8080]
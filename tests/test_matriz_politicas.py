@@ -0,0 +1,98 @@
+"""Equivalencia entre MatrizPoliticas y el índice de permisos por alumno ante cambios aleatorios"""
+
+import random
+
+import pytest
+
+from controller_20210535 import Alumno, Curso, FloodlightClient, MatrizPoliticas, SDNApp, Servidor
+
+pytest.importorskip("numpy")
+
+SERVICIOS = ["ssh", "web", "ftp"]
+
+
+def crear_app(rnd: random.Random, n_alumnos: int = 200, n_cursos: int = 8) -> SDNApp:
+    app = SDNApp(FloodlightClient("http://127.0.0.1:1"))
+    for i in range(n_alumnos):
+        codigo = 20200000 + i
+        app.alumnos[codigo] = Alumno(f"Alumno {i}", codigo, f"FA:16:3E:00:{i >> 8:02X}:{i & 0xFF:02X}")
+    for nombre in ("Servidor 1", "Servidor 2"):
+        servidor = Servidor(nombre, "10.0.0.3" if nombre == "Servidor 1" else "10.0.0.4")
+        for puerto, servicio in enumerate(SERVICIOS, 20):
+            servidor.agregar_servicio(servicio, "TCP", puerto)
+        app.servidores[nombre] = servidor
+    codigos = list(app.alumnos)
+    for k in range(n_cursos):
+        curso = Curso(f"TEL{k:03d}", f"Curso {k}", rnd.choice(["DICTANDO", "DICTANDO", "CERRADO"]))
+        curso.alumnos = rnd.sample(codigos, n_alumnos // 5)
+        curso.servidores = [{'nombre': rnd.choice(list(app.servidores)),
+                             'servicios_permitidos': rnd.sample(SERVICIOS, 2)}]
+        app.cursos[curso.codigo] = curso
+    app.reconstruir_permisos()
+    return app
+
+
+def verificar(app: SDNApp):
+    """Cada consulta de la matriz coincide con lo que se deduce del índice de permisos"""
+    matriz = app.matriz
+    por_par = {}
+    for codigo, permisos in app.permisos.items():
+        for par in permisos:
+            por_par.setdefault(par, set()).add(codigo)
+    pares = set(matriz.permisos) | set(por_par)
+    for par in pares:
+        assert set(matriz.alumnos_con_permiso(*par)) == por_par.get(par, set()), par
+        cursos = {c.codigo for c in app.cursos.values()
+                  if c.estado == "DICTANDO" and par in set(c.permisos())}
+        assert set(matriz.cursos_con_permiso(*par)) == cursos, par
+    for codigo in app.alumnos:
+        assert set(matriz.permisos_de(codigo)) == set(app.permisos.get(codigo, {})), codigo
+    assert sorted(matriz.auditoria(), key=str) == sorted(
+        ((codigo,) + par for codigo, permisos in app.permisos.items() for par in permisos), key=str
+    )
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_cambios_aleatorios(semilla):
+    rnd = random.Random(semilla)
+    app = crear_app(rnd)
+    verificar(app)
+    codigos = list(app.alumnos)
+    cursos = list(app.cursos.values())
+    for i in range(300):
+        curso = rnd.choice(cursos)
+        operacion = rnd.random()
+        if operacion < 0.35:
+            curso.agregar_alumno(rnd.choice(codigos))
+        elif operacion < 0.65 and curso.alumnos:
+            curso.remover_alumno(rnd.choice(curso.alumnos))
+        elif operacion < 0.8:
+            curso.estado = rnd.choice(["DICTANDO", "CERRADO"])
+        elif operacion < 0.95:
+            curso.agregar_servidor(rnd.choice(list(app.servidores)), rnd.sample(SERVICIOS + ["nuevo"], 1))
+        else:
+            codigo = 30000000 + i
+            app.agregar_alumno(f"Nuevo {i}", codigo, f"FA:16:3F:00:{i >> 8:02X}:{i & 0xFF:02X}")
+            codigos.append(codigo)
+        if i % 50 == 0:
+            verificar(app)
+    verificar(app)
+    # Una construcción completa llega al mismo resultado que las actualizaciones incrementales
+    reconstruida = MatrizPoliticas()
+    reconstruida.construir(app.cursos)
+    assert sorted(reconstruida.auditoria(), key=str) == sorted(app.matriz.auditoria(), key=str)
+
+
+def test_inscribir_alumno_nuevo_hace_crecer_la_matriz():
+    app = crear_app(random.Random(0), n_alumnos=0, n_cursos=0)
+    curso = Curso("TEL354", "Redes", "DICTANDO")
+    curso.servidores = [{'nombre': "Servidor 1", 'servicios_permitidos': ["ssh"]}]
+    app.cursos[curso.codigo] = curso
+    app.reconstruir_permisos()
+    # Cada alumno nuevo agrega una fila; la matriz crece varias veces durante el ciclo
+    for i in range(40):
+        codigo = 20200000 + i
+        app.agregar_alumno(f"Alumno {i}", codigo, f"FA:16:3E:00:00:{i:02X}")
+        curso.agregar_alumno(codigo)
+        assert app.matriz.permisos_de(codigo) == [("Servidor 1", "ssh")]
+    verificar(app)
@@ -0,0 +1,74 @@
+"""Re-enrutamiento contra el controlador simulado, que modela la tabla de cada switch"""
+
+import pytest
+
+from controller_20210535 import Alumno, Curso, FloodlightClient, SDNApp, Servidor
+from floodlight_simulado import FloodlightSimulado, mac_de
+
+
+@pytest.fixture
+def simulado():
+    with FloodlightSimulado(switches=3, hosts=3) as simulado:
+        yield simulado
+
+
+@pytest.fixture
+def app(simulado):
+    app = SDNApp(FloodlightClient(simulado.url))
+    app.alumnos[20200000] = Alumno("Alumno 0", 20200000, mac_de(0))
+    servidor = Servidor("Servidor 1", "10.0.0.3")
+    servidor.agregar_servicio("ssh", "TCP", 22)
+    app.servidores[servidor.nombre] = servidor
+    curso = Curso("TEL354", "Redes")
+    curso.alumnos = [20200000]
+    curso.servidores = [{'nombre': servidor.nombre, 'servicios_permitidos': ['ssh']}]
+    app.cursos[curso.codigo] = curso
+    app.reconstruir_permisos()
+    app.route_cache.intervalo_enlaces = 0
+    yield app
+    app.floodlight.cerrar()
+
+
+def cambiar_enlace(simulado, a, b, puerto_a, puerto_b):
+    """Reemplazar el enlace a-b por otro entre los mismos switches con otros puertos"""
+    simulado.enlaces = [e for e in simulado.enlaces if (e['src-switch'], e['dst-switch']) != (a, b)]
+    simulado.enlaces.append({'src-switch': a, 'src-port': puerto_a, 'dst-switch': b, 'dst-port': puerto_b,
+                             'type': 'internal', 'direction': 'bidirectional'})
+    simulado.topologia.cargar(simulado.switches, simulado.enlaces)
+
+
+def test_simulado_modela_reemplazo_y_borrado_estricto(simulado):
+    cliente = FloodlightClient(simulado.url)
+    sw = simulado.switches[0]
+    flow = {'switch': sw, 'priority': "1000", 'match': {'dl_src': mac_de(0)}, 'actions': "output=1"}
+    cliente.instalar_flow(dict(flow, name="viejo"))
+    cliente.instalar_flow(dict(flow, name="nuevo", actions="output=7"))
+    assert simulado.entrada(sw, flow)['actions'] == "output=7"
+    # Eliminar el flow anterior borra la entrada que lo reemplazó
+    cliente.eliminar_flow("viejo")
+    assert simulado.entrada(sw, flow) is None
+    cliente.cerrar()
+
+
+def test_reenrutar_conserva_la_conexion_cuando_cambia_el_puerto(simulado, app):
+    handler = app.crear_conexion(20200000, "Servidor 1", "ssh")
+    assert handler is not None
+    assert app.revisar_topologia() is not None  # primera revisión: toma la topología de referencia
+    s1, s2, s3 = simulado.switches
+    conexion = app.conexiones[handler]
+    flow_s1 = next(app.flows.obtener(n) for n in conexion.flow_entries if app.flows.obtener(n)['switch'] == s1)
+    assert simulado.entrada(s1, flow_s1)['actions'] == "output=1"
+
+    cambiar_enlace(simulado, s1, s2, 7, 8)
+    reporte = app.revisar_topologia()
+
+    assert reporte['reenrutadas'] == 1
+    conexion = app.conexiones[handler]
+    assert (s1, 7) in conexion.ruta
+    # Cada switch de la ruta conserva una entrada con la salida nueva
+    for nombre in conexion.flow_entries:
+        flow = app.flows.obtener(nombre)
+        entrada = simulado.entrada(flow['switch'], flow)
+        assert entrada is not None and entrada['actions'] == flow['actions']
+    assert simulado.entrada(s1, flow_s1)['actions'] == "output=7"
+    assert sorted(simulado.flows) == sorted(conexion.flow_entries)
@@ -0,0 +1,30 @@
+"""Revocación de conexiones tras cambios de política"""
+
+from controller_20210535 import Alumno, Curso, FloodlightClient, SDNApp, Servidor
+from floodlight_simulado import FloodlightSimulado, mac_de
+
+
+def test_revisar_ignora_conexiones_eliminadas_por_otro_hilo():
+    with FloodlightSimulado(switches=3, hosts=3) as simulado:
+        app = SDNApp(FloodlightClient(simulado.url))
+        for i in range(2):
+            app.alumnos[20200000 + i] = Alumno(f"Alumno {i}", 20200000 + i, mac_de(i))
+        servidor = Servidor("Servidor 1", "10.0.0.3")
+        servidor.agregar_servicio("ssh", "TCP", 22)
+        app.servidores[servidor.nombre] = servidor
+        curso = Curso("TEL354", "Redes")
+        curso.alumnos = [20200000, 20200001]
+        curso.servidores = [{'nombre': servidor.nombre, 'servicios_permitidos': ['ssh']}]
+        app.cursos[curso.codigo] = curso
+        app.reconstruir_permisos()
+        eliminada = app.crear_conexion(20200000, "Servidor 1", "ssh")
+        revocada = app.crear_conexion(20200001, "Servidor 1", "ssh")
+        handlers = app.conexiones.por_curso("TEL354")
+        app.eliminar_conexion(eliminada)  # entre la consulta del índice y la revisión
+
+        curso.alumnos.remove(20200001)
+        app.reconstruir_permisos()
+        app._revisar_conexiones(handlers)
+
+        assert revocada not in app.conexiones and not app.conexiones
+        app.floodlight.cerrar()
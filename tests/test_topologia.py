@@ -0,0 +1,96 @@
+"""TopologiaLocal y RouteCache sobre una topología sintética pequeña"""
+
+import pytest
+
+from controller_20210535 import RouteCache, TopologiaLocal
+
+S1, S2, S3, S4, S5 = (f"00:00:00:00:00:00:00:0{i}" for i in range(1, 6))
+
+
+def enlace(a, pa, b, pb):
+    return {'src-switch': a, 'src-port': pa, 'dst-switch': b, 'dst-port': pb,
+            'type': 'internal', 'direction': 'bidirectional'}
+
+
+# Anillo s1-s2-s3-s4-s1 y s5 colgando de s3:
+#   s1:1 - s2:2, s2:1 - s3:2, s3:1 - s4:2, s4:1 - s1:2, s3:3 - s5:1
+ENLACES = [enlace(S1, 1, S2, 2), enlace(S2, 1, S3, 2), enlace(S3, 1, S4, 2),
+           enlace(S4, 1, S1, 2), enlace(S3, 3, S5, 1)]
+
+
+@pytest.fixture
+def topologia():
+    return TopologiaLocal([S1, S2, S3, S4, S5], ENLACES)
+
+
+def test_ruta_formato_floodlight(topologia):
+    # (switch, puerto de entrada) y (switch, puerto de salida) por cada salto
+    assert topologia.ruta(S1, 10, S2, 20) == [(S1, 10), (S1, 1), (S2, 2), (S2, 20)]
+
+
+def test_ruta_mas_corta(topologia):
+    ruta = topologia.ruta(S1, 10, S5, 20)
+    assert [switch for switch, _ in ruta[::2]] in ([S1, S2, S3, S5], [S1, S4, S3, S5])
+    assert ruta[-1] == (S5, 20)
+
+
+def test_mismo_switch(topologia):
+    assert topologia.ruta(S3, 4, S3, 5) == [(S3, 4), (S3, 5)]
+
+
+def test_sin_ruta():
+    topologia = TopologiaLocal([S1, S2, S3], [enlace(S1, 1, S2, 2)])
+    assert topologia.ruta(S1, 10, S3, 20) == []
+    assert topologia.ruta(S1, 10, "00:00:00:00:00:00:00:99", 20) == []
+
+
+def test_recargar_cambia_las_rutas(topologia):
+    assert (S1, 1) in topologia.ruta(S1, 10, S2, 20)
+    generacion = topologia.generacion
+    topologia.cargar([S1, S2, S3, S4, S5], [e for e in ENLACES if e['src-switch'] != S1])
+    assert topologia.generacion == generacion + 1
+    # Sin el enlace s1-s2 se llega por s4 y s3
+    assert [switch for switch, _ in topologia.ruta(S1, 10, S2, 20)[::2]] == [S1, S4, S3, S2]
+
+
+def test_calculo_cruzado_con_recarga_no_contamina_el_grafo_nuevo(topologia):
+    grafo_anterior = topologia._grafo
+    topologia.cargar([S1, S2], [enlace(S1, 7, S2, 8)])
+    # Un cálculo que empezó con el grafo anterior guarda su tabla en ese grafo
+    TopologiaLocal._siguientes_saltos(grafo_anterior, S2)
+    assert topologia.ruta(S1, 10, S2, 20) == [(S1, 10), (S1, 7), (S2, 8), (S2, 20)]
+
+
+def test_precalcular(topologia):
+    topologia.precalcular([S5])
+    assert S5 in topologia._grafo[1]
+    assert topologia.siguientes_saltos(S5)[S1][1] in (S2, S4)
+
+
+def test_route_cache_no_guarda_rutas_calculadas_durante_una_invalidacion(topologia):
+    cache = RouteCache(topologia.ruta, lambda: ENLACES)
+
+    def calcular_e_invalidar(*consulta):
+        ruta = topologia.ruta(*consulta)
+        cache.invalidar()
+        return ruta
+
+    cache._calcular = calcular_e_invalidar
+    assert cache.obtener(S1, 10, S2, 20)
+    assert cache.estadisticas()['rutas'] == 0
+    cache._calcular = topologia.ruta
+    cache.obtener(S1, 10, S2, 20)
+    assert cache.estadisticas()['rutas'] == 1
+
+
+def test_route_cache_recarga_antes_de_invalidar(topologia):
+    enlaces = list(ENLACES)
+    orden = []
+    cache = RouteCache(topologia.ruta, lambda: enlaces, intervalo_enlaces=0,
+                       al_cambiar=lambda nuevos: orden.append(('cargar', cache.invalidaciones)))
+    cache.obtener(S1, 10, S2, 20)
+    enlaces.pop(0)
+    cache.obtener(S1, 10, S2, 20)
+    # La segunda carga ocurre antes de la única invalidación
+    assert orden == [('cargar', 0), ('cargar', 0)]
+    assert cache.invalidaciones == 1